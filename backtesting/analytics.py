@@ -0,0 +1,425 @@
+"""This module contains vectorized performance analytics of backtests of the
+Token Terminal Index.
+
+The daily values (NAV) and weights of a backtest are derived once from its
+results, and all metrics are calculated from these arrays. Metrics of NAV
+arrays also accept 2D arrays with one path per row (e.g. the NAV matrix of
+`walk_forward.walk_forward`), and ignore NaN values, e.g. before the start
+date of a path."""
+
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from results import BacktestResults
+
+
+# Crypto assets trade every day of the year
+PERIODS_PER_YEAR = 365
+
+
+def daily_matrices(results):
+    """Return the daily values and weights of a backtest.
+
+    Args:
+        results: dictionary generated by `backtesting.backtest`, or
+            results.BacktestResults.
+
+    Returns:
+        tuple of the list of dates (strings formatted as "%Y-%m-%d"), the list
+        of projects, a 1D floating-point numpy.ndarray with the value of the
+        portfolio at the end of each day, and a 2D floating-point numpy.ndarray
+        (days x projects) with the weight of each project at the end of each
+        day (0 if the project is not in the portfolio).
+    """
+    if isinstance(results, BacktestResults):
+        return (
+            [str(d) for d in results.dates],
+            list(results.historical_data.projects),
+            results.values(),
+            results.weights(),
+        )
+
+    # The latest portfolio of each day
+    latest = {}
+    for portfolio in results["portfolios"]:
+        latest[portfolio["datetime"].values[0]] = portfolio
+    columns = {}
+    for portfolio in latest.values():
+        for project in portfolio["project"].tolist():
+            columns.setdefault(project, len(columns))
+
+    values = np.zeros(len(latest))
+    weights = np.zeros((len(latest), len(columns)))
+    for i, portfolio in enumerate(latest.values()):
+        values[i] = np.sum(portfolio["price"].values * portfolio["tokens"].values)
+        weights[i, [columns[p] for p in portfolio["project"].tolist()]] = portfolio[
+            "weight"
+        ].values
+    return list(latest), list(columns), values, weights
+
+
+def rebalance_matrices(results, projects):
+    """Return the weights of a backtest before and after each rebalance.
+
+    Only the "pre-rebalance" and "rebalanced" portfolios are accessed, and the
+    weights of compact results are taken from their arrays without building
+    the portfolios.
+
+    Args:
+        results: dictionary generated by `backtesting.backtest`, or
+            results.BacktestResults.
+        projects: list of projects defining the columns of the weights, e.g.
+            as returned by `daily_matrices`.
+
+    Returns:
+        tuple of the list of rebalance dates and two 2D floating-point
+        numpy.ndarray instances (rebalances x projects) with the weights
+        before and after each rebalance.
+    """
+    columns = {project: j for j, project in enumerate(projects)}
+    if isinstance(results, BacktestResults):
+        return _compact_rebalance_matrices(results, columns)
+
+    dates, pre, post = [], [], []
+    portfolios = results["portfolios"]
+    for k, status in enumerate(results["statuses"]):
+        if status not in ["pre-rebalance", "rebalanced"]:
+            continue
+        portfolio = portfolios[k]
+        weights = np.zeros(len(columns))
+        weights[[columns[p] for p in portfolio["project"].tolist()]] = portfolio[
+            "weight"
+        ].values
+        if status == "pre-rebalance":
+            pre.append(weights)
+        else:
+            post.append(weights)
+            dates.append(str(portfolio["datetime"].values[0]))
+    return (
+        dates,
+        np.array(pre, dtype=float).reshape(len(pre), len(columns)),
+        np.array(post, dtype=float).reshape(len(post), len(columns)),
+    )
+
+
+def _compact_rebalance_matrices(results, columns):
+    """Return the weights of compact results before and after each rebalance
+    (see `rebalance_matrices`) from their arrays.
+
+    Args:
+        results: results.BacktestResults.
+        columns: dict mapping each project to its column in the weights.
+
+    Returns:
+        tuple (see `rebalance_matrices`).
+    """
+    panel = results.historical_data
+    rebalances = [e for e in results.events if e["status"] == "rebalanced"]
+    dates = []
+    pre = np.zeros((len(rebalances), len(columns)))
+    post = np.zeros((len(rebalances), len(columns)))
+    for k, event in enumerate(rebalances):
+        date = results.start_date + datetime.timedelta(days=event["day"])
+        # Weights of the pre-rebalance portfolio, as in `results.portfolio`
+        holdings = results._holdings_before(event["day"])
+        prices = panel.price[panel.date_loc(date), holdings["columns"]]
+        pre[k, [columns[panel.projects[j]] for j in holdings["columns"]]] = (
+            prices * holdings["tokens"] / (prices @ holdings["tokens"])
+        )
+        post[k, [columns[panel.projects[j]] for j in event["columns"]]] = event[
+            "weights"
+        ]
+        dates.append(str(date))
+    return dates, pre, post
+
+
+def returns(nav):
+    """Calculate daily returns.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+
+    Returns:
+        floating-point numpy.ndarray with one day less along the last axis.
+    """
+    nav = np.asarray(nav, dtype=float)
+    return nav[..., 1:] / nav[..., :-1] - 1
+
+
+def total_return(nav):
+    """Calculate the total return, i.e. the last value over the first one.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    r = returns(nav)
+    n_periods = np.sum(~np.isnan(r), axis=-1)
+    growth = np.expm1(np.nansum(np.log1p(r), axis=-1))
+    return np.where(n_periods > 0, growth, np.nan)[()]
+
+
+def annualized_return(nav):
+    """Calculate the compound annual growth rate.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    n_periods = np.sum(~np.isnan(returns(nav)), axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (1 + total_return(nav)) ** (PERIODS_PER_YEAR / n_periods) - 1
+
+
+def volatility(nav):
+    """Calculate the annualized standard deviation of daily returns.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _nanstd(returns(nav)) * np.sqrt(PERIODS_PER_YEAR)
+
+
+def sharpe_ratio(nav, risk_free_rate=0.0):
+    """Calculate the annualized Sharpe ratio of daily returns.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+        risk_free_rate: float defining the annual risk-free rate.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    r = returns(nav) - risk_free_rate / PERIODS_PER_YEAR
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _nanmean(r) / _nanstd(r) * np.sqrt(PERIODS_PER_YEAR)
+
+
+def drawdowns(nav):
+    """Calculate the daily drawdowns, i.e. the relative loss from the highest
+    previous value.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+
+    Returns:
+        floating-point numpy.ndarray with the same shape as `nav`.
+    """
+    nav = np.asarray(nav, dtype=float)
+    return 1 - nav / np.fmax.accumulate(nav, axis=-1)
+
+
+def max_drawdown(nav):
+    """Calculate the maximum drawdown.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    return _nanmax(drawdowns(nav))
+
+
+def turnover(pre, post):
+    """Calculate the one-way turnover of rebalances, i.e. half the sum of the
+    absolute weight changes.
+
+    Args:
+        pre: floating-point numpy.ndarray with the weights before the
+            rebalances along the last axis.
+        post: floating-point numpy.ndarray with the weights after the
+            rebalances along the last axis.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    return np.sum(np.abs(np.asarray(post) - np.asarray(pre)), axis=-1) / 2
+
+
+def hhi(weights):
+    """Calculate the Herfindahl-Hirschman index of concentration, i.e. the sum
+    of the squared weights, which ranges from 1/n (equal weights) to 1.
+
+    Args:
+        weights: floating-point numpy.ndarray with weights along the last axis.
+
+    Returns:
+        float or floating-point numpy.ndarray.
+    """
+    return np.sum(np.square(weights), axis=-1)
+
+
+def _windows(x, window):
+    """Return a read-only view of the sliding windows along the last axis."""
+    return np.lib.stride_tricks.sliding_window_view(x, window, axis=-1)
+
+
+def _rolling(metric, nav, window):
+    """Apply a metric of NAV arrays to rolling windows, aligned so that each
+    window ends on its date (NaN for the first `window` - 1 days)."""
+    nav = np.asarray(nav, dtype=float)
+    out = np.full(nav.shape, np.nan)
+    if nav.shape[-1] >= window:
+        out[..., window - 1 :] = metric(_windows(nav, window))
+    return out
+
+
+def rolling_return(nav, window):
+    """Calculate the return over rolling windows.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+        window: int defining the number of days of each window.
+
+    Returns:
+        floating-point numpy.ndarray with the same shape as `nav`.
+    """
+    return _rolling(total_return, nav, window)
+
+
+def rolling_volatility(nav, window):
+    """Calculate the annualized volatility over rolling windows.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+        window: int defining the number of days of each window.
+
+    Returns:
+        floating-point numpy.ndarray with the same shape as `nav`.
+    """
+    return _rolling(volatility, nav, window)
+
+
+def rolling_sharpe_ratio(nav, window, risk_free_rate=0.0):
+    """Calculate the annualized Sharpe ratio over rolling windows.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+        window: int defining the number of days of each window.
+        risk_free_rate: float defining the annual risk-free rate.
+
+    Returns:
+        floating-point numpy.ndarray with the same shape as `nav`.
+    """
+    return _rolling(lambda x: sharpe_ratio(x, risk_free_rate), nav, window)
+
+
+def rolling_max_drawdown(nav, window):
+    """Calculate the maximum drawdown over rolling windows.
+
+    Args:
+        nav: floating-point numpy.ndarray with daily values along the last
+            axis.
+        window: int defining the number of days of each window.
+
+    Returns:
+        floating-point numpy.ndarray with the same shape as `nav`.
+    """
+    return _rolling(max_drawdown, nav, window)
+
+
+def summary(results, risk_free_rate=0.0):
+    """Calculate the performance metrics of a backtest.
+
+    Args:
+        results: dictionary generated by `backtesting.backtest`, or
+            results.BacktestResults.
+        risk_free_rate: float defining the annual risk-free rate.
+
+    Returns:
+        dict with the final value, total return, annualized return,
+        volatility, Sharpe ratio, maximum drawdown, number of rebalances,
+        total and mean turnover per rebalance, and mean HHI of the backtest.
+    """
+    _, projects, values, weights = daily_matrices(results)
+    _, pre, post = rebalance_matrices(results, projects)
+    rebalance_turnover = turnover(pre, post)
+    return {
+        "final_value": values[-1],
+        "total_return": total_return(values),
+        "annualized_return": annualized_return(values),
+        "volatility": volatility(values),
+        "sharpe_ratio": sharpe_ratio(values, risk_free_rate),
+        "max_drawdown": max_drawdown(values),
+        "n_rebalances": len(rebalance_turnover),
+        "turnover": np.sum(rebalance_turnover),
+        "mean_turnover": (
+            np.mean(rebalance_turnover) if len(rebalance_turnover) else np.nan
+        ),
+        "mean_hhi": np.mean(hhi(weights)),
+    }
+
+
+def rolling_metrics(results, window, risk_free_rate=0.0):
+    """Calculate the daily and rolling performance metrics of a backtest.
+
+    Args:
+        results: dictionary generated by `backtesting.backtest`, or
+            results.BacktestResults.
+        window: int defining the number of days of the rolling windows.
+        risk_free_rate: float defining the annual risk-free rate.
+
+    Returns:
+        pandas.core.frame.DataFrame indexed by date with the value, drawdown,
+        and HHI of each day, and the return, volatility, Sharpe ratio, and
+        maximum drawdown over the window ending on each day.
+    """
+    dates, _, values, weights = daily_matrices(results)
+    return pd.DataFrame(
+        {
+            "value": values,
+            "drawdown": drawdowns(values),
+            "hhi": hhi(weights),
+            "rolling_return": rolling_return(values, window),
+            "rolling_volatility": rolling_volatility(values, window),
+            "rolling_sharpe_ratio": rolling_sharpe_ratio(
+                values, window, risk_free_rate
+            ),
+            "rolling_max_drawdown": rolling_max_drawdown(values, window),
+        },
+        index=pd.Index(dates, name="date"),
+    )
+
+
+def _nanmean(x):
+    """Mean along the last axis ignoring NaN, without warnings for empty
+    slices."""
+    n = np.sum(~np.isnan(x), axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nansum(x, axis=-1) / n
+
+
+def _nanstd(x):
+    """Sample standard deviation along the last axis ignoring NaN, without
+    warnings for slices with less than two values."""
+    n = np.sum(~np.isnan(x), axis=-1)
+    deviations = x - _nanmean(x)[..., np.newaxis]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sqrt(np.nansum(np.square(deviations), axis=-1) / (n - 1))
+
+
+def _nanmax(x):
+    """Maximum along the last axis ignoring NaN (NaN for empty slices)."""
+    return np.fmax.reduce(x, axis=-1)
@@ -1,32 +1,172 @@
 """This module contains a wrapper for the Token Terminal API."""
 
 
+import concurrent.futures
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# Status codes of responses to requests that are retried
+RETRY_STATUSES = [429, 500, 502, 503, 504]
 
 
 class ApiWrapper:
     """Wrapper for the Token Terminal API.
 
+    All requests go through a single `requests.Session`, so connections to the
+    API are pooled and reused between requests (and threads). Requests that
+    fail with a connection error or with one of the `RETRY_STATUSES` are
+    retried with exponential backoff.
+
     Args:
         key: str
+        base_url: str, optional
+        max_workers: int defining the number of requests made concurrently by
+            `get_historical_data_many` (and the size of the connection pool),
+            optional
+        rate_limit: positive float defining the maximum number of requests
+            per second, or None for no limit, optional
+        max_retries: int defining the number of times a request is retried,
+            optional
+        backoff: float defining the delay in seconds before the first retry of
+            a request, which doubles with every retry, optional
+        timeout: float defining the timeout in seconds of requests, optional
+        cache: response_cache.ResponseCache used for the responses of
+            requests, optional
 
     Attributes:
         key: str
         headers: str
         base_url: str
+        max_workers: int
+        rate_limit: float or None
+        max_retries: int
+        backoff: float
+        timeout: float
+        cache: response_cache.ResponseCache or None
+        session: requests.Session
+
+    Raises:
+        ValueError: If `rate_limit` is not positive, or if the API key is not
+            valid.
     """
 
-    def __init__(self, key):
+    def __init__(
+        self,
+        key,
+        base_url="https://api.tokenterminal.com/",
+        max_workers=8,
+        rate_limit=None,
+        max_retries=5,
+        backoff=0.5,
+        timeout=60,
+        cache=None,
+    ):
+
+        if rate_limit is not None and not rate_limit > 0:
+            raise ValueError(f"Rate limit must be positive, got {rate_limit}")
 
         self.key = key
         self.headers = {"Authorization": f"Bearer {self.key}"}
-        self.base_url = "https://api.tokenterminal.com/"
-
-        # Check that API key is valid
-        r = requests.get(self.base_url + "v1/projects", headers=self.headers)
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+
+        # Check that API key is valid (bypassing the cache)
+        r = self._send("v1/projects")
         if r.status_code != 200:
             raise ValueError(f"Authentication failed ({r.status_code})")
 
+    def _wait_for_rate_limit(self):
+        """Sleep until a new request can be made without exceeding the rate
+        limit."""
+        if self.rate_limit is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + 1 / self.rate_limit
+        time.sleep(start - now)
+
+    def _send(self, path, params=None, headers=None):
+        """Make a GET request to the API, retrying failed requests.
+
+        Args:
+            path: str defining the path of the endpoint relative to `base_url`
+            params: dict, optional
+            headers: dict of headers added to the request, optional
+
+        Returns:
+            requests.model.Response of the last attempt
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+            try:
+                r = self.session.get(
+                    self.base_url + path,
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if r.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return r
+                retry_after = r.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    time.sleep(int(retry_after))
+                    continue
+            time.sleep(self.backoff * 2**attempt)
+
+    def _get(self, path, params=None):
+        """Make a GET request to the API, using the response cache if there is
+        one.
+
+        Args:
+            path: str defining the path of the endpoint relative to `base_url`
+            params: dict, optional
+
+        Returns:
+            requests.model.Response
+        """
+        if self.cache is None:
+            return self._send(path, params)
+
+        url = self.base_url + path
+        key = self.cache.key(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record("hit", entry)
+            return _cached_response(url, entry)
+
+        r = self._send(path, params, entry and self.cache.validators(entry))
+        if r.status_code == 304 and entry is not None:
+            self.cache.touch(key, entry)
+            self.cache.record("not_modified", entry)
+            return _cached_response(url, entry)
+        self.cache.record("miss")
+        if r.status_code == 200:
+            self.cache.put(key, r.headers, r.content)
+        return r
+
     def get_all_projects(self, return_response_object=False):
         """Return an overview of the latest data for all listed projects.
 
@@ -36,7 +176,7 @@ class ApiWrapper:
         Returns:
             list or requests.model.Response
         """
-        r = requests.get(self.base_url + "v1/projects", headers=self.headers)
+        r = self._get("v1/projects")
         if return_response_object:
             return r
         else:
@@ -61,13 +201,55 @@ class ApiWrapper:
             list or requests.model.Response
         """
         params = {"interval": interval, "data_granularity": data_granularity}
-        r = requests.get(
-            self.base_url + f"v1/projects/{project_id}/metrics",
-            headers=self.headers,
-            params=params,
-        )
+        r = self._get(f"v1/projects/{project_id}/metrics", params=params)
 
         if return_response_object:
             return r
         else:
             return r.json()
+
+    def get_historical_data_many(self, project_ids, callback=None, **kwargs):
+        """Return the historical data of many projects, making up to
+        `max_workers` requests concurrently.
+
+        Args:
+            project_ids: list of str
+            callback: function called with each project id and its historical
+                data as soon as it is received, optional
+            **kwargs: keyword arguments of `get_historical_data`
+
+        Returns:
+            dict mapping each project id to its historical data, in the order
+            of `project_ids`
+        """
+        data = {}
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {}
+            for project_id in project_ids:
+                future = executor.submit(self.get_historical_data, project_id, **kwargs)
+                futures[future] = project_id
+            for future in concurrent.futures.as_completed(futures):
+                project_id = futures[future]
+                data[project_id] = future.result()
+                if callback is not None:
+                    callback(project_id, data[project_id])
+        return {project_id: data[project_id] for project_id in project_ids}
+
+
+def _cached_response(url, entry):
+    """Return a cached response as a `requests.model.Response`.
+
+    Args:
+        url: str
+        entry: dict returned by `response_cache.ResponseCache.get`
+
+    Returns:
+        requests.model.Response
+    """
+    r = requests.Response()
+    r.status_code = 200
+    r.url = url
+    r.headers = CaseInsensitiveDict(entry["headers"])
+    r._content = entry["content"]
+    r.encoding = "utf-8"
+    return r
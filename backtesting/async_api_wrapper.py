@@ -0,0 +1,476 @@
+"""This module contains an asyncio wrapper for the Token Terminal API, which
+can be used in async code without blocking the event loop."""
+
+
+import asyncio
+import codecs
+import json
+import re
+import urllib.parse
+
+import aiohttp
+
+from api_wrapper import RETRY_STATUSES
+
+
+# Status codes of redirects, which are followed within the API
+REDIRECT_STATUSES = [301, 302, 303, 307, 308]
+MAX_REDIRECTS = 5
+
+# Characters that can end an item of a JSON array or change the nesting of
+# its text: at the top level of the item, within its arrays and objects, and
+# within its strings
+_DELIMITERS = re.compile(r'[\s,"\[\]{}]')
+_NESTED_DELIMITERS = re.compile(r'["\[\]{}]')
+_STRING_DELIMITERS = re.compile(r'["\\]')
+
+
+class ApiError(Exception):
+    """Raised when a request to the API fails with an error status, after any
+    retries.
+
+    Args:
+        message: str.
+        status: int defining the status code of the response.
+        data: decoded JSON data of the response, or None if it is not JSON.
+
+    Attributes:
+        status: int.
+        data: decoded JSON data or None.
+    """
+
+    def __init__(self, message, status, data):
+        super().__init__(message)
+        self.status = status
+        self.data = data
+
+
+class AsyncApiWrapper:
+    """Asyncio wrapper for the Token Terminal API.
+
+    Requests are made with an `aiohttp.ClientSession` over a pool of up to
+    `max_connections` connections that are kept alive and reused, so no more
+    than `max_connections` requests are made concurrently. The proxies of the
+    environment (`HTTPS_PROXY`, `NO_PROXY`, etc.) are used as in
+    `api_wrapper.ApiWrapper`. Responses are decoded as they are received, and
+    the API key is only validated by the first request (instead of a separate
+    request when the wrapper is created). Redirects to other URLs of the API
+    are followed, but redirects to other hosts raise `ApiError`, so the API
+    key is never sent to another host.
+
+    Sessions belong to the event loop they are opened in, so a wrapper that
+    is used in another event loop (e.g. by a second call of `asyncio.run`)
+    opens a new session, and should be closed before the end of each event
+    loop it is used in.
+
+    Requests that fail with a connection error or with one of the
+    `api_wrapper.RETRY_STATUSES` are retried with exponential backoff, and
+    requests that still fail with an error status raise `ApiError`.
+
+    Usage:
+
+        async with AsyncApiWrapper(key) as tt:
+            projects = await tt.get_all_projects()
+
+    Args:
+        key: str
+        base_url: str, optional
+        max_connections: int, optional
+        max_retries: int defining the number of times a request is retried,
+            optional
+        backoff: float defining the delay in seconds before the first retry of
+            a request, which doubles with every retry, optional
+        timeout: float defining the timeout in seconds of connecting and of
+            every read from a connection, optional
+
+    Attributes:
+        key: str
+        headers: str
+        base_url: str
+        max_connections: int
+        max_retries: int
+        backoff: float
+        timeout: float
+        n_connections: int defining the number of connections opened.
+    """
+
+    def __init__(
+        self,
+        key,
+        base_url="https://api.tokenterminal.com/",
+        max_connections=8,
+        max_retries=5,
+        backoff=0.5,
+        timeout=60,
+    ):
+
+        self.key = key
+        self.headers = {"Authorization": f"Bearer {self.key}"}
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.n_connections = 0
+
+        url = urllib.parse.urlsplit(base_url)
+        self._scheme = url.scheme
+        self._host = url.hostname
+        self._port = url.port or (443 if url.scheme == "https" else 80)
+        self._netloc = url.netloc.rsplit("@", 1)[-1]  # Host (and port) of the API
+        self._path = url.path if url.path.endswith("/") else url.path + "/"
+        self._loop = None  # Event loop of the session
+        self._session = None
+        self._validated = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Close the session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _bind_loop(self):
+        """Return the session of the running event loop, opening it if needed.
+
+        Returns:
+            aiohttp.ClientSession.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop or self._session is None:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._count_connection)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.timeout, sock_read=self.timeout
+                ),
+                trust_env=True,
+                trace_configs=[trace],
+            )
+            self._loop = loop
+        return self._session
+
+    async def _count_connection(self, session, context, params):
+        self.n_connections += 1
+
+    async def _request(self, target):
+        """Make a single GET request to the API and decode its JSON response.
+
+        Args:
+            target: str defining the path (and query) of the request
+
+        Returns:
+            tuple of the status code, headers (with lower-case names), and
+            decoded data of the response
+        """
+        session = self._bind_loop()
+        async with session.get(
+            f"{self._scheme}://{self._netloc}{target}",
+            headers={"Accept": "application/json"},
+            allow_redirects=False,
+        ) as response:
+            headers = {name.lower(): value for name, value in response.headers.items()}
+            if 200 <= response.status < 300:
+                data = await _decode_json(response.content.iter_chunked(1 << 16))
+            else:  # Other responses are not necessarily JSON
+                try:
+                    data = json.loads(await response.read())
+                except ValueError:
+                    data = None
+        return response.status, headers, data
+
+    async def _get(self, path, params=None):
+        """Make a GET request to the API, retrying failed requests.
+
+        Args:
+            path: str defining the path of the endpoint relative to `base_url`
+            params: dict, optional
+
+        Returns:
+            decoded JSON data of the response
+
+        Raises:
+            ApiError: if the response of the last attempt has an error status.
+        """
+        target = self._path + path
+        if params:
+            target += "?" + urllib.parse.urlencode(params)
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, headers, data = await self._fetch(target)
+            except (
+                aiohttp.ClientConnectionError,
+                aiohttp.ClientPayloadError,
+                asyncio.TimeoutError,
+            ):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                # The key is validated by the first response
+                if not self._validated:
+                    if status in [401, 403]:
+                        raise ValueError(f"Authentication failed ({status})")
+                    self._validated = status == 200
+                if status not in RETRY_STATUSES or attempt == self.max_retries:
+                    if status >= 400:
+                        raise ApiError(
+                            f"Request to {path} failed ({status})", status, data
+                        )
+                    return data
+                retry_after = headers.get("retry-after", "")
+                if retry_after.isdigit():
+                    await asyncio.sleep(int(retry_after))
+                    continue
+            await asyncio.sleep(self.backoff * 2**attempt)
+
+    async def _fetch(self, target):
+        """Make a GET request to the API, following redirects to other URLs of
+        the API.
+
+        Args:
+            target: str defining the path (and query) of the request
+
+        Returns:
+            tuple of the status code, headers (with lower-case names), and
+            decoded data of the response
+
+        Raises:
+            ApiError: if the response redirects to another host, or there are
+                more than `MAX_REDIRECTS` redirects.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, data = await self._request(target)
+            if status not in REDIRECT_STATUSES:
+                return status, headers, data
+            location = headers.get("location", "")
+            url = urllib.parse.urlsplit(
+                urllib.parse.urljoin(
+                    f"{self._scheme}://{self._netloc}{target}", location
+                )
+            )
+            port = url.port or (443 if url.scheme == "https" else 80)
+            if not location or (url.scheme, url.hostname, port) != (
+                self._scheme,
+                self._host,
+                self._port,
+            ):
+                raise ApiError(
+                    f"Redirect to {location or 'no location'} is not followed "
+                    f"({status})",
+                    status,
+                    data,
+                )
+            target = url.path + (f"?{url.query}" if url.query else "")
+        raise ApiError(f"Too many redirects ({target})", status, data)
+
+    async def get_all_projects(self):
+        """Return an overview of the latest data for all listed projects.
+
+        Returns:
+            list
+        """
+        return await self._get("v1/projects")
+
+    async def get_historical_data(
+        self, project_id, interval="daily", data_granularity="project"
+    ):
+        """Return the historical data of a given project.
+
+        Args:
+            project_id: str
+            interval: {'daily', 'monthly'}, optional
+            data_granularity: {'project', 'top10', 'component'}, optional
+
+        Returns:
+            list
+        """
+        params = {"interval": interval, "data_granularity": data_granularity}
+        return await self._get(f"v1/projects/{project_id}/metrics", params=params)
+
+    async def get_historical_data_many(self, project_ids, callback=None, **kwargs):
+        """Return the historical data of many projects, making up to
+        `max_connections` requests concurrently.
+
+        Args:
+            project_ids: list of str
+            callback: function called with each project id and its historical
+                data as soon as it is received, optional
+            **kwargs: keyword arguments of `get_historical_data`
+
+        Returns:
+            dict mapping each project id to its historical data, in the order
+            of `project_ids`
+        """
+
+        async def get(project_id):
+            data = await self.get_historical_data(project_id, **kwargs)
+            if callback is not None:
+                callback(project_id, data)
+            return data
+
+        data = await asyncio.gather(*[get(project_id) for project_id in project_ids])
+        return dict(zip(project_ids, data))
+
+
+async def _decode_json(chunks):
+    """Decode JSON data received in chunks.
+
+    The items of a top-level array are decoded as soon as they are received,
+    so the text of the whole response is never held in memory at once.
+
+    Args:
+        chunks: async iterable of bytes.
+
+    Returns:
+        decoded data.
+    """
+    text = codecs.getincrementaldecoder("utf-8")()
+    parts = []  # Text of a response that is not an array
+    array = None
+    async for chunk in chunks:
+        decoded = text.decode(chunk)
+        if array is None and not parts:
+            stripped = decoded.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] == "[":
+                array = _ArrayDecoder()
+                decoded = stripped[1:]
+        if array is None:
+            parts.append(decoded)
+        else:
+            array.feed(decoded)
+    text.decode(b"", final=True)
+
+    if array is None:
+        return json.loads("".join(parts)) if parts else None
+    return array.close()
+
+
+class _ArrayDecoder:
+    """Decoder of the items of a JSON array received in pieces.
+
+    Every character is only scanned once: the decoder keeps track of the
+    nesting and strings of the item being received, and decodes each item once
+    all of its text has been received.
+
+    Attributes:
+        items: list of the decoded items.
+    """
+
+    def __init__(self):
+        self.items = []
+        self._decoder = json.JSONDecoder()
+        self._parts = []  # Text of the item being received
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._separated = True  # Whether an item can start, after a comma
+        self._end = None  # Text from the end of the array, once it is received
+
+    def feed(self, text):
+        """Decode the items whose text ends in a piece of the array.
+
+        Args:
+            text: str with the text of the array after the previous pieces.
+        """
+        pos = 0
+        while pos < len(text):
+            if self._end is not None:
+                self._end += text[pos:]
+                return
+            start = pos
+            if not self._parts:  # Skip to the start of the next item
+                while pos < len(text) and text[pos] in " \t\r\n":
+                    pos += 1
+                if pos == len(text):
+                    return
+                char = text[pos]
+                if char == "]":
+                    if self._separated and self.items:  # Comma before the end
+                        raise ValueError("Invalid JSON array in response")
+                    self._end = ""
+                    continue
+                if char == ",":
+                    if self._separated:  # Comma without a previous item
+                        raise ValueError("Invalid JSON array in response")
+                    self._separated = True
+                    pos += 1
+                    continue
+                if not self._separated:  # Items without a comma between them
+                    raise ValueError("Invalid JSON array in response")
+                start = pos
+            end = self._scan(text, pos)
+            if end is None:  # The item continues in the next piece
+                self._parts.append(text[start:])
+                return
+            self._parts.append(text[start:end])
+            item_text = "".join(self._parts)
+            self._parts = []
+            item, item_end = self._decoder.raw_decode(item_text)
+            if item_end != len(item_text):
+                raise ValueError("Invalid JSON array in response")
+            self.items.append(item)
+            self._separated = False
+            pos = end
+
+    def _scan(self, text, pos):
+        """Return the position where the item being received ends in a piece
+        of the array, or None if it does not end in it."""
+        while True:
+            if self._in_string:
+                if self._escape:
+                    if pos == len(text):
+                        return None
+                    pos += 1
+                    self._escape = False
+                match = _STRING_DELIMITERS.search(text, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                    continue
+                self._in_string = False
+                if self._depth == 0:
+                    return pos
+                continue
+
+            delimiters = _NESTED_DELIMITERS if self._depth else _DELIMITERS
+            match = delimiters.search(text, pos)
+            if match is None:
+                return None
+            char = match.group()
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                if self._depth == 0:  # End of the array after a number, etc.
+                    return match.start()
+                self._depth -= 1
+                if self._depth == 0:
+                    return match.end()
+            elif self._depth == 0:  # Whitespace or comma after a number, etc.
+                return match.start()
+            pos = match.end()
+
+    def close(self):
+        """Return the items of the array once all of its text is received.
+
+        Returns:
+            list.
+
+        Raises:
+            ValueError: if the text is not a complete JSON array.
+        """
+        if self._parts or self._end is None or self._end.strip() != "]":
+            raise ValueError("Invalid JSON array in response")
+        return self.items
@@ -3,21 +3,72 @@
 
 import datetime
 import json
+import math
+import time
 import warnings
 
 import numpy as np
 import pandas as pd
 from scipy.optimize import basinhopping
 
+from checkpoint import load_checkpoint, save_checkpoint
+from panel import HistoricalPanel
+from profiling import phase
+from ranking import descending_order
+from results import BacktestResults
+
 
 TOL = 1e-6
 SEED = 123
+REBALANCE_STATUSES = [
+    "pre-rebalance",
+    "rebalance-init",
+    "rebalance-target",
+    "rebalanced",
+]
+LEDGER_COLUMNS = [
+    "day",
+    "component",
+    "id",
+    "weight_pre",
+    "weight_init",
+    "weight_target",
+    "weight_post",
+    "rebalance",
+    "value",
+]
+
+
+class InfeasibleWeightsError(Exception):
+    """Raised when no set of weights can satisfy the rebalancing constraints.
 
+    Args:
+        message: str.
+        lower: 1D floating-point numpy.ndarray containing the per-project
+            lower bounds implied by `min_weight` and `max_change`.
+        upper: 1D floating-point numpy.ndarray containing the per-project
+            upper bounds implied by `max_weight` and `max_change`.
+
+    Attributes:
+        lower: 1D floating-point numpy.ndarray.
+        upper: 1D floating-point numpy.ndarray.
+    """
+
+    def __init__(self, message, lower, upper):
+        super().__init__(message)
+        self.lower = lower
+        self.upper = upper
 
-def _calculate_weights(original, target, max_change, min_weight, max_weight):
-    """Calculate portfolio component weights by trying to move from `original`
-    to `target` within the constraints using non-linear least squares using
-    basin-hopping.
+
+def _project_weights(original, target, max_change, min_weight, max_weight, info=None):
+    """Calculate the exact least-squares projection of `target` onto the set of
+    weights that sum to one and lie within the box
+    `[max(min_weight, original - max_change), min(max_weight, original + max_change)]`.
+
+    The solution has the form `clip(target + mu, lower, upper)`, where the sum
+    of the clipped weights is a piecewise-linear, non-decreasing function of the
+    Lagrange multiplier `mu`. The multiplier is found exactly by walking the
+    sorted breakpoints of that function.
 
     Args:
         original: 1D floating-point numpy.ndarray.
@@ -25,13 +76,81 @@ def _calculate_weights(original, target, max_change, min_weight, max_weight):
         max_change: float.
         min_weight: float.
         max_weight: float.
+        info: dict where the diagnostics of the calculation ("nit", the number
+            of breakpoints walked, "nfev", and "success") are saved.
 
     Returns:
         1D floating-point numpy.ndarray containing the new weights.
+
+    Raises:
+        InfeasibleWeightsError: if the constraints cannot be met simultaneously.
     """
 
-    if not np.isclose(sum(target), 1):
-        raise ValueError("Target weights are not normalized")
+    original = np.asarray(original, dtype=float)
+    target = np.asarray(target, dtype=float)
+    lower = np.maximum(min_weight, original - max_change)
+    upper = np.minimum(max_weight, original + max_change)
+
+    if np.any(lower > upper + TOL):
+        raise InfeasibleWeightsError(
+            f"Bounds are empty for {np.sum(lower > upper + TOL)} project(s)",
+            lower,
+            upper,
+        )
+    upper = np.maximum(lower, upper)
+    if sum(lower) > 1 + TOL:
+        raise InfeasibleWeightsError(
+            f"Lower bounds sum to {sum(lower)} > 1", lower, upper
+        )
+    if sum(upper) < 1 - TOL:
+        raise InfeasibleWeightsError(
+            f"Upper bounds sum to {sum(upper)} < 1", lower, upper
+        )
+
+    # Breakpoints of the total weight as a function of mu: the slope increases
+    # by one when a weight leaves its lower bound and decreases by one when it
+    # reaches its upper bound
+    breakpoints = np.concatenate([lower - target, upper - target])
+    slopes = np.concatenate([np.ones(len(target)), -np.ones(len(target))])
+    order = np.argsort(breakpoints, kind="mergesort")
+    breakpoints = breakpoints[order]
+    slopes = np.cumsum(slopes[order])
+    totals = np.sum(lower) + np.concatenate(
+        [[0.0], np.cumsum(slopes[:-1] * np.diff(breakpoints))]
+    )
+
+    k = np.searchsorted(totals, 1.0, side="left")
+    if k == 0:
+        mu = breakpoints[0]
+    elif k == len(totals):
+        mu = breakpoints[-1]
+    else:
+        mu = breakpoints[k - 1] + (1.0 - totals[k - 1]) / slopes[k - 1]
+
+    if info is not None:
+        info.update(nit=int(k), nfev=0, success=True)
+    return np.clip(target + mu, lower, upper)
+
+
+def _basinhopping_weights(
+    original, target, max_change, min_weight, max_weight, info=None
+):
+    """Calculate portfolio component weights using basin-hopping with SLSQP as
+    the local minimizer.
+
+    Args:
+        original: 1D floating-point numpy.ndarray.
+        target: 1D floating-point numpy.ndarray.
+        max_change: float.
+        min_weight: float.
+        max_weight: float.
+        info: dict where the diagnostics of the optimization ("nit", the
+            number of basin-hopping iterations, "nfev", and "success") are
+            saved.
+
+    Returns:
+        1D floating-point numpy.ndarray containing the new weights.
+    """
 
     def cost(x):
         return sum((x - target) ** 2)
@@ -51,7 +170,7 @@ def _calculate_weights(original, target, max_change, min_weight, max_weight):
             "Values in x were outside bounds during a minimize step, clipping to bounds",
             RuntimeWarning,
         )
-        results = basinhopping(
+        optimization = basinhopping(
             cost,
             original,
             minimizer_kwargs={
@@ -61,24 +180,175 @@ def _calculate_weights(original, target, max_change, min_weight, max_weight):
                 "tol": TOL,
             },
             seed=SEED,
-        ).lowest_optimization_result
+        )
+    results = optimization.lowest_optimization_result
 
+    if info is not None:
+        info.update(
+            nit=int(optimization.nit),
+            nfev=int(optimization.nfev),
+            success=bool(results.success),
+        )
     if not results.success:
         raise Exception(f"Weight calculation was not successful ({results.message})")
 
-    if not np.isclose(sum(results.x), 1):
+    return results.x
+
+
+def _calculate_weights(
+    original,
+    target,
+    max_change,
+    min_weight,
+    max_weight,
+    solver="basinhopping",
+    cache=None,
+    profiler=None,
+):
+    """Calculate portfolio component weights by trying to move from `original`
+    to `target` within the constraints using non-linear least squares.
+
+    Args:
+        original: 1D floating-point numpy.ndarray.
+        target: 1D floating-point numpy.ndarray.
+        max_change: float.
+        min_weight: float.
+        max_weight: float.
+        solver: "basinhopping" to use basin-hopping with SLSQP as the local
+            minimizer (reference implementation), or "exact" to use the exact
+            projection calculated by `_project_weights`.
+        cache: weight_cache.WeightCache used to reuse the weights calculated
+            for the same inputs. If not given, weights are always calculated.
+        profiler: profiling.Profiler used to time the calculation and record
+            its diagnostics.
+    Returns:
+        1D floating-point numpy.ndarray containing the new weights.
+    """
+
+    if not np.isclose(sum(target), 1):
+        raise ValueError("Target weights are not normalized")
+
+    if profiler is None:
+        return _solve_weights(
+            original, target, max_change, min_weight, max_weight, solver, cache
+        )
+
+    info = {"cached": True, "nit": 0, "nfev": 0, "success": True}
+    start = time.perf_counter()
+    try:
+        with profiler.phase("weights"):
+            return _solve_weights(
+                original,
+                target,
+                max_change,
+                min_weight,
+                max_weight,
+                solver,
+                cache,
+                info,
+            )
+    except Exception:
+        info["success"] = False
+        raise
+    finally:
+        profiler.solver_call(
+            solver=solver,
+            n=len(target),
+            cached=info["cached"],
+            seconds=time.perf_counter() - start,
+            success=info["success"],
+            nit=info["nit"],
+            nfev=info["nfev"],
+        )
+
+
+def _solve_weights(
+    original, target, max_change, min_weight, max_weight, solver, cache, info=None
+):
+    """Calculate portfolio component weights and check that they meet the
+    constraints (see `_calculate_weights`).
+
+    Args:
+        original: 1D floating-point numpy.ndarray.
+        target: 1D floating-point numpy.ndarray.
+        max_change: float.
+        min_weight: float.
+        max_weight: float.
+        solver: "basinhopping" or "exact".
+        cache: weight_cache.WeightCache or None.
+        info: dict where "cached" and the diagnostics of the solver are saved.
+
+    Returns:
+        1D floating-point numpy.ndarray containing the new weights.
+    """
+
+    x = None
+    if cache is not None:
+        key = cache.key(original, target, max_change, min_weight, max_weight, solver)
+        x = cache.get(key)
+
+    if x is None:
+        if info is not None:
+            info["cached"] = False
+        if solver == "exact":
+            x = _project_weights(
+                original, target, max_change, min_weight, max_weight, info=info
+            )
+        elif solver == "basinhopping":
+            x = _basinhopping_weights(
+                original, target, max_change, min_weight, max_weight, info=info
+            )
+        else:
+            raise ValueError("solver must be 'basinhopping' or 'exact'")
+        if cache is not None:
+            cache.put(key, x)
+
+    if not np.isclose(sum(x), 1):
         raise Exception("Normalization constraint was not met")
 
-    if max(abs(results.x - original)) > max_change + TOL:
+    if max(abs(x - original)) > max_change + TOL:
         raise Exception("max_change constraint was not met")
 
-    if min(results.x) < min_weight - TOL:
+    if min(x) < min_weight - TOL:
         raise Exception("min_weight constraint was not met")
 
-    if max(results.x) > max_weight + TOL:
+    if max(x) > max_weight + TOL:
         raise Exception("max_weight constraint was not met")
 
-    return results.x
+    return x
+
+
+def _target_columns(
+    n_projects, date, historical_data, projects_to_include, min_circ_marketcap
+):
+    """Return the projects of a portfolio based on sales-to-price ratio.
+
+    Args:
+        n_projects: int.
+        date: datetime.date.
+        historical_data: panel.HistoricalPanel.
+        projects_to_include: list of strings.
+        min_circ_marketcap: float defining the minimum circulating market cap
+            in USD a project needs to have to be included.
+
+    Returns:
+        tuple of the row of the date in the panel and a 1D integer
+        numpy.ndarray with the columns of the projects in descending order of
+        sales-to-price ratio.
+    """
+    # The eligible projects of a date are ranked by sales-to-price ratio once
+    # per universe and minimum circulating market cap, so the projects of
+    # the portfolio are the first ones of the ranking
+    ranking = historical_data.ranking(projects_to_include, min_circ_marketcap)
+    row = historical_data.date_loc(date)
+    top = ranking.top(row, n_projects)
+    if n_projects > ranking.n_with_data(row):
+        raise Exception(f"Not enough projects with market cap and P/S data ({date})")
+    if n_projects > len(top):
+        raise Exception(
+            f"Not enough projects with sufficient circulating market cap ({date})"
+        )
+    return row, top
 
 
 def _calculate_target_portfolio(
@@ -90,6 +360,10 @@ def _calculate_target_portfolio(
     min_weight,
     max_weight,
     min_circ_marketcap,
+    solver="basinhopping",
+    cache=None,
+    targets=None,
+    profiler=None,
 ):
     """Calculate a portfolio based on sales-to-price ratio.
 
@@ -97,7 +371,8 @@ def _calculate_target_portfolio(
         n_projects: int.
         date: datetime.date.
         historical_data: pandas.core.frame.DataFrame containing the data
-            extracted by the script `extract_historical_data.py`.
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it.
         projects_to_include: list of strings.
         value: float defining the value in USD allocated to the projects of the
             portfolio.
@@ -107,47 +382,95 @@ def _calculate_target_portfolio(
             have.
         min_circ_marketcap: float defining the minimum circulating market cap
             in USD a project needs to have to be included.
+        solver: "basinhopping" or "exact" (see `_calculate_weights`).
+        cache: weight_cache.WeightCache (see `_calculate_weights`).
+        targets: dict used to reuse the portfolios calculated on the same date
+            with the same parameters (see `backtest`).
+        profiler: profiling.Profiler (see `backtest`).
 
     Returns:
         pandas.core.frame.DataFrame containing the details of the portfolio.
     """
 
-    # Filter data by date
-    df = historical_data[historical_data["datetime"] == str(date)]
+    with phase(profiler, "target_construction"):
+        # The weights of the portfolio do not depend on its value
+        key = (
+            str(date),
+            n_projects,
+            tuple(projects_to_include),
+            min_weight,
+            max_weight,
+            min_circ_marketcap,
+            solver,
+        )
+        if targets is not None and key in targets:
+            df = targets[key].copy()
+            df["tokens"] = df["weight"] * value / df["price"]
+            return df[
+                ["datetime", "project", "project_id", "weight", "tokens", "price", "sp"]
+            ]
+
+        if isinstance(historical_data, HistoricalPanel):
+            with phase(profiler, "data_lookup"):
+                row, top = _target_columns(
+                    n_projects,
+                    date,
+                    historical_data,
+                    projects_to_include,
+                    min_circ_marketcap,
+                )
+                df = historical_data.frame(row, top)
+        else:
+            with phase(profiler, "data_lookup"):
+                # Filter data by date
+                df = historical_data[historical_data["datetime"] == str(date)]
+
+                # Only keep data for projects in projects_to_include
+                df = df[df["project"].isin(projects_to_include)]
+
+            # Only keep data for projects with circulating market cap and sales-to-price data
+            df = df[(df["market_cap_circulating"].notna()) & (df["sp"].notna())]
+            if n_projects > len(df):
+                raise Exception(
+                    f"Not enough projects with market cap and P/S data ({date})"
+                )
 
-    # Only keep data for projects in projects_to_include
-    df = df[df["project"].isin(projects_to_include)]
+            # Apply minimum circulating market cap constraint
+            df = df[df.market_cap_circulating >= min_circ_marketcap]
+            if n_projects > len(df):
+                raise Exception(
+                    f"Not enough projects with sufficient circulating market cap ({date})"
+                )
 
-    # Only keep data for projects with circulating market cap and sales-to-price data
-    df = df[(df["market_cap_circulating"].notna()) & (df["sp"].notna())]
-    if n_projects > len(df):
-        raise Exception(f"Not enough projects with market cap and P/S data ({date})")
+            # Sort projects by sales-to-price ratio
+            df = df.sort_values("sp", ascending=False)[0:n_projects].reset_index(
+                drop=True
+            )
 
-    # Apply minimum circulating market cap constraint
-    df = df[df.market_cap_circulating >= min_circ_marketcap]
-    if n_projects > len(df):
-        raise Exception(
-            f"Not enough projects with sufficient circulating market cap ({date})"
+        # Calculate portfolio weights
+        target = df["sp"].values / sum(df["sp"])
+        original = np.copy(target)
+        original[original < min_weight] = min_weight
+        original[original > max_weight] = max_weight
+        df["weight"] = _calculate_weights(
+            original=original,
+            target=target,
+            max_change=1.0,
+            min_weight=min_weight,
+            max_weight=max_weight,
+            solver=solver,
+            cache=cache,
+            profiler=profiler,
         )
+        if targets is not None:
+            targets[key] = df.copy()
 
-    # Sort projects by sales-to-price ratio and calculate portfolio weights
-    df = df.sort_values("sp", ascending=False)[0:n_projects].reset_index(drop=True)
-    target = df["sp"].values / sum(df["sp"])
-    original = np.copy(target)
-    original[original < min_weight] = min_weight
-    original[original > max_weight] = max_weight
-    df["weight"] = _calculate_weights(
-        original=original,
-        target=target,
-        max_change=1.0,
-        min_weight=min_weight,
-        max_weight=max_weight,
-    )
-
-    # Calculate the numbers of tokens in the portfolio
-    df["tokens"] = df["weight"] * value / df["price"]
+        # Calculate the numbers of tokens in the portfolio
+        df["tokens"] = df["weight"] * value / df["price"]
 
-    return df[["datetime", "project", "project_id", "weight", "tokens", "price", "sp"]]
+        return df[
+            ["datetime", "project", "project_id", "weight", "tokens", "price", "sp"]
+        ]
 
 
 def _calculate_value(portfolio):
@@ -159,10 +482,9 @@ def _calculate_value(portfolio):
     Returns:
         float.
     """
-    value = 0
-    for _, row in portfolio.iterrows():
-        value += row["price"] * row["tokens"]
-    return value
+    # The built-in sum adds the project values in order, as in previous
+    # versions, so that exported values do not change in the last digits
+    return sum(portfolio["price"].values * portfolio["tokens"].values)
 
 
 def _get_project_metric(project, metric, date, historical_data):
@@ -173,11 +495,14 @@ def _get_project_metric(project, metric, date, historical_data):
         metric: str.
         date: datetime.date.
         historical_data: pandas.core.frame.DataFrame containing the data
-            extracted by the script `extract_historical_data.py`.
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it.
 
     Returns:
         int, float, or str.
     """
+    if isinstance(historical_data, HistoricalPanel):
+        return historical_data.get(metric, date, project)
     value = historical_data.loc[
         (historical_data["datetime"] == str(date))
         & (historical_data["project"] == project),
@@ -186,9 +511,74 @@ def _get_project_metric(project, metric, date, historical_data):
     return value
 
 
-def results_to_json(results, json_name="results", save_status=False):
+def _portfolio_to_dict(portfolio):
+    """Return the value and composition of a portfolio as saved by
+    `results_to_json`.
+
+    Args:
+        portfolio: pandas.core.frame.DataFrame containing the details of the
+            portfolio.
+
+    Returns:
+        dict.
+    """
+    composition = [
+        {
+            "weight": float(weight),
+            "tokens": float(tokens),
+            "price": float(price),
+            "sp": float(sp),
+            "component": project,
+            "id": project_id,
+        }
+        for weight, tokens, price, sp, project, project_id in zip(
+            portfolio["weight"].values,
+            portfolio["tokens"].values,
+            portfolio["price"].values,
+            portfolio["sp"].values,
+            portfolio["project"].tolist(),
+            portfolio["project_id"].tolist(),
+        )
+    ]
+    return {"value": float(_calculate_value(portfolio)), "composition": composition}
+
+
+def _results_by_day(results, save_status):
+    """Yield the data saved by `results_to_json` one day at a time.
+
+    Args:
+        results: dictionary generated by the backtest function (see
+            `results_to_json`).
+        save_status: bool (see `results_to_json`).
+
+    Yields:
+        tuple of the date and a dict with the data of that date.
+    """
+    date, data = None, None
+    for portfolio, status in zip(results["portfolios"], results["statuses"]):
+        portfolio_date = portfolio.iloc[0, 0]
+        if portfolio_date != date:
+            if data is not None:
+                yield date, data
+            date, data = portfolio_date, {}
+        if save_status is True:
+            data[status] = _portfolio_to_dict(portfolio)
+        else:
+            data = _portfolio_to_dict(portfolio)
+    if data is not None:
+        yield date, data
+
+
+def results_to_json(
+    results, json_name="results", save_status=False, indent=4, profiler=None
+):
     """Saves backtest results into a single .json file
 
+    Days are written to the file one at a time, so the data of all days is
+    never held in memory at once. Portfolios of the same day must be
+    consecutive in `results`, as they are in the output of the backtest
+    function.
+
     Args:
         results: dictionary generated by the backtest function containing
             details about the portfolios and their statuses
@@ -200,275 +590,304 @@ def results_to_json(results, json_name="results", save_status=False):
             days, the "latest" portfolio is the one with status = "rebalanced".
             In all other days, there is only one portfolio, so that is the one
             that is saved.
+        indent: int defining the indentation of the output json, or None to
+            write compact json without whitespace.
+        profiler: profiling.Profiler used to time the export (see `backtest`).
     """
+    with phase(profiler, "export"):
+        if indent is None:
+            separators = (",", ":")
+            newline = ""
+        else:
+            separators = (",", ": ")
+            newline = "\n" + " " * indent
+
+        with open(f"{json_name}.json", "w", encoding="utf-8") as file:
+            file.write("{")
+            empty = True
+            for date, data in _results_by_day(results, save_status):
+                text = json.dumps(
+                    data, ensure_ascii=False, indent=indent, separators=separators
+                )
+                file.write(
+                    ("" if empty else ",")
+                    + newline
+                    + json.dumps(date, ensure_ascii=False)
+                    + separators[1]
+                    + text.replace("\n", newline)
+                )
+                empty = False
+            file.write("}" if empty or indent is None else "\n}")
 
-    values = [_calculate_value(portfolio) for portfolio in results["portfolios"]]
 
-    data = {}
+def _ledger_rows(day, compositions, value):
+    """Return the rows of the rebalance ledger of a single rebalance day.
 
-    for portfolio, status, value in zip(
-        results["portfolios"], results["statuses"], values
-    ):
+    Args:
+        day: string formatted as "%Y-%m-%d".
+        compositions: dict mapping each status in `REBALANCE_STATUSES` to a
+            dict that maps the components of the portfolio with that status to
+            tuples of their id and weight.
+        value: float defining the value of the rebalanced portfolio.
 
-        date = portfolio.iloc[0, 0]
+    Returns:
+        list of tuples with the values of `LEDGER_COLUMNS`.
+    """
+    pre = compositions["pre-rebalance"]
+    init = compositions["rebalance-init"]
+    target = compositions["rebalance-target"]
+    post = compositions["rebalanced"]
+
+    rows = []
+    # All tokens in both the pre and post pfs, each looked up by key
+    for token in sorted(set(pre) | set(post)):
+        id = pre[token][0] if token in pre else post[token][0]
+        weight_pre = pre[token][1] if token in pre else np.nan
+        weight_post = post[token][1] if token in post else np.nan
+        rebalance = (0 if token not in post else weight_post) - (
+            0 if token not in pre else weight_pre
+        )
+        rows.append(
+            (
+                day,
+                token,
+                id,
+                weight_pre,
+                init[token][1] if token in init else np.nan,
+                target[token][1] if token in target else np.nan,
+                weight_post,
+                rebalance,
+                value * (0 if token not in post else weight_post),
+            )
+        )
+    return rows
 
-        if date not in data:
-            data[date] = {}
 
-        if save_status is True:
-            data[date][status] = {}
-            data[date][status]["value"] = float(value)
-            data[date][status]["composition"] = []
-        else:
-            data[date] = {}
-            data[date]["value"] = float(value)
-            data[date]["composition"] = []
-
-        for project in portfolio["project"]:
-            obj = {
-                "weight": float(
-                    portfolio[portfolio["project"] == project]["weight"].item()
-                ),
-                "tokens": float(
-                    portfolio[portfolio["project"] == project]["tokens"].item()
-                ),
-                "price": float(
-                    portfolio[portfolio["project"] == project]["price"].item()
-                ),
-                "sp": float(portfolio[portfolio["project"] == project]["sp"].item()),
-                "component": project,
-                "id": portfolio[portfolio["project"] == project]["project_id"].item(),
-            }
+def rebalance_ledger(results, profiler=None):
+    """Build the rebalance ledger of a backtest, i.e. the weight of every
+    component before, during, and after each rebalance.
 
-            if save_status is True:
-                data[date][status]["composition"].append(obj)
-            else:
-                data[date]["composition"].append(obj)
+    The ledger is built directly from the portfolios in memory, so the backtest
+    results do not need to be saved (with `save_status=True`) and read back.
 
-    with open(f"{json_name}.json", "w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+    Args:
+        results: dictionary generated by the backtest function (see
+            `results_to_json`).
+        profiler: profiling.Profiler used to time the export (see `backtest`).
 
+    Returns:
+        pandas.core.frame.DataFrame with the columns "day", "component", "id",
+        "weight_pre", "weight_init", "weight_target", "weight_post",
+        "rebalance", and "value", and one row per component of each rebalance.
+        Weights of components that are not in a portfolio are NaN.
+    """
+    with phase(profiler, "export"):
+        portfolios = results["portfolios"]
+        rows = []
+        day, compositions, value = None, {}, None
+        # Only the portfolios of rebalances are accessed, so compact results do
+        # not build the portfolios of other days
+        for k, status in enumerate(results["statuses"]):
+            if status not in REBALANCE_STATUSES:
+                continue
+            portfolio = portfolios[k]
+            portfolio_day = str(portfolio.iloc[0, 0])
+            if portfolio_day != day:
+                day, compositions = portfolio_day, {}
+            compositions[status] = dict(
+                zip(
+                    portfolio["project"].tolist(),
+                    zip(portfolio["project_id"].tolist(), portfolio["weight"].tolist()),
+                )
+            )
+            if status == "rebalanced":
+                value = float(_calculate_value(portfolio))
+                if all(s in compositions for s in REBALANCE_STATUSES):
+                    rows.extend(_ledger_rows(day, compositions, value))
+        return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
 
-def rebalances_to_json(path, json_name="rebalances", save_target=False):
-    """Creates rebalancing summary .json file from backtest results .json file
 
-    Args:
-        path: path to a backtest results .json file generated by the
-            results_to_json function
-        json_name: string which will be the output file name
-        save_target: boolean that defines whether init and target portfolios
-            are saved in the output json
-    """
+def _ledger_from_json(path):
+    """Build the rebalance ledger of a backtest from a results .json file
+    generated by the results_to_json function with `save_status=True`."""
 
-    # Load data from input .json file
     with open(path) as json_file:
         data = json.load(json_file)
 
-    data_new = {}
-
-    # Loop through all days, see when rebalances happened, save weight changes
+    rows = []
     for day in data:
+        if all(x in data[day] for x in REBALANCE_STATUSES):  # rebalance occured
+            compositions = {
+                status: {
+                    item["component"]: (item["id"], item["weight"])
+                    for item in data[day][status]["composition"]
+                }
+                for status in REBALANCE_STATUSES
+            }
+            rows.extend(
+                _ledger_rows(day, compositions, data[day]["rebalanced"]["value"])
+            )
+    return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
 
-        keys = list(data[day].keys())
-
-        if all(
-            x in keys
-            for x in [
-                "pre-rebalance",
-                "rebalance-init",
-                "rebalance-target",
-                "rebalanced",
-            ]
-        ):  # rebalance occured
-
-            data_new[day] = {}
-            data_new[day]["composition"] = []
-
-            # From this point onwards:
-            # - pf means portfolio
-            # - pre refers to pre-rebalancing data
-            # - post refers to post-rebalancing data
-
-            pf_pre = data[day]["pre-rebalance"]
-            pf_post = data[day]["rebalanced"]
-
-            composition_pre = pf_pre["composition"]
-            composition_post = pf_post["composition"]
-
-            if save_target:
-                pf_init = data[day]["rebalance-init"]
-                composition_init = pf_init["composition"]
-                pf_target = data[day]["rebalance-target"]
-                composition_target = pf_target["composition"]
-
-            tokens_pre = [comp["component"] for comp in composition_pre]
-            tokens_post = [comp["component"] for comp in composition_post]
-
-            # Initialize list with all tokens in both the pre and post pfs
-            tokens = sorted(list(set(tokens_pre + tokens_post)))
-
-            # Init lists for summary measures
-            values = []
-            weights_post = []
-            rebalances = []
-
-            # Loop through each token and calculate its weight change
-            for token in tokens:
-
-                # Get the token id (EAFP idiom)
-                try:
-                    id = next(
-                        item["id"]
-                        for item in composition_pre
-                        if item["component"] == token
-                    )
-                except StopIteration:
-                    id = next(
-                        item["id"]
-                        for item in composition_post
-                        if item["component"] == token
-                    )
-
-                # Get the indices of the current token in the pre and post pfs
-                token_post_idx = next(
-                    (
-                        idx
-                        for (idx, d) in enumerate(composition_post)
-                        if d["component"] == token
-                    ),
-                    None,
-                )
-                token_pre_idx = next(
-                    (
-                        idx
-                        for (idx, d) in enumerate(composition_pre)
-                        if d["component"] == token
-                    ),
-                    None,
-                )
 
-                # Get the weights of the current token in the pre and post pfs
-                weight_pre = (
-                    0
-                    if token_pre_idx is None
-                    else composition_pre[token_pre_idx]["weight"]
-                )
+def _ledger_weight(weight):
+    """Return a weight of the rebalance ledger as saved in the output files,
+    where components that are not in a portfolio have a weight of 0."""
+    return 0 if math.isnan(weight) else weight
 
-                weight_post = (
-                    0
-                    if token_post_idx is None
-                    else composition_post[token_post_idx]["weight"]
-                )
 
-                if save_target:
-                    token_init_idx = next(
-                        (
-                            idx
-                            for (idx, d) in enumerate(composition_init)
-                            if d["component"] == token
-                        ),
-                        None,
-                    )
-                    weight_init = (
-                        0
-                        if token_init_idx is None
-                        else composition_init[token_init_idx]["weight"]
-                    )
-                    token_target_idx = next(
-                        (
-                            idx
-                            for (idx, d) in enumerate(composition_target)
-                            if d["component"] == token
-                        ),
-                        None,
-                    )
-                    weight_target = (
-                        0
-                        if token_target_idx is None
-                        else composition_target[token_target_idx]["weight"]
-                    )
+def rebalances_to_json(path, json_name="rebalances", save_target=False, profiler=None):
+    """Creates rebalancing summary .json file from backtest results
 
-                # Calculate metrics and save to dictionary
-                weight_change = weight_post - weight_pre
-                allocation_usd = pf_post["value"] * weight_post
-
-                if save_target:
-                    obj = {
-                        "component": token,
-                        "id": id,
-                        "weight_pre": weight_pre,
-                        "weight_init": weight_init,
-                        "weight_target": weight_target,
-                        "weight_post": weight_post,
-                        "rebalance": weight_change,
-                        "value": allocation_usd,
-                    }
-                else:
-                    obj = {
-                        "component": token,
-                        "id": id,
-                        "weight_pre": weight_pre,
-                        "weight_post": weight_post,
-                        "rebalance": weight_change,
-                        "value": allocation_usd,
-                    }
+    Args:
+        path: path to a backtest results .json file generated by the
+            results_to_json function (with save_status=True), or a rebalance
+            ledger generated by the rebalance_ledger function
+        json_name: string which will be the output file name
+        save_target: boolean that defines whether init and target portfolios
+            are saved in the output json
+        profiler: profiling.Profiler used to time the export (see `backtest`).
+    """
+    with phase(profiler, "export"):
+        if isinstance(path, pd.DataFrame):
+            ledger = path
+        else:
+            ledger = _ledger_from_json(path)
 
-                data_new[day]["composition"].append(obj)
+        data_new = {}
 
-                values.append(allocation_usd)
-                weights_post.append(weight_post)
-                rebalances.append(weight_change)
+        columns = [ledger[c].tolist() for c in LEDGER_COLUMNS]
+        for row in zip(*columns):
+            day, token, id, pre, init, target, post, weight_change, allocation = row
+            if day not in data_new:
+                data_new[day] = {"composition": []}
 
+            obj = {"component": token, "id": id, "weight_pre": _ledger_weight(pre)}
+            if save_target:
+                obj["weight_init"] = _ledger_weight(init)
+                obj["weight_target"] = _ledger_weight(target)
+            obj["weight_post"] = _ledger_weight(post)
+            obj["rebalance"] = weight_change
+            obj["value"] = allocation
+            data_new[day]["composition"].append(obj)
+
+        for day in data_new:
+            composition = data_new[day]["composition"]
             # We include rebalancing info for all tokens, including adds
             # and removals, so we calculate the average of the absolute value
             # of the rebalances to keep track of the "magnitude" of the
             # rebalancing
-            rebalances_abs = [abs(x) for x in rebalances]
+            rebalances_abs = [abs(obj["rebalance"]) for obj in composition]
 
-            data_new[day]["value_total"] = sum(values)
-            data_new[day]["weight_post_total"] = sum(weights_post)
+            data_new[day]["value_total"] = sum(obj["value"] for obj in composition)
+            data_new[day]["weight_post_total"] = sum(
+                obj["weight_post"] for obj in composition
+            )
             data_new[day]["rebalance_abs_avg"] = sum(rebalances_abs) / len(
                 rebalances_abs
             )
 
-    with open(f"{json_name}.json", "w", encoding="utf-8") as file:
-        json.dump(data_new, file, ensure_ascii=False, indent=4)
+        with open(f"{json_name}.json", "w", encoding="utf-8") as file:
+            json.dump(data_new, file, ensure_ascii=False, indent=4)
 
 
-def rebalances_to_csv(path, csv_name="rebalances"):
-    """Converts rebalances.json into a csv file
+def rebalances_to_csv(path, csv_name="rebalances", profiler=None):
+    """Converts rebalancing summary into a csv file
 
     Args:
         path: path to a rebalances results .json file generated by the
-            rebalances_to_json function
+            rebalances_to_json function, or a rebalance ledger generated by
+            the rebalance_ledger function. Init and target weights that are
+            not in the .json file (i.e. save_target=False) are left empty.
         csv_name: string which will be the output file name
+        profiler: profiling.Profiler used to time the export (see `backtest`).
     """
+    with phase(profiler, "export"):
+        if isinstance(path, pd.DataFrame):
+            rows = zip(
+                path["day"].tolist(),
+                path["component"].tolist(),
+                *[
+                    [_ledger_weight(w) for w in path[c].tolist()]
+                    for c in [
+                        "weight_pre",
+                        "weight_init",
+                        "weight_target",
+                        "weight_post",
+                    ]
+                ],
+                path["rebalance"].tolist(),
+            )
+        else:
+            # Load data from input .json file
+            with open(path) as json_file:
+                data = json.load(json_file)
+            rows = (
+                (
+                    day,
+                    component["component"],
+                    component["weight_pre"],
+                    component.get("weight_init", ""),
+                    component.get("weight_target", ""),
+                    component["weight_post"],
+                    component["rebalance"],
+                )
+                for day in data
+                for component in data[day]["composition"]
+            )
 
-    # Load data from input .json file
-    with open(path) as json_file:
-        data = json.load(json_file)
+        with open(f"{csv_name}.csv", "w") as file:
 
-    with open(f"{csv_name}.csv", "w") as file:
+            # csv header
+            file.write(
+                "day,component,weight_pre,weight_init,weight_target,weight_post,rebalance\n"
+            )
 
-        # csv header
-        file.write(
-            "day,component,weight_pre,weight_init,weight_target,weight_post,rebalance\n"
-        )
+            # Loop through days/components and save details to the csv
+            for row in rows:
+                file.write(",".join(f"{x}" for x in row) + "\n")
 
-        # Loop through days/components and save details to the csv
-        for day in data:
 
-            for component in data[day]["composition"]:
+def _replacements(projects, weights, target_projects, target_weights, max_change):
+    """Find the projects of a portfolio that are replaced on a rebalance, and
+    the projects of the initial target portfolio that replace them.
 
-                file.write(
-                    f"{day},"
-                    f"{component['component']},"
-                    f"{component['weight_pre']},"
-                    f"{component['weight_init']},"
-                    f"{component['weight_target']},"
-                    f"{component['weight_post']},"
-                    f"{component['rebalance']}\n"
-                )
+    Projects that are not in the initial target (or have a target weight of
+    zero) and have a weight less than or equal to `max_change` are replaced, in
+    the order of the portfolio, by the projects of the initial target that are
+    not in the portfolio, in descending order of target weight.
+
+    Args:
+        projects: 1D numpy.ndarray with the projects of the portfolio.
+        weights: 1D floating-point numpy.ndarray with the weights of the
+            portfolio.
+        target_projects: 1D numpy.ndarray with the projects of the initial
+            target portfolio.
+        target_weights: 1D floating-point numpy.ndarray with the weights of the
+            initial target portfolio.
+        max_change: float.
+
+    Returns:
+        tuple of 1D integer numpy.ndarray instances containing the positions
+        of the replaced projects in the portfolio and the positions of the new
+        projects in the initial target portfolio.
+    """
+    projects = np.asarray(projects)
+    target_projects = np.asarray(target_projects)
+
+    # Target weight of every project of the portfolio, or 0 if not in target
+    target_w = np.zeros(len(projects))
+    in_target = np.isin(projects, target_projects)
+    sorter = np.argsort(target_projects, kind="mergesort")
+    found = sorter[np.searchsorted(target_projects, projects[in_target], sorter=sorter)]
+    target_w[in_target] = np.asarray(target_weights, dtype=float)[found]
+
+    replaced = np.flatnonzero((target_w < TOL) & (np.asarray(weights) <= max_change))
+    new = np.flatnonzero(~np.isin(target_projects, projects))
+    new = new[descending_order(np.asarray(target_weights, dtype=float)[new])]
+    if len(replaced) > len(new):
+        raise IndexError("Not enough new projects to replace projects with")
+    return replaced, new[: len(replaced)]
 
 
 def _rebalance(
@@ -480,6 +899,10 @@ def _rebalance(
     min_circ_marketcap,
     historical_data,
     projects_to_include,
+    solver="basinhopping",
+    cache=None,
+    targets=None,
+    profiler=None,
 ):
     """Calculate a portfolio based on a given portfolio and sales-to-price
     ratios. The new weights are constrained to be within `max_change` from what
@@ -498,8 +921,13 @@ def _rebalance(
         min_circ_marketcap: float defining the minimum circulating market cap
             in USD a project needs to have to be included.
         historical_data: pandas.core.frame.DataFrame containing the data
-            extracted by the script `extract_historical_data.py`.
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it.
         projects_to_include: list of strings.
+        solver: "basinhopping" or "exact" (see `_calculate_weights`).
+        cache: weight_cache.WeightCache (see `_calculate_weights`).
+        targets: dict (see `backtest`).
+        profiler: profiling.Profiler (see `backtest`).
 
     Returns:
         tuple of pandas.core.frame.DataFrame instances containing the details
@@ -515,66 +943,183 @@ def _rebalance(
         sales-to-price ratios of these projects.
     """
 
-    pf = portfolio.copy()
-    n_projects = len(pf)
-    value = _calculate_value(pf)
-
-    # Calculate initial target portfolio
-    init_target_pf = _calculate_target_portfolio(
-        n_projects=n_projects,
-        date=date,
-        historical_data=historical_data,
-        projects_to_include=projects_to_include,
-        value=value,
-        min_weight=min_weight,
-        max_weight=max_weight,
-        min_circ_marketcap=min_circ_marketcap,
-    )
+    with phase(profiler, "rebalance"):
+        pf = portfolio.copy()
+        n_projects = len(pf)
+        value = _calculate_value(pf)
+
+        # Calculate initial target portfolio
+        init_target_pf = _calculate_target_portfolio(
+            n_projects=n_projects,
+            date=date,
+            historical_data=historical_data,
+            projects_to_include=projects_to_include,
+            value=value,
+            min_weight=min_weight,
+            max_weight=max_weight,
+            min_circ_marketcap=min_circ_marketcap,
+            solver=solver,
+            cache=cache,
+            targets=targets,
+            profiler=profiler,
+        )
 
-    # Replace projects with low enough weight that are not in the initial target
-    new_projects = (
-        init_target_pf[~np.isin(init_target_pf["project"], pf["project"])]
-        .sort_values(by="weight", ascending=False)
-        .reset_index(drop=True)
-    )
-    replaced = 0
-    for i, p in enumerate(pf["project"]):
-        if p not in init_target_pf["project"].values:
-            target_w = 0
+        # Replace projects with low enough weight that are not in the initial target
+        replaced, new = _replacements(
+            pf["project"].values,
+            pf["weight"].values,
+            init_target_pf["project"].values,
+            init_target_pf["weight"].values,
+            max_change,
+        )
+        if len(replaced) > 0:
+            for column in pf.columns:
+                values = pf[column].values.copy()
+                if column in ["weight", "tokens"]:
+                    values[replaced] = 0
+                else:
+                    values[replaced] = init_target_pf[column].values[new]
+                pf[column] = values
+
+        # Calculate final target portfolio weights
+        target_pf = pf.copy()
+        target_pf["weight"] = _calculate_weights(
+            original=np.ones(n_projects) / n_projects,
+            target=target_pf["sp"].values / sum(target_pf["sp"]),
+            max_change=1.0,
+            min_weight=min_weight,
+            max_weight=max_weight,
+            solver=solver,
+            cache=cache,
+            profiler=profiler,
+        )
+
+        # Calculate portfolio weights after rebalancing
+        pf["weight"] = _calculate_weights(
+            original=pf["weight"].values,
+            target=target_pf["weight"].values,
+            max_change=max_change,
+            min_weight=min_weight,
+            max_weight=1.0,
+            solver=solver,
+            cache=cache,
+            profiler=profiler,
+        )
+
+        # Update numbers of tokens
+        pf["tokens"] = pf["weight"] * value / pf["price"]
+        target_pf["tokens"] = target_pf["weight"] * value / target_pf["price"]
+
+        return pf, init_target_pf, target_pf
+
+
+def _is_rebalance_day(i, date, rebalancing_frequency):
+    """Return whether the portfolio is rebalanced on a given day.
+
+    Args:
+        i: int defining the number of days since the start of the backtest.
+        date: datetime.date.
+        rebalancing_frequency: "monthly" or a positive integer representing the
+            number of days between rebalances.
+
+    Returns:
+        bool.
+    """
+    if i == 0:
+        return False
+    if rebalancing_frequency == "monthly":
+        return date.day == 1
+    return i % rebalancing_frequency == 0
+
+
+def _check_prices(prices, dates, projects):
+    """Raise an error if a project of a portfolio has no price on a date.
+
+    Args:
+        prices: 2D floating-point numpy.ndarray (dates x projects).
+        dates: list of datetime.date instances.
+        projects: list of strings.
+    """
+    missing = np.argwhere(np.isnan(prices))
+    if len(missing) > 0:
+        d, j = missing[0]
+        raise ValueError(f"There is no price for {projects[j]} on {dates[d]}")
+
+
+def _mark_to_market(portfolio, dates, historical_data):
+    """Calculate the weights, prices, and sales-to-price ratios of a portfolio
+    over consecutive days on which the numbers of tokens do not change.
+
+    Args:
+        portfolio: pandas.core.frame.DataFrame containing the details of the
+            portfolio.
+        dates: list of datetime.date instances.
+        historical_data: panel.HistoricalPanel.
+
+    Returns:
+        tuple of 2D floating-point numpy.ndarray instances (dates x projects)
+        containing the weights, prices, and sales-to-price ratios.
+    """
+    rows = [historical_data.date_loc(date) for date in dates]
+    columns = historical_data.project_loc(portfolio["project"])
+    prices = historical_data.price[np.ix_(rows, columns)]
+    _check_prices(prices, dates, list(portfolio["project"]))
+    sps = historical_data.sp[np.ix_(rows, columns)]
+    tokens = portfolio["tokens"].values.astype(float)
+    values = prices @ tokens
+    weights = prices * tokens / values[:, np.newaxis]
+    return weights, prices, sps
+
+
+def _save_portfolio(results, day, portfolio, status, profiler=None):
+    """Save a portfolio in the results of a backtest.
+
+    Args:
+        results: dict of lists with the keys "portfolios" and "statuses", or
+            results.BacktestResults.
+        day: int defining the number of days since the start of the backtest.
+        portfolio: pandas.core.frame.DataFrame containing the details of the
+            portfolio.
+        status: str.
+        profiler: profiling.Profiler (see `backtest`).
+    """
+    with phase(profiler, "recording"):
+        if isinstance(results, BacktestResults):
+            results.record(day, status, portfolio)
         else:
-            target_w = init_target_pf.loc[
-                init_target_pf["project"] == p, "weight"
-            ].item()
-        if target_w < TOL and pf.loc[i, "weight"] <= max_change:
-            pf.iloc[[i]] = new_projects.iloc[[replaced]]
-            for m in ["weight", "tokens"]:
-                pf.loc[i, m] = 0
-            replaced += 1
-
-    # Calculate final target portfolio weights
-    target_pf = pf.copy()
-    target_pf["weight"] = _calculate_weights(
-        original=np.ones(n_projects) / n_projects,
-        target=target_pf["sp"].values / sum(target_pf["sp"]),
-        max_change=1.0,
-        min_weight=min_weight,
-        max_weight=max_weight,
-    )
+            results["portfolios"].append(portfolio)
+            results["statuses"].append(status)
 
-    # Calculate portfolio weights after rebalancing
-    pf["weight"] = _calculate_weights(
-        original=pf["weight"].values,
-        target=target_pf["weight"].values,
-        max_change=max_change,
-        min_weight=min_weight,
-        max_weight=1.0,
-    )
 
-    # Update numbers of tokens
-    pf["tokens"] = pf["weight"] * value / pf["price"]
-    target_pf["tokens"] = target_pf["weight"] * value / target_pf["price"]
+def _validate_strategy(
+    n_projects, min_circ_marketcap, min_weight, max_weight, max_change
+):
+    """Check the parameters that define the rules of the index (see
+    `backtest`).
 
-    return pf, init_target_pf, target_pf
+    Raises:
+        ValueError: if a parameter is not valid.
+    """
+    if type(n_projects) is not int or n_projects <= 0:
+        raise ValueError("n_projects must be a positive integer")
+    if type(min_circ_marketcap) is not float or min_circ_marketcap <= 0:
+        raise ValueError("min_circ_marketcap must be a positive float")
+    if (
+        type(min_weight) is not float
+        or min_weight <= 0
+        or min_weight > min_weight > 1 / n_projects
+    ):
+        raise ValueError(
+            "min_weight must be a float greater than 0 and less than or equal to 1/n_projects"
+        )
+    if type(max_weight) is not float or max_weight <= 0 or max_weight > 1:
+        raise ValueError("max_weight must be greater than 0 and less or equal to 1")
+    if max_weight < 1 / n_projects:
+        raise ValueError("max_weight must greater than or equal to 1/n_projects")
+    if max_weight <= min_weight:
+        raise ValueError("max_weight must be greater than min_weight")
+    if type(max_change) is not float or max_change <= 0 or max_change > 1:
+        raise ValueError("max_change must be greater than 0 and less or equal to 1")
 
 
 def backtest(
@@ -590,6 +1135,13 @@ def backtest(
     rebalancing_frequency,
     end_date=None,
     quiet=True,
+    solver="basinhopping",
+    cache=None,
+    engine="daily",
+    compact=False,
+    checkpoint=None,
+    targets=None,
+    profiler=None,
 ):
     """Backtest the Token Terminal Index by simulating historical performance.
 
@@ -606,7 +1158,9 @@ def backtest(
             is allowed to change during rebalancing.
         start_date : datetime.date.
         historical_data: pandas.core.frame.DataFrame containing the data
-            extracted by the script `extract_historical_data.py`.
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it. A data frame is converted into
+            a panel once before the simulation starts.
         projects_to_include: list of strings.
         rebalancing_frequency: "monthly" or a positive integer representing the
             number of days between rebalances.
@@ -614,40 +1168,56 @@ def backtest(
             for which there is data in `historical_data`.
         quiet : bool defining whether not to print messages about the progress
             of computation.
+        solver: "basinhopping" to calculate weights with basin-hopping (the
+            reference implementation), or "exact" to use the much faster exact
+            projection (see `_calculate_weights`).
+        cache: weight_cache.WeightCache used to reuse weights calculated for
+            the same inputs, e.g. in previous backtests (see
+            `_calculate_weights`).
+        engine: "daily" to update the portfolio one day at a time (reference
+            implementation), or "interval" to calculate all days between two
+            rebalances at once with array operations.
+        compact: bool defining whether to return results.BacktestResults,
+            which only stores the portfolios calculated on rebalance days and
+            builds all other portfolios on demand. Requires the "interval"
+            engine.
+        checkpoint: path to a checkpoint file. If the file was saved by a
+            backtest with the same parameters and the historical data up to
+            its last day has not changed since, the backtest resumes from the
+            day after that (backtests that do not return compact results
+            rebuild the portfolios of the days of the checkpoint from its
+            stored rebalances instead of calculating them again). Otherwise,
+            the backtest starts from `start_date`. The checkpoint is updated at
+            the end of the backtest.
+        targets: dict used to reuse the initial target portfolios calculated
+            on the same dates with the same parameters, e.g. by backtests with
+            different start dates (see `walk_forward.walk_forward`). Target
+            portfolios calculated by the backtest are added to it.
+        profiler: profiling.Profiler used to time the phases of the backtest
+            and record the diagnostics of the weight optimizations. Its
+            timings and diagnostics are also saved in the results, under the
+            key "profile".
 
     Returns:
         dict of pandas.core.frame.DataFrame instances containing the details of
-        the portfolios over time.
+        the portfolios over time, or results.BacktestResults if `compact` is
+        True.
     """
 
     # Validate input
-    if type(n_projects) is not int or n_projects <= 0:
-        raise ValueError("n_projects must be a positive integer")
+    _validate_strategy(
+        n_projects, min_circ_marketcap, min_weight, max_weight, max_change
+    )
     if type(initial_investment) is not float or initial_investment <= 0:
         raise ValueError("initial_investment must be a positive float")
-    if type(min_circ_marketcap) is not float or min_circ_marketcap <= 0:
-        raise ValueError("min_circ_marketcap must be a positive float")
-    if (
-        type(min_weight) is not float
-        or min_weight <= 0
-        or min_weight > min_weight > 1 / n_projects
-    ):
-        raise ValueError(
-            "min_weight must be a float greater than 0 and less than or equal to 1/n_projects"
-        )
-    if type(max_weight) is not float or max_weight <= 0 or max_weight > 1:
-        raise ValueError("max_weight must be greater than 0 and less or equal to 1")
-    if max_weight < 1 / n_projects:
-        raise ValueError("max_weight must greater than or equal to 1/n_projects")
-    if max_weight <= min_weight:
-        raise ValueError("max_weight must be greater than min_weight")
-    if type(max_change) is not float or max_change <= 0 or max_change > 1:
-        raise ValueError("max_change must be greater than 0 and less or equal to 1")
     if type(start_date) is not datetime.date:
         raise ValueError("start_date must be a datetime.date instance")
-    if type(historical_data) is not pd.core.frame.DataFrame:
+    if isinstance(historical_data, pd.DataFrame):
+        historical_data = HistoricalPanel(historical_data)
+    if not isinstance(historical_data, HistoricalPanel):
         raise ValueError(
-            "historical_data must be a pandas.core.frame.DataFrame instance"
+            "historical_data must be a pandas.core.frame.DataFrame or "
+            "panel.HistoricalPanel instance"
         )
     if type(projects_to_include) is not list or not all(
         [type(i) is str for i in projects_to_include]
@@ -658,13 +1228,21 @@ def backtest(
             "projects_to_include must contain at least n_projects unique projects"
         )
     for project in projects_to_include:
-        if project not in historical_data["project"].values:
+        if project not in historical_data.project_index:
             raise ValueError(f"There is no data for {project} in historical_data")
     if end_date is not None:
         if type(end_date) is not datetime.date:
             raise ValueError("end_date must be a datetime.date instance")
     if type(quiet) is not bool:
         raise ValueError("quiet must be a boolean")
+    if solver not in ["basinhopping", "exact"]:
+        raise ValueError("solver must be 'basinhopping' or 'exact'")
+    if engine not in ["daily", "interval"]:
+        raise ValueError("engine must be 'daily' or 'interval'")
+    if type(compact) is not bool:
+        raise ValueError("compact must be a boolean")
+    if compact and engine != "interval":
+        raise ValueError("compact results require the 'interval' engine")
     if not (
         rebalancing_frequency == "monthly"
         or type(rebalancing_frequency) is int
@@ -675,69 +1253,142 @@ def backtest(
         )
 
     if end_date is None:  # Run until most recent date in historical data
-        end_date = datetime.datetime.strptime(
-            historical_data["datetime"].astype("object").max(), "%Y-%m-%d"
-        ).date()
+        end_date = historical_data.end_date
 
     # Loop over days and save portfolios in a list
-    results = {}
-    results["portfolios"] = []
-    results["statuses"] = []
+    if compact:
+        results = BacktestResults(historical_data, start_date)
+    else:
+        results = {}
+        results["portfolios"] = []
+        results["statuses"] = []
 
     n_days = (end_date - start_date).days + 1
-    for i in range(n_days):
+    i = 0
+    replay = {}  # Stored portfolios of a checkpoint by day and status
+
+    if checkpoint is not None:  # Resume from the last day of the checkpoint
+        params = {
+            "n_projects": n_projects,
+            "initial_investment": initial_investment,
+            "min_circ_marketcap": min_circ_marketcap,
+            "min_weight": min_weight,
+            "max_weight": max_weight,
+            "max_change": max_change,
+            "start_date": start_date,
+            "projects_to_include": projects_to_include,
+            "rebalancing_frequency": rebalancing_frequency,
+            "solver": solver,
+            "engine": engine,
+            "compact": compact,
+        }
+        with phase(profiler, "checkpoint"):
+            resumed = load_checkpoint(checkpoint, params, historical_data)
+        if resumed is not None and resumed.n_days <= n_days and compact:
+            results = resumed
+            i = results.n_days
+            portfolio = results["portfolios"][-1]
+            if not quiet:
+                print(f"Resuming from {start_date + datetime.timedelta(days=i)}")
+        elif resumed is not None and resumed.n_days <= n_days:
+            replay = {
+                (event["day"], event["status"]): resumed.event_portfolio(event)
+                for event in resumed.events
+            }
+            if not quiet:
+                print(f"Replaying the rebalances until {resumed.dates[-1]}")
+
+    while i < n_days:
 
         date = start_date + datetime.timedelta(days=i)
         if not quiet:
             print(date, end="\r")
 
         if i == 0:  # Calculate initial portfolio
-            portfolio = _calculate_target_portfolio(
-                n_projects=n_projects,
-                date=date,
-                historical_data=historical_data,
-                projects_to_include=projects_to_include,
-                min_circ_marketcap=min_circ_marketcap,
-                value=initial_investment,
-                min_weight=min_weight,
-                max_weight=max_weight,
-            )
-            results["portfolios"].append(portfolio)
-            results["statuses"].append("start")
+            if (0, "start") in replay:
+                portfolio = replay[0, "start"]
+            else:
+                portfolio = _calculate_target_portfolio(
+                    n_projects=n_projects,
+                    date=date,
+                    historical_data=historical_data,
+                    projects_to_include=projects_to_include,
+                    min_circ_marketcap=min_circ_marketcap,
+                    value=initial_investment,
+                    min_weight=min_weight,
+                    max_weight=max_weight,
+                    solver=solver,
+                    cache=cache,
+                    targets=targets,
+                    profiler=profiler,
+                )
+            _save_portfolio(results, i, portfolio, "start", profiler)
+            i += 1
+            continue
+
+        if engine == "interval":  # Update all days until the next rebalance
+            dates = [date]
+            while dates[-1] < end_date and not _is_rebalance_day(
+                i + len(dates) - 1, dates[-1], rebalancing_frequency
+            ):
+                dates.append(dates[-1] + datetime.timedelta(days=1))
+
+            # Compact results build normal days on demand, so only the last day
+            # of the interval is saved (every day is marked to market to check
+            # that there are prices for all of them)
+            first = len(dates) - 1 if compact else 0
+            with phase(profiler, "mark_to_market"):
+                weights, prices, sps = _mark_to_market(
+                    portfolio, dates, historical_data
+                )
+                for j, d in enumerate(dates[first:], start=first):
+                    portfolio = portfolio.copy()
+                    portfolio["datetime"] = str(d)
+                    portfolio["weight"] = weights[j]
+                    portfolio["price"] = prices[j]
+                    portfolio["sp"] = sps[j]
+                    if j < len(dates) - 1:
+                        _save_portfolio(
+                            results, i + j, portfolio, "normal-day", profiler
+                        )
+            i += len(dates) - 1
+            date = dates[-1]
 
         else:  # Update date, price, sp, and weight
-            portfolio = results["portfolios"][-1].copy()
-            portfolio["datetime"] = str(date)
-
-            # Filter the dataframe for increased performance
-            df = historical_data.loc[
-                (historical_data["datetime"] == str(date))
-                & (historical_data["project"].isin(portfolio["project"])),
-                ["project", "price", "sp"],
-            ]
-            for j, project in enumerate(portfolio["project"]):
-                for metric in ["price", "sp"]:
-                    portfolio.loc[j, metric] = df.loc[
-                        df["project"] == project, metric
-                    ].item()
-
-            portfolio["weight"] = (
-                portfolio["price"] * portfolio["tokens"] / _calculate_value(portfolio)
-            )
+            with phase(profiler, "mark_to_market"):
+                portfolio = portfolio.copy()
+                portfolio["datetime"] = str(date)
+
+                with phase(profiler, "data_lookup"):
+                    row = historical_data.date_loc(date)
+                    columns = historical_data.project_loc(portfolio["project"])
+                    for metric in ["price", "sp"]:
+                        values = getattr(historical_data, metric)[row, columns]
+                        portfolio[metric] = values
+                    _check_prices(
+                        portfolio["price"].values[np.newaxis],
+                        [date],
+                        list(portfolio["project"]),
+                    )
 
-            rebalance = False
-            if rebalancing_frequency == "monthly":
-                if date.day == 1:
-                    rebalance = True
-            elif i % rebalancing_frequency == 0:
-                rebalance = True
-            if rebalance:
+                portfolio["weight"] = (
+                    portfolio["price"]
+                    * portfolio["tokens"]
+                    / _calculate_value(portfolio)
+                )
 
-                # Save pre-rebalance portfolio with weights updated for day 1
-                results["portfolios"].append(portfolio)
-                results["statuses"].append("pre-rebalance")
+        if _is_rebalance_day(i, date, rebalancing_frequency):
 
-                # Rebalance
+            # Save pre-rebalance portfolio with weights updated for day 1
+            _save_portfolio(results, i, portfolio, "pre-rebalance", profiler)
+
+            # Rebalance
+            if (i, "rebalanced") in replay:
+                portfolio, init, target = [
+                    replay[i, status]
+                    for status in ["rebalanced", "rebalance-init", "rebalance-target"]
+                ]
+            else:
                 portfolio, init, target = _rebalance(
                     portfolio=portfolio,
                     date=date,
@@ -747,22 +1398,34 @@ def backtest(
                     min_circ_marketcap=min_circ_marketcap,
                     historical_data=historical_data,
                     projects_to_include=projects_to_include,
+                    solver=solver,
+                    cache=cache,
+                    targets=targets,
+                    profiler=profiler,
                 )
 
-                # Save rebalance-init portfolio
-                results["portfolios"].append(init)
-                results["statuses"].append("rebalance-init")
+            # Save rebalance-init portfolio
+            _save_portfolio(results, i, init, "rebalance-init", profiler)
 
-                # Save target portfolio
-                results["portfolios"].append(target)
-                results["statuses"].append("rebalance-target")
+            # Save target portfolio
+            _save_portfolio(results, i, target, "rebalance-target", profiler)
 
-                # Save rebalanced portfolio
-                results["portfolios"].append(portfolio)
-                results["statuses"].append("rebalanced")
+            # Save rebalanced portfolio
+            _save_portfolio(results, i, portfolio, "rebalanced", profiler)
 
-            else:  # No rebalance needed, just save the portfolio
-                results["portfolios"].append(portfolio)
-                results["statuses"].append("normal-day")
+        else:  # No rebalance needed, just save the portfolio
+            _save_portfolio(results, i, portfolio, "normal-day", profiler)
+
+        i += 1
+
+    if checkpoint is not None:
+        with phase(profiler, "checkpoint"):
+            save_checkpoint(checkpoint, results, params, historical_data)
+
+    if profiler is not None:
+        if compact:
+            results.profile = profiler.to_dict()
+        else:
+            results["profile"] = profiler.to_dict()
 
     return results
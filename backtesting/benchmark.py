@@ -0,0 +1,442 @@
+"""This module contains a benchmark suite for the backtesting engine, which runs
+on synthetic historical data of configurable size.
+
+It can be executed as a script, e.g.:
+
+    python benchmark.py --universe-sizes 50 500 --years 1 5
+
+which saves the wall time, peak memory, and number of solver calls of every
+benchmark in `benchmark.json`, and
+
+    python benchmark.py --universe-sizes 50 500 --years 1 5 --compare benchmark.json
+
+which runs the same benchmarks and reports the regressions with respect to
+the results saved in `benchmark.json`."""
+
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import scipy
+
+import backtesting as bt
+import monte_carlo
+from panel import HistoricalPanel
+
+
+BENCHMARKS = [
+    "_calculate_weights",
+    "_calculate_target_portfolio",
+    "_rebalance",
+    "backtest",
+    "results_to_json",
+    "rebalances_to_json",
+    "monte_carlo",
+]
+BENCHMARK_VERSION = 3
+# Fields that identify a benchmark
+KEYS = ["benchmark", "universe_size", "n_years", "solver", "engine"]
+START_DATE = datetime.date(2015, 1, 1)
+# Number of paths of the Monte Carlo benchmark, and of each batch of paths
+MONTE_CARLO_PATHS = 8
+MONTE_CARLO_BATCH_SIZE = 4
+
+# Parameters of the backtests (as in `run_backtest.py`)
+PARAMS = dict(
+    n_projects=13,
+    initial_investment=100.0,
+    min_circ_marketcap=1e8,
+    min_weight=0.001,
+    max_weight=0.2,
+    max_change=0.05,
+    rebalancing_frequency="monthly",
+)
+
+
+def synthetic_panel(universe_size, n_years, seed=bt.SEED):
+    """Generate random historical data.
+
+    Prices and sales-to-price ratios follow geometric random walks, and
+    projects are listed on random dates (a fifth of them, and at least twice
+    the number of projects of the index, from the first date).
+
+    Args:
+        universe_size: int defining the number of projects.
+        n_years: float defining the number of years of daily data.
+        seed: int.
+
+    Returns:
+        panel.HistoricalPanel.
+    """
+    rng = np.random.RandomState(seed)
+    n_days = int(round(365.25 * n_years))
+    shape = (n_days, universe_size)
+
+    price = rng.lognormal(2, 1, universe_size) * np.exp(
+        np.cumsum(rng.normal(0, 0.04, shape), axis=0)
+    )
+    sp = rng.lognormal(-3, 1, universe_size) * np.exp(
+        np.cumsum(rng.normal(0, 0.02, shape), axis=0)
+    )
+    supply = rng.lognormal(17, 2, universe_size)
+
+    listed = rng.randint(0, n_days, universe_size)
+    n_listed = min(universe_size, max(2 * PARAMS["n_projects"], universe_size // 5))
+    listed[:n_listed] = 0
+    supply[:n_listed] *= 10
+    unlisted = np.arange(n_days)[:, np.newaxis] < listed
+    price[unlisted] = np.nan
+    sp[unlisted] = np.nan
+
+    projects = [f"project{j:05d}" for j in range(universe_size)]
+    return HistoricalPanel.from_arrays(
+        dates=[str(START_DATE + datetime.timedelta(days=i)) for i in range(n_days)],
+        projects=projects,
+        project_ids=projects,
+        price=price,
+        sp=sp,
+        market_cap_circulating=price * supply,
+    )
+
+
+@contextlib.contextmanager
+def _count_solver_calls():
+    """Count the calls of the weight solvers made within the context.
+
+    Yields:
+        list with a single int, which is the number of calls so far.
+    """
+    calls = [0]
+    solvers = {
+        name: getattr(bt, name)
+        for name in ["_project_weights", "_basinhopping_weights"]
+    }
+
+    def counted(solver):
+        def wrapper(*args, **kwargs):
+            calls[0] += 1
+            return solver(*args, **kwargs)
+
+        return wrapper
+
+    for name, solver in solvers.items():
+        setattr(bt, name, counted(solver))
+    try:
+        yield calls
+    finally:
+        for name, solver in solvers.items():
+            setattr(bt, name, solver)
+
+
+def _measure(fn, repeat):
+    """Measure a function.
+
+    Args:
+        fn: function without arguments.
+        repeat: int defining the number of times the function is timed.
+
+    Returns:
+        tuple of the output of the function and a dict with the best wall time
+        in seconds, the peak memory allocated in MiB, and the number of solver
+        calls of the function.
+    """
+    seconds = []
+    for _ in range(repeat):
+        with _count_solver_calls() as calls:
+            start = time.perf_counter()
+            output = fn()
+            seconds.append(time.perf_counter() - start)
+
+    # Memory is measured separately, as tracing allocations slows down code
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return output, {
+        "seconds": min(seconds),
+        "peak_memory_mb": peak / 2**20,
+        "solver_calls": calls[0],
+    }
+
+
+def run_benchmarks(universe_size, n_years, solver="exact", engine="interval", repeat=3):
+    """Run the benchmarks on a synthetic universe.
+
+    Args:
+        universe_size: int defining the number of projects.
+        n_years: float defining the number of years of daily data.
+        solver: "basinhopping" or "exact" (see `backtesting._calculate_weights`).
+        engine: "daily" or "interval" (see `backtesting.backtest`).
+        repeat: int defining the number of times each benchmark is timed.
+
+    Returns:
+        list of dicts with the name, universe size, number of years, solver,
+        engine, wall time in seconds, peak memory in MiB, and number of solver
+        calls of each benchmark, and the number of paths per second of the
+        "monte_carlo" benchmark (which always uses the batched engine of
+        `monte_carlo.monte_carlo`, whatever the engine).
+    """
+    panel = synthetic_panel(universe_size, n_years)
+    kwargs = dict(
+        PARAMS,
+        start_date=START_DATE,
+        historical_data=panel,
+        projects_to_include=panel.projects,
+        solver=solver,
+    )
+    measurements = {}
+
+    results, measurements["backtest"] = _measure(
+        lambda: bt.backtest(engine=engine, **kwargs), repeat
+    )
+
+    # Inputs of the first rebalance
+    k = results["statuses"].index("pre-rebalance")
+    pre, target = results["portfolios"][k], results["portfolios"][k + 2]
+    date = datetime.date.fromisoformat(pre["datetime"].values[0])
+    # Projects replaced in the rebalance start from a weight of 0
+    original = np.where(
+        pre["project"].values == target["project"].values, pre["weight"].values, 0
+    )
+    n = len(target)
+    weight_kwargs = dict(min_weight=PARAMS["min_weight"], solver=solver)
+
+    _, measurements["_calculate_weights"] = _measure(
+        lambda: (
+            bt._calculate_weights(
+                original=np.ones(n) / n,
+                target=target["sp"].values / sum(target["sp"]),
+                max_change=1.0,
+                max_weight=PARAMS["max_weight"],
+                **weight_kwargs,
+            ),
+            bt._calculate_weights(
+                original=original,
+                target=target["weight"].values,
+                max_change=PARAMS["max_change"],
+                max_weight=1.0,
+                **weight_kwargs,
+            ),
+        ),
+        repeat,
+    )
+    _, measurements["_calculate_target_portfolio"] = _measure(
+        lambda: bt._calculate_target_portfolio(
+            n_projects=PARAMS["n_projects"],
+            date=date,
+            historical_data=panel,
+            projects_to_include=panel.projects,
+            value=PARAMS["initial_investment"],
+            min_weight=PARAMS["min_weight"],
+            max_weight=PARAMS["max_weight"],
+            min_circ_marketcap=PARAMS["min_circ_marketcap"],
+            solver=solver,
+        ),
+        repeat,
+    )
+    _, measurements["_rebalance"] = _measure(
+        lambda: bt._rebalance(
+            portfolio=pre,
+            date=date,
+            min_weight=PARAMS["min_weight"],
+            max_weight=PARAMS["max_weight"],
+            max_change=PARAMS["max_change"],
+            min_circ_marketcap=PARAMS["min_circ_marketcap"],
+            historical_data=panel,
+            projects_to_include=panel.projects,
+            solver=solver,
+        ),
+        repeat,
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results")
+        _, measurements["results_to_json"] = _measure(
+            lambda: bt.results_to_json(results, json_name=path, save_status=True),
+            repeat,
+        )
+        _, measurements["rebalances_to_json"] = _measure(
+            lambda: bt.rebalances_to_json(
+                f"{path}.json",
+                json_name=os.path.join(directory, "rebalances"),
+                save_target=True,
+            ),
+            repeat,
+        )
+
+    _, measurements["monte_carlo"] = _measure(
+        lambda: monte_carlo.monte_carlo(
+            panel,
+            n_paths=MONTE_CARLO_PATHS,
+            start_date=START_DATE,
+            projects_to_include=panel.projects,
+            solver=solver,
+            batch_size=MONTE_CARLO_BATCH_SIZE,
+            n_workers=1,
+            **PARAMS,
+        ),
+        repeat,
+    )
+    measurements["monte_carlo"]["paths_per_second"] = (
+        MONTE_CARLO_PATHS / measurements["monte_carlo"]["seconds"]
+    )
+
+    return [
+        dict(
+            benchmark=name,
+            universe_size=universe_size,
+            n_years=n_years,
+            solver=solver,
+            engine=engine,
+            **measurements[name],
+        )
+        for name in BENCHMARKS
+    ]
+
+
+def compare(baseline, results, tolerance=0.25):
+    """Compare the results of benchmarks with a baseline.
+
+    Args:
+        baseline: list of dicts returned by `run_benchmarks`.
+        results: list of dicts returned by `run_benchmarks`.
+        tolerance: float defining the relative increase of wall time or peak
+            memory that is considered a regression.
+
+    Returns:
+        pandas.core.frame.DataFrame with one row per regression, containing
+        the fields in `KEYS`, metric, and its values in the baseline and the
+        results. Any increase in the number of solver calls is a regression,
+        and so is a benchmark that is not in the baseline (with the metric
+        "missing" and no values).
+    """
+    expected = {tuple(b[k] for k in KEYS): b for b in baseline}
+    regressions = []
+    for result in results:
+        b = expected.get(tuple(result[k] for k in KEYS))
+        if b is None:
+            regressions.append(
+                dict(
+                    **{k: result[k] for k in KEYS},
+                    metric="missing",
+                    baseline=None,
+                    result=None,
+                )
+            )
+            continue
+        for metric, limit in [
+            ("seconds", b["seconds"] * (1 + tolerance)),
+            ("peak_memory_mb", b["peak_memory_mb"] * (1 + tolerance)),
+            ("solver_calls", b["solver_calls"]),
+        ]:
+            if result[metric] > limit:
+                regressions.append(
+                    dict(
+                        **{k: result[k] for k in KEYS},
+                        metric=metric,
+                        baseline=b[metric],
+                        result=result[metric],
+                    )
+                )
+    return pd.DataFrame(regressions, columns=KEYS + ["metric", "baseline", "result"])
+
+
+def main(args=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--universe-sizes", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5])
+    parser.add_argument("--solver", default="exact")
+    parser.add_argument("--engine", default="interval")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="baseline file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(args)
+
+    results = []
+    for universe_size in args.universe_sizes:
+        for n_years in args.years:
+            print(f"Benchmarking {universe_size} projects x {n_years} years")
+            results += run_benchmarks(
+                universe_size,
+                n_years,
+                solver=args.solver,
+                engine=args.engine,
+                repeat=args.repeat,
+            )
+    print(pd.DataFrame(results).to_string(index=False))
+    settings = {
+        "solver": args.solver,
+        "engine": args.engine,
+        "repeat": args.repeat,
+        "params": PARAMS,
+        "monte_carlo_paths": MONTE_CARLO_PATHS,
+        "monte_carlo_batch_size": MONTE_CARLO_BATCH_SIZE,
+    }
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("version") != BENCHMARK_VERSION:
+            print(f"Baseline has version {baseline.get('version')}")
+            return 1
+        different = [
+            k
+            for k in [
+                "solver",
+                "engine",
+                "params",
+                "monte_carlo_paths",
+                "monte_carlo_batch_size",
+            ]
+            if baseline["settings"].get(k) != json.loads(json.dumps(settings[k]))
+        ]
+        if different:
+            print(f"Baseline was recorded with different settings {different}")
+            return 1
+        regressions = compare(baseline["results"], results, args.tolerance)
+        if len(regressions):
+            print(f"{len(regressions)} regressions:")
+            print(regressions.to_string(index=False))
+            return 1
+        print("No regressions")
+        return 0
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "version": BENCHMARK_VERSION,
+                "environment": {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "scipy": scipy.__version__,
+                    "machine": platform.machine(),
+                    "processor": platform.processor(),
+                },
+                "settings": settings,
+                "results": results,
+            },
+            file,
+            indent=4,
+        )
+    print(f"Saved {len(results)} benchmarks to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""This module contains functions for saving and loading checkpoints of
+backtests of the Token Terminal Index, so that a backtest can be resumed when
+new days of data are added to the historical data."""
+
+
+import datetime
+import json
+import os
+
+import numpy as np
+
+from results import BacktestResults, STORED_STATUSES
+
+
+CHECKPOINT_VERSION = 3
+
+
+def _serialize_params(params):
+    """Return the parameters of a backtest in a form that can be saved as JSON
+    and compared with the parameters of a saved checkpoint."""
+    return json.loads(json.dumps(params, default=str))
+
+
+def _compact(results, historical_data):
+    """Return the results of a backtest as results.BacktestResults.
+
+    Args:
+        results: dict of lists with the keys "portfolios" and "statuses", or
+            results.BacktestResults.
+        historical_data: panel.HistoricalPanel.
+
+    Returns:
+        results.BacktestResults.
+    """
+    if isinstance(results, BacktestResults):
+        return results
+    start_date, end_date = [
+        datetime.datetime.strptime(
+            results["portfolios"][k]["datetime"].iloc[0], "%Y-%m-%d"
+        ).date()
+        for k in [0, -1]
+    ]
+    compact = BacktestResults(historical_data, start_date)
+    compact.n_days = (end_date - start_date).days + 1
+    for k, status in enumerate(results["statuses"]):
+        if status in STORED_STATUSES:
+            portfolio = results["portfolios"][k]
+            day = datetime.datetime.strptime(
+                portfolio["datetime"].iloc[0], "%Y-%m-%d"
+            ).date()
+            compact.record((day - start_date).days, status, portfolio)
+    return compact
+
+
+def save_checkpoint(path, results, params, historical_data):
+    """Save a checkpoint of a backtest.
+
+    Only the portfolios of the start and rebalance days are saved (the events
+    of results.BacktestResults), so the size of a checkpoint does not grow
+    with the number of days without a rebalance. A backtest resumed from the
+    checkpoint rebuilds the other portfolios from the historical data.
+
+    Args:
+        path: path to the .json checkpoint file.
+        results: dict of lists with the keys "portfolios" and "statuses", or
+            results.BacktestResults.
+        params: dict containing the parameters of the backtest (see
+            `backtesting.backtest`) that the results depend on.
+        historical_data: panel.HistoricalPanel.
+    """
+    results = _compact(results, historical_data)
+    start_date = results.start_date
+    end_date = start_date + datetime.timedelta(days=results.n_days - 1)
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "params": _serialize_params(params),
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "n_days": results.n_days,
+        "fingerprint": historical_data.fingerprint(
+            params["projects_to_include"], start_date, end_date
+        ),
+        "events": [
+            {
+                "day": event["day"],
+                "status": event["status"],
+                "projects": [historical_data.projects[j] for j in event["columns"]],
+                "weights": event["weights"].tolist(),
+                "tokens": event["tokens"].tolist(),
+            }
+            for event in results.events
+        ],
+    }
+
+    # Write to a temporary file first so an interrupted save does not corrupt
+    # an existing checkpoint
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_checkpoint(path, params, historical_data):
+    """Load a checkpoint of a backtest.
+
+    Args:
+        path: path to the .json checkpoint file.
+        params: dict containing the parameters of the backtest (see
+            `backtesting.backtest`) that the results depend on.
+        historical_data: panel.HistoricalPanel.
+
+    Returns:
+        results.BacktestResults containing the results up to the last day of
+        the checkpoint, or None if the checkpoint does not exist, was saved
+        with different parameters, or the historical data up to its last day
+        has changed since it was saved.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        checkpoint = json.load(file)
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    if checkpoint["params"] != _serialize_params(params):
+        return None
+    try:
+        fingerprint = historical_data.fingerprint(
+            params["projects_to_include"],
+            checkpoint["start_date"],
+            checkpoint["end_date"],
+        )
+    except ValueError:  # Dates of the checkpoint are no longer in the data
+        return None
+    if fingerprint != checkpoint["fingerprint"]:
+        return None
+
+    results = BacktestResults(
+        historical_data,
+        datetime.datetime.strptime(checkpoint["start_date"], "%Y-%m-%d").date(),
+    )
+    results.n_days = checkpoint["n_days"]
+    results.events = [
+        {
+            "day": event["day"],
+            "status": event["status"],
+            "columns": historical_data.project_loc(event["projects"]),
+            "weights": np.array(event["weights"], dtype=float),
+            "tokens": np.array(event["tokens"], dtype=float),
+        }
+        for event in checkpoint["events"]
+    ]
+    return results
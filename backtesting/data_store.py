@@ -0,0 +1,194 @@
+"""This module contains a loader for the historical data extracted by the
+script `extract_historical_data.py`, which keeps a columnar binary copy of the
+columns used for backtesting next to the .csv file.
+
+The .csv file is only parsed when the binary copy does not exist or the .csv
+file has changed since the copy was made, so loading the data again is a
+matter of reading a few arrays from disk."""
+
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from panel import HistoricalPanel, METRICS
+
+
+STORE_VERSION = 1
+CATEGORICAL_COLUMNS = ["datetime", "project", "project_id"]
+COLUMNS = CATEGORICAL_COLUMNS + METRICS
+
+
+def _hash_file(path):
+    """Return the SHA-256 hash of the contents of a file."""
+    h = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_csv(path):
+    """Read the columns used for backtesting from a .csv file created by
+    `extract_historical_data.py`.
+
+    Args:
+        path: path to the .csv file.
+
+    Returns:
+        dict mapping the names of the arrays of the binary copy to numpy
+        arrays.
+    """
+    df = pd.read_csv(
+        path,
+        usecols=COLUMNS,
+        dtype={
+            **{c: "category" for c in CATEGORICAL_COLUMNS},
+            **{m: float for m in METRICS},
+        },
+    )
+    arrays = {}
+    for c in CATEGORICAL_COLUMNS:
+        categories = df[c].cat.categories.astype(str)
+        codes = df[c].cat.codes.values
+        arrays[f"{c}_categories"] = np.array(categories, dtype=str)
+        arrays[f"{c}_codes"] = codes.astype(np.min_scalar_type(-len(categories)))
+    for m in METRICS:
+        arrays[m] = df[m].values
+    return arrays
+
+
+def _to_frame(arrays):
+    """Return the historical data of the arrays of a binary copy.
+
+    Args:
+        arrays: dict-like mapping the names of the arrays of the binary copy
+            to numpy arrays.
+
+    Returns:
+        pandas.core.frame.DataFrame.
+    """
+    df = pd.DataFrame(
+        {
+            c: pd.Categorical.from_codes(
+                arrays[f"{c}_codes"], categories=arrays[f"{c}_categories"]
+            )
+            for c in CATEGORICAL_COLUMNS
+        }
+    )
+    for m in METRICS:
+        df[m] = arrays[m]
+    return df
+
+
+def convert(csv_path, path):
+    """Save a columnar binary copy of the historical data.
+
+    Args:
+        csv_path: path to a .csv file created by `extract_historical_data.py`.
+        path: path to the .npz file.
+
+    Returns:
+        dict mapping the names of the arrays of the binary copy to numpy
+        arrays.
+    """
+    stat = os.stat(csv_path)
+    arrays = _read_csv(csv_path)
+    meta = {
+        "version": STORE_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+    }
+    _save(path, arrays, meta, _hash_file(csv_path))
+    return arrays
+
+
+def _save(path, arrays, meta, source_hash):
+    """Save the arrays and metadata of a binary copy."""
+    # Write to a temporary file first so that an interrupted save does not
+    # leave a corrupt copy behind
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as file:
+        np.savez(
+            file,
+            source_hash=np.array(source_hash),
+            **{k: np.array(v) for k, v in meta.items()},
+            **arrays,
+        )
+    os.replace(tmp, path)
+
+
+def _load(csv_path, path):
+    """Return the arrays of an up-to-date binary copy of a .csv file, or None
+    if there is no such copy.
+
+    The copy is up to date if the size and modification time of the .csv file
+    are those recorded in the copy or, failing that, if the contents of the
+    file have the same hash (e.g. after the file is copied or touched).
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as npz:
+        if "version" not in npz.files or npz["version"] != STORE_VERSION:
+            return None
+        stat = os.stat(csv_path)
+        if npz["source_size"] != stat.st_size:
+            return None
+        fresh = npz["source_mtime_ns"] == stat.st_mtime_ns
+        if not fresh and str(npz["source_hash"]) != _hash_file(csv_path):
+            return None
+        arrays = {
+            k: npz[k]
+            for k in npz.files
+            if k not in ["version", "source_size", "source_mtime_ns", "source_hash"]
+        }
+        source_hash = str(npz["source_hash"])
+
+    if not fresh:  # Record the new modification time
+        meta = {
+            "version": STORE_VERSION,
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+        }
+        _save(path, arrays, meta, source_hash)
+    return arrays
+
+
+def load_historical_data(csv_path="historical_data.csv", path=None):
+    """Load the historical data used for backtesting.
+
+    Only the columns "datetime", "project", "project_id", "price", "sp", and
+    "market_cap_circulating" are loaded, the first three as categories. The
+    .csv file is parsed the first time the data is loaded, or whenever it has
+    changed, and a binary copy is saved for later loads.
+
+    Args:
+        csv_path: path to a .csv file created by `extract_historical_data.py`.
+        path: path to the .npz binary copy of the .csv file. If not given, the
+            path of the .csv file with the extension ".npz" is used.
+
+    Returns:
+        pandas.core.frame.DataFrame.
+    """
+    if path is None:
+        path = f"{os.path.splitext(csv_path)[0]}.npz"
+    arrays = _load(csv_path, path)
+    if arrays is None:
+        arrays = convert(csv_path, path)
+    return _to_frame(arrays)
+
+
+def load_panel(csv_path="historical_data.csv", path=None):
+    """Load the historical data used for backtesting as a panel.
+
+    Args:
+        csv_path: path to a .csv file created by `extract_historical_data.py`.
+        path: path to the .npz binary copy of the .csv file (see
+            `load_historical_data`).
+
+    Returns:
+        panel.HistoricalPanel.
+    """
+    return HistoricalPanel(load_historical_data(csv_path, path))
@@ -1,7 +1,11 @@
 """This script extracts the historical data of all listed projects using the
 Token Terminal API, calculates the sales-to-price ratio, and saves the data in
-`historical_data.csv`."""
+`historical_data.csv`.
 
+With the option `--incremental`, only the data of the days since the last day
+stored in `historical_data.csv` is processed and merged into the file."""
+
+import argparse
 import os
 
 import numpy as np
@@ -9,31 +13,146 @@ import pandas as pd
 from dotenv import load_dotenv
 
 from api_wrapper import ApiWrapper
+from response_cache import ResponseCache
+
+
+def process_historical_data(df):
+    """Clean the historical data returned by the API and calculate the
+    sales-to-price ratios.
+
+    Args:
+        df: pandas.core.frame.DataFrame.
+
+    Returns:
+        pandas.core.frame.DataFrame.
+    """
+    df["datetime"] = df["datetime"].str.slice(0, 10)  # Only keep the date
+
+    df.loc[df["pe"] <= 0, "pe"] = np.nan
+    df.loc[df["pe_circulating"] <= 0, "pe_circulating"] = np.nan
+    df.loc[df["ps"] <= 0, "ps"] = np.nan
+    df.loc[df["ps_circulating"] <= 0, "ps_circulating"] = np.nan
+
+    df["sp"] = 1 / df["ps"].astype(np.longdouble)
+    df["sp_circulating"] = 1 / df["ps_circulating"].astype(np.longdouble)
+    return df
+
+
+def merge_historical_data(stored, new, project_ids):
+    """Merge new historical data into the stored historical data.
+
+    Rows of the new data replace the rows of the stored data with the same
+    project id and date (e.g. the last stored day, which may have been
+    incomplete when it was extracted).
+
+    Args:
+        stored: pandas.core.frame.DataFrame.
+        new: pandas.core.frame.DataFrame.
+        project_ids: list of strings defining the order of the projects.
+
+    Returns:
+        pandas.core.frame.DataFrame sorted by project and date.
+    """
+    df = pd.concat([stored, new])
+    df = df.drop_duplicates(["project_id", "datetime"], keep="last")
+    order = {
+        p: i
+        for i, p in enumerate(
+            dict.fromkeys(list(project_ids) + list(stored["project_id"]))
+        )
+    }
+    df = df.iloc[
+        np.lexsort((df["datetime"].values, df["project_id"].map(order).values))
+    ]
+    df.index = df.groupby("project_id").cumcount().values
+    return df
+
+
+def extract(tt, path="historical_data.csv", incremental=False, callback=None):
+    """Extract the historical data of all listed projects and save it.
+
+    Args:
+        tt: api_wrapper.ApiWrapper.
+        path: path to the .csv file.
+        incremental: bool defining whether only the days since the last day
+            stored for each project in `path` are processed and merged into
+            the file. If False, or the file does not exist, the file is
+            overwritten.
+        callback: function called with each project id as soon as its data is
+            received.
+
+    Returns:
+        int defining the number of new rows.
+    """
+    all_projects_summary = tt.get_all_projects()
+    project_ids = [i["project_id"] for i in all_projects_summary]
+
+    def add_project_id(project_id, resp):
+        for obj in resp:
+            obj["project_id"] = project_id
+        if callback is not None:
+            callback(project_id)
+
+    data = tt.get_historical_data_many(project_ids, callback=add_project_id)
+    df = pd.concat([pd.DataFrame(data[i]) for i in project_ids])
+
+    if not incremental or not os.path.exists(path):
+        df = process_historical_data(df)
+        df.to_csv(path)
+        return len(df)
+
+    # Stored rows are read as text, so they are saved again exactly as they are
+    stored = pd.read_csv(path, index_col=0, dtype=str)
+    last_dates = stored.groupby("project_id")["datetime"].max()
+    dates = df["datetime"].str.slice(0, 10)
+    new = df[dates >= df["project_id"].map(last_dates).fillna("")].copy()
+    new = process_historical_data(new)
+    merge_historical_data(stored, new, project_ids).to_csv(path)
+    return len(new)
+
+
+def main(args=None):
+    """Extract the historical data from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="historical_data.csv")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--cache-dir", help="directory of the response cache")
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="seconds for which cached responses are used without revalidation",
+    )
+    args = parser.parse_args(args)
 
-load_dotenv()
+    load_dotenv()
 
-tt = ApiWrapper(os.getenv("TT_API_KEY"))
+    # Number of concurrent requests and maximum number of requests per second
+    max_workers = int(os.getenv("TT_API_MAX_WORKERS", 8))
+    rate_limit = os.getenv("TT_API_RATE_LIMIT")
 
-all_projects_summary = tt.get_all_projects()
-project_ids = [i["project_id"] for i in all_projects_summary]
+    tt = ApiWrapper(
+        os.getenv("TT_API_KEY"),
+        max_workers=max_workers,
+        rate_limit=rate_limit and float(rate_limit),
+        cache=args.cache_dir and ResponseCache(args.cache_dir, ttl=args.cache_ttl),
+    )
 
-data = {}
-for i, project_id in enumerate(project_ids):
-    print(f"{i + 1}/{len(project_ids)} ({project_id})")
-    resp = tt.get_historical_data(project_id)
-    for obj in resp:
-        obj["project_id"] = project_id
-    data[project_id] = resp
-df = pd.concat([pd.DataFrame(data[i]) for i in project_ids])
+    done = []
 
-df["datetime"] = df["datetime"].str.slice(0, 10)  # Only keep the date
+    def print_progress(project_id):
+        done.append(project_id)
+        print(f"{len(done)} ({project_id})")
 
-df.loc[df["pe"] <= 0, "pe"] = np.nan
-df.loc[df["pe_circulating"] <= 0, "pe_circulating"] = np.nan
-df.loc[df["ps"] <= 0, "ps"] = np.nan
-df.loc[df["ps_circulating"] <= 0, "ps_circulating"] = np.nan
+    n_rows = extract(tt, args.output, args.incremental, callback=print_progress)
+    print(f"Saved {n_rows} new rows to {args.output}")
+    if tt.cache is not None:
+        stats = tt.cache.stats
+        print(
+            f"Response cache: {stats['hits']} hits, "
+            f"{stats['not_modified']} not modified, {stats['misses']} misses, "
+            f"{stats['bytes_saved']} bytes saved"
+        )
 
-df["sp"] = 1 / df["ps"].astype(np.longdouble)
-df["sp_circulating"] = 1 / df["ps_circulating"].astype(np.longdouble)
 
-df.to_csv("historical_data.csv")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""This module contains a Monte Carlo engine that backtests the Token Terminal
+Index on resampled market paths, to estimate confidence intervals of its
+performance.
+
+Paths are built with a moving block bootstrap of the daily returns of the
+historical data: blocks of consecutive days are drawn at random and their
+returns (of all projects at once, so correlations between projects are kept)
+are chained from the data of the start date.
+
+It can also be executed as a script, e.g.:
+
+    python monte_carlo.py --n-paths 10000 --start-date 2022-01-01 --workers 8
+
+which saves the daily values of every path in `monte_carlo_nav.csv`, a summary
+of every path in `monte_carlo.csv`, and prints confidence intervals of the
+performance metrics."""
+
+
+import argparse
+import datetime
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import backtesting as bt
+import multi_strategy
+from panel import HistoricalPanel, METRICS
+
+
+METRICS_OF_PATHS = [
+    "total_return",
+    "annualized_return",
+    "volatility",
+    "sharpe_ratio",
+    "max_drawdown",
+]
+
+# Source data and parameters shared by the backtests of a worker. They are set
+# once per worker process by `_init_worker` (see `sweep._init_worker`).
+_source = None
+_params = None
+
+
+def _init_worker(source, params):
+    """Set the data shared by the backtests of a worker process."""
+    global _source, _params
+    _source = source
+    _params = params
+
+
+def bootstrap_source(historical_data, projects, start_date, end_date):
+    """Prepare the data resampled by `bootstrap_panel`.
+
+    Args:
+        historical_data: panel.HistoricalPanel.
+        projects: list of strings with the projects of the paths.
+        start_date: datetime.date.
+        end_date: datetime.date.
+
+    Returns:
+        dict with the "dates", "projects", and "project_ids" of the paths, the
+        values of each metric on the start date ("initial"), and the daily log
+        returns of the price and sales-to-price ratio ("log_returns", arrays
+        of days - 1 x projects).
+
+    Note:
+        Projects without data on the start date have no data in the paths.
+        Missing returns of the other projects are 0, i.e. their price and
+        sales-to-price ratio do not change on those days.
+    """
+    rows = slice(
+        historical_data.date_loc(start_date), historical_data.date_loc(end_date) + 1
+    )
+    projects = [p for p in projects if p in historical_data.project_index]
+    columns = historical_data.project_loc(projects)
+    source = {
+        "dates": historical_data.dates[rows],
+        "projects": projects,
+        "project_ids": historical_data.project_ids[columns],
+        "initial": {},
+        "log_returns": {},
+    }
+    for metric in METRICS:
+        values = getattr(historical_data, metric)[rows, columns]
+        source["initial"][metric] = values[0]
+    for metric in ["price", "sp"]:
+        values = getattr(historical_data, metric)[rows, columns]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_returns = np.diff(np.log(values), axis=0)
+        source["log_returns"][metric] = np.nan_to_num(
+            log_returns, nan=0.0, posinf=0.0, neginf=0.0
+        )
+    return source
+
+
+def bootstrap_indices(n_returns, block_size, rng):
+    """Draw the days of a moving block bootstrap.
+
+    Args:
+        n_returns: int defining the number of daily returns of the source data
+            and of the path.
+        block_size: int defining the number of consecutive days of each block.
+        rng: numpy.random.Generator.
+
+    Returns:
+        1D integer numpy.ndarray with the index of the source return of each
+        day of the path.
+    """
+    block_size = max(min(block_size, n_returns), 1)
+    n_blocks = -(-n_returns // block_size)
+    starts = rng.integers(0, n_returns - block_size + 1, n_blocks)
+    return (starts[:, np.newaxis] + np.arange(block_size)).ravel()[:n_returns]
+
+
+def bootstrap_panel(source, block_size, rng):
+    """Build a resampled market path.
+
+    Args:
+        source: dict returned by `bootstrap_source`.
+        block_size: int defining the number of consecutive days of each block.
+        rng: numpy.random.Generator.
+
+    Returns:
+        panel.HistoricalPanel with the dates and projects of the source data.
+    """
+    n_returns = len(source["dates"]) - 1
+    indices = bootstrap_indices(n_returns, block_size, rng)
+    metrics = {}
+    for metric in ["price", "sp"]:
+        growth = np.exp(
+            np.cumsum(source["log_returns"][metric][indices], axis=0, dtype=float)
+        )
+        metrics[metric] = source["initial"][metric] * np.vstack(
+            [np.ones((1, len(source["projects"]))), growth]
+        )
+    # The circulating supply does not change
+    metrics["market_cap_circulating"] = (
+        source["initial"]["market_cap_circulating"]
+        * metrics["price"]
+        / source["initial"]["price"]
+    )
+    return HistoricalPanel.from_arrays(
+        dates=source["dates"],
+        projects=source["projects"],
+        project_ids=source["project_ids"],
+        **metrics,
+    )
+
+
+def path_rng(seed, path):
+    """Return the random number generator of a path, which only depends on the
+    seed and the index of the path (not on how paths are split between
+    processes).
+
+    Args:
+        seed: int.
+        path: int.
+
+    Returns:
+        numpy.random.Generator.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(path,)))
+
+
+def _run(paths):
+    """Backtest a batch of paths together (see
+    `multi_strategy.backtest_strategies`).
+
+    Args:
+        paths: range of path indices.
+
+    Returns:
+        tuple of a 2D floating-point numpy.ndarray (paths x days) with the
+        daily values of each path (NaN if its backtest failed), and a list of
+        dicts with the number of rebalances, turnover, error message and wall
+        time of each path (the wall time of the batch divided by its number of
+        paths).
+    """
+    params = dict(_params)
+    seed = params.pop("seed")
+    block_size = params.pop("block_size")
+    strategy = {p: params.pop(p) for p in multi_strategy.STRATEGY_PARAMETERS}
+    start = time.perf_counter()
+    panels = [
+        bootstrap_panel(_source, block_size, path_rng(seed, path)) for path in paths
+    ]
+    nav, results, errors = multi_strategy.backtest_strategies(
+        [strategy] * len(paths),
+        historical_data=panels,
+        projects_to_include=_source["projects"],
+        **params,
+    )
+    nav = nav.values
+    summaries = []
+    for k, path in enumerate(paths):
+        summary = {"path": path}
+        if results[k] is not None:
+            summary["n_rebalances"] = results[k].statuses.count("rebalanced")
+            _, pre, post = analytics.rebalance_matrices(results[k], _source["projects"])
+            summary["turnover"] = np.sum(analytics.turnover(pre, post))
+        else:  # Failed paths are reported, not raised
+            nav[k] = np.nan
+            summary["n_rebalances"] = np.nan
+            summary["turnover"] = np.nan
+        summary["error"] = errors[k]
+        summaries.append(summary)
+    seconds = (time.perf_counter() - start) / len(paths)
+    for summary in summaries:
+        summary["seconds"] = seconds
+    return nav, summaries
+
+
+def monte_carlo(
+    historical_data,
+    n_paths,
+    start_date,
+    n_projects,
+    initial_investment,
+    min_circ_marketcap,
+    min_weight,
+    max_weight,
+    max_change,
+    projects_to_include,
+    rebalancing_frequency,
+    end_date=None,
+    block_size=20,
+    seed=bt.SEED,
+    solver="exact",
+    batch_size=100,
+    n_workers=None,
+    quiet=True,
+):
+    """Backtest the Token Terminal Index on block-bootstrapped market paths,
+    using a pool of processes.
+
+    The paths of each batch are backtested together with the rules of
+    `backtesting.backtest` (see `multi_strategy.backtest_strategies`): the
+    values of all the paths of the batch between two rebalances are a single
+    batched matrix product, and only the rebalances are calculated one path at
+    a time. The metrics of all paths are then calculated at once from their
+    matrix of daily values. The random numbers of each path only depend on
+    `seed` and its index, so results do not depend on `batch_size` or
+    `n_workers`.
+
+    Args:
+        historical_data: pandas.core.frame.DataFrame containing the data
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it.
+        n_paths: int defining the number of paths.
+        start_date: datetime.date.
+        n_projects: int.
+        initial_investment: float defining the initial investment in USD.
+        min_circ_marketcap: float (see `backtesting.backtest`).
+        min_weight: float (see `backtesting.backtest`).
+        max_weight: float (see `backtesting.backtest`).
+        max_change: float (see `backtesting.backtest`).
+        projects_to_include: list of strings.
+        rebalancing_frequency: "monthly" or a positive integer representing the
+            number of days between rebalances.
+        end_date: datetime.date. If not given, the end date is the last date
+            for which there is data in `historical_data`. The paths have the
+            dates from `start_date` to `end_date`, and resample the returns
+            between these dates.
+        block_size: int defining the number of consecutive days of each block
+            of the bootstrap.
+        seed: int.
+        solver: "basinhopping" or "exact" (see `backtesting._calculate_weights`).
+        batch_size: int defining the number of paths of each task of a worker,
+            which are backtested together (so their panels are in memory at
+            the same time).
+        n_workers: int defining the number of worker processes. If not given,
+            the number of CPUs is used. If 1, paths run in this process.
+        quiet: bool defining whether not to print messages about the progress
+            of computation.
+
+    Returns:
+        tuple of two pandas.core.frame.DataFrame instances. The first contains
+        the daily values of the paths, with one row per path and one column
+        per date (NaN if the backtest of a path failed). The second contains
+        one row per path with its total return, annualized return, volatility,
+        Sharpe ratio, maximum drawdown, number of rebalances, turnover, error
+        message (if the backtest failed), and wall time in seconds (the wall
+        time of its batch divided by the number of paths in the batch).
+    """
+    if not isinstance(historical_data, HistoricalPanel):
+        historical_data = HistoricalPanel(historical_data)
+    if type(n_paths) is not int or n_paths <= 0:
+        raise ValueError("n_paths must be a positive integer")
+    if type(block_size) is not int or block_size <= 0:
+        raise ValueError("block_size must be a positive integer")
+    if end_date is None:
+        end_date = historical_data.end_date
+
+    source = bootstrap_source(
+        historical_data, projects_to_include, start_date, end_date
+    )
+    params = dict(
+        n_projects=n_projects,
+        initial_investment=initial_investment,
+        min_circ_marketcap=min_circ_marketcap,
+        min_weight=min_weight,
+        max_weight=max_weight,
+        max_change=max_change,
+        start_date=start_date,
+        end_date=end_date,
+        rebalancing_frequency=rebalancing_frequency,
+        solver=solver,
+        seed=seed,
+        block_size=block_size,
+    )
+    batches = [
+        range(first, min(first + batch_size, n_paths))
+        for first in range(0, n_paths, batch_size)
+    ]
+
+    n_workers = n_workers or multiprocessing.cpu_count()
+    outputs = []
+    if n_workers == 1:
+        _init_worker(source, params)
+        iterator = map(_run, batches)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(
+            processes=min(n_workers, len(batches)),
+            initializer=_init_worker,
+            initargs=(source, params),
+        )
+        iterator = pool.imap(_run, batches)
+    try:
+        for output in iterator:
+            outputs.append(output)
+            if not quiet:
+                n_done = sum(len(batch) for batch in batches[: len(outputs)])
+                print(f"{n_done}/{n_paths}", end="\r")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    nav = np.vstack([batch_nav for batch_nav, _ in outputs])
+    summary = pd.DataFrame([s for _, summaries in outputs for s in summaries])
+    # Metrics of all paths are calculated at once
+    for i, metric in enumerate(METRICS_OF_PATHS):
+        summary.insert(1 + i, metric, getattr(analytics, metric)(nav))
+    return pd.DataFrame(nav, columns=source["dates"]), summary
+
+
+def confidence_intervals(summary, level=0.9):
+    """Calculate confidence intervals of the performance metrics of the paths
+    of a Monte Carlo simulation.
+
+    Args:
+        summary: pandas.core.frame.DataFrame returned by `monte_carlo`.
+        level: float defining the probability covered by each interval.
+
+    Returns:
+        pandas.core.frame.DataFrame indexed by metric with the lower bound,
+        median, and upper bound of each metric, and the number of paths
+        ("n_paths") whose backtest did not fail.
+    """
+    ok = summary[summary["error"].isna()]
+    quantiles = [(1 - level) / 2, 0.5, (1 + level) / 2]
+    metrics = METRICS_OF_PATHS + ["turnover"]
+    intervals = ok[metrics].quantile(quantiles).T
+    intervals.columns = ["lower", "median", "upper"]
+    intervals["n_paths"] = len(ok)
+    return intervals
+
+
+def _parse_frequency(value):
+    """Parse a rebalancing frequency given in the command line."""
+    return value if value == "monthly" else int(value)
+
+
+def main(args=None):
+    """Run a Monte Carlo simulation from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="historical_data.csv")
+    parser.add_argument("--projects-file", help="file with one project per line")
+    parser.add_argument("--n-paths", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=bt.SEED)
+    parser.add_argument("--start-date", default="2021-01-01")
+    parser.add_argument("--end-date")
+    parser.add_argument("--initial-investment", type=float, default=100.0)
+    parser.add_argument("--n-projects", type=int, default=13)
+    parser.add_argument("--min-weight", type=float, default=0.001)
+    parser.add_argument("--max-weight", type=float, default=0.2)
+    parser.add_argument("--max-change", type=float, default=0.05)
+    parser.add_argument("--min-circ-marketcap", type=float, default=1e8)
+    parser.add_argument(
+        "--rebalancing-frequency", type=_parse_frequency, default="monthly"
+    )
+    parser.add_argument("--solver", default="exact")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--level", type=float, default=0.9)
+    parser.add_argument("--output", default="monte_carlo.csv")
+    parser.add_argument("--nav-output", default="monte_carlo_nav.csv")
+    args = parser.parse_args(args)
+
+    historical_data = HistoricalPanel.from_csv(args.data)
+    if args.projects_file:
+        with open(args.projects_file) as file:
+            projects_to_include = [line.strip() for line in file if line.strip()]
+    else:
+        projects_to_include = list(historical_data.projects)
+
+    start = time.perf_counter()
+    nav, summary = monte_carlo(
+        historical_data,
+        n_paths=args.n_paths,
+        start_date=datetime.date.fromisoformat(args.start_date),
+        end_date=args.end_date and datetime.date.fromisoformat(args.end_date),
+        n_projects=args.n_projects,
+        initial_investment=args.initial_investment,
+        min_circ_marketcap=args.min_circ_marketcap,
+        min_weight=args.min_weight,
+        max_weight=args.max_weight,
+        max_change=args.max_change,
+        projects_to_include=projects_to_include,
+        rebalancing_frequency=args.rebalancing_frequency,
+        block_size=args.block_size,
+        seed=args.seed,
+        solver=args.solver,
+        batch_size=args.batch_size,
+        n_workers=args.workers,
+        quiet=False,
+    )
+    nav.to_csv(args.nav_output, index_label="path")
+    summary.to_csv(args.output, index=False)
+    print(f"Simulated {len(summary)} paths in {time.perf_counter() - start:.1f}s")
+    print(confidence_intervals(summary, args.level).to_string())
+
+
+if __name__ == "__main__":
+    main()
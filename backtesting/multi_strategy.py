@@ -0,0 +1,409 @@
+"""This module contains an engine that backtests many variants of the Token
+Terminal Index in a single pass over the historical data.
+
+Variants (strategies) that share the start date, universe, and rebalancing
+schedule are advanced together: the numbers of tokens of all strategies are
+kept in a (strategies x projects) matrix, so the values of every strategy on
+all days between two rebalances are a single matrix product, and only the
+rebalances are calculated one strategy at a time. Each strategy can also be
+backtested on its own panel with the same dates and projects (e.g. the
+resampled market paths of `monte_carlo`), in which case the values are a
+single batched matrix product."""
+
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import backtesting as bt
+from panel import HistoricalPanel
+from results import BacktestResults
+
+
+STRATEGY_PARAMETERS = [
+    "n_projects",
+    "min_circ_marketcap",
+    "min_weight",
+    "max_weight",
+    "max_change",
+]
+
+
+def _initial_target(
+    historical_data,
+    date,
+    strategy,
+    projects_to_include,
+    solver,
+    cache,
+    targets,
+):
+    """Calculate the projects and weights of an initial target portfolio (see
+    `backtesting._calculate_target_portfolio`).
+
+    Args:
+        historical_data: panel.HistoricalPanel.
+        date: datetime.date.
+        strategy: dict with the parameters of the strategy.
+        projects_to_include: list of strings.
+        solver: "basinhopping" or "exact".
+        cache: weight_cache.WeightCache or None.
+        targets: dict used to reuse the target portfolios of strategies with
+            the same parameters.
+
+    Returns:
+        tuple of the row of the date in the panel, and 1D numpy.ndarray
+        instances with the columns and weights of the projects.
+    """
+    row, columns = bt._target_columns(
+        strategy["n_projects"],
+        date,
+        historical_data,
+        projects_to_include,
+        strategy["min_circ_marketcap"],
+    )
+    key = (
+        row,
+        strategy["n_projects"],
+        strategy["min_weight"],
+        strategy["max_weight"],
+        strategy["min_circ_marketcap"],
+    )
+    if key not in targets:
+        sp = historical_data.sp[row, columns]
+        target = sp / sum(sp)
+        targets[key] = bt._calculate_weights(
+            original=np.clip(target, strategy["min_weight"], strategy["max_weight"]),
+            target=target,
+            max_change=1.0,
+            min_weight=strategy["min_weight"],
+            max_weight=strategy["max_weight"],
+            solver=solver,
+            cache=cache,
+        )
+    return row, columns, targets[key]
+
+
+def _rebalance(
+    historical_data,
+    date,
+    columns,
+    tokens,
+    strategy,
+    projects_to_include,
+    solver,
+    cache,
+    targets,
+    results,
+    day,
+):
+    """Rebalance the portfolio of a strategy with array operations, in the same
+    way as `backtesting._rebalance`, and record the portfolios of the rebalance.
+
+    Args:
+        historical_data: panel.HistoricalPanel.
+        date: datetime.date.
+        columns: 1D integer numpy.ndarray with the columns of the projects of
+            the portfolio, in the order of the portfolio.
+        tokens: 1D floating-point numpy.ndarray.
+        strategy: dict with the parameters of the strategy.
+        projects_to_include: list of strings.
+        solver: "basinhopping" or "exact".
+        cache: weight_cache.WeightCache or None.
+        targets: dict (see `_initial_target`).
+        results: results.BacktestResults of the strategy.
+        day: int defining the number of days since the start of the backtest.
+
+    Returns:
+        tuple of 1D numpy.ndarray instances with the columns of the projects
+        of the rebalanced portfolio and their numbers of tokens.
+    """
+    row, init_columns, init_weights = _initial_target(
+        historical_data,
+        date,
+        strategy,
+        projects_to_include,
+        solver,
+        cache,
+        targets,
+    )
+    price = historical_data.price[row]
+    prices = price[columns]
+    value = sum(prices * tokens)
+    weights = prices * tokens / (prices @ tokens)
+    results.record_arrays(day, "pre-rebalance")
+    results.record_arrays(
+        day,
+        "rebalance-init",
+        init_columns,
+        init_weights,
+        init_weights * value / price[init_columns],
+    )
+
+    # Replace projects with low enough weight that are not in the initial target
+    replaced, new = bt._replacements(
+        columns, weights, init_columns, init_weights, strategy["max_change"]
+    )
+    columns = columns.copy()
+    columns[replaced] = init_columns[new]
+    weights[replaced] = 0
+
+    # Calculate final target portfolio weights
+    n_projects = len(columns)
+    sp = historical_data.sp[row, columns]
+    target_weights = bt._calculate_weights(
+        original=np.ones(n_projects) / n_projects,
+        target=sp / sum(sp),
+        max_change=1.0,
+        min_weight=strategy["min_weight"],
+        max_weight=strategy["max_weight"],
+        solver=solver,
+        cache=cache,
+    )
+    results.record_arrays(
+        day,
+        "rebalance-target",
+        columns,
+        target_weights,
+        target_weights * value / price[columns],
+    )
+
+    # Calculate portfolio weights after rebalancing
+    weights = bt._calculate_weights(
+        original=weights,
+        target=target_weights,
+        max_change=strategy["max_change"],
+        min_weight=strategy["min_weight"],
+        max_weight=1.0,
+        solver=solver,
+        cache=cache,
+    )
+    tokens = weights * value / price[columns]
+    results.record_arrays(day, "rebalanced", columns, weights, tokens)
+    return columns, tokens
+
+
+def backtest_strategies(
+    strategies,
+    initial_investment,
+    start_date,
+    historical_data,
+    projects_to_include,
+    rebalancing_frequency,
+    end_date=None,
+    solver="exact",
+    cache=None,
+    quiet=True,
+):
+    """Backtest many variants of the Token Terminal Index together.
+
+    Each strategy gives the same results (within `backtesting.TOL`) as
+    `backtesting.backtest` with the same parameters. Strategies that fail
+    (e.g. because their constraints cannot be met) stop on the day they fail,
+    and the other strategies continue.
+
+    Args:
+        strategies: list of dicts with the values of the parameters in
+            `STRATEGY_PARAMETERS` of each strategy.
+        initial_investment: float defining the initial investment in USD.
+        start_date: datetime.date.
+        historical_data: pandas.core.frame.DataFrame containing the data
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it, shared by all strategies, or
+            list with a panel.HistoricalPanel per strategy, all with the same
+            dates and projects.
+        projects_to_include: list of strings.
+        rebalancing_frequency: "monthly" or a positive integer representing the
+            number of days between rebalances.
+        end_date: datetime.date. If not given, the end date is the last date
+            for which there is data in `historical_data`.
+        solver: "basinhopping" or "exact" (see `backtesting._calculate_weights`).
+        cache: weight_cache.WeightCache (see `backtesting.backtest`).
+        quiet: bool defining whether not to print messages about the progress
+            of computation.
+
+    Returns:
+        tuple of a pandas.core.frame.DataFrame with the value in USD of each
+        strategy (rows) at the end of each day (columns), which is NaN after
+        a strategy fails, a list with the results.BacktestResults of each
+        strategy (None for strategies that failed), and a list with the error
+        message of each strategy (None for strategies that did not fail).
+    """
+    if not strategies:
+        raise ValueError("strategies must be a non-empty list of dicts")
+    for strategy in strategies:
+        if sorted(strategy) != sorted(STRATEGY_PARAMETERS):
+            raise ValueError(f"strategies must only define {STRATEGY_PARAMETERS}")
+    if isinstance(historical_data, pd.DataFrame):
+        historical_data = HistoricalPanel(historical_data)
+    if isinstance(historical_data, HistoricalPanel):
+        panels = [historical_data] * len(strategies)
+    elif isinstance(historical_data, list) and all(
+        isinstance(panel, HistoricalPanel) for panel in historical_data
+    ):
+        panels = historical_data
+        if len(panels) != len(strategies):
+            raise ValueError("historical_data must have a panel per strategy")
+        for panel in panels:
+            if panel.dates != panels[0].dates or panel.projects != panels[0].projects:
+                raise ValueError("Panels must have the same dates and projects")
+    else:
+        raise ValueError(
+            "historical_data must be a pandas.core.frame.DataFrame, "
+            "panel.HistoricalPanel instance, or list of panel.HistoricalPanel "
+            "instances"
+        )
+    panel = panels[0]
+    shared = all(p is panel for p in panels)
+    if end_date is None:
+        end_date = panel.end_date
+
+    n_strategies = len(strategies)
+    n_days = (end_date - start_date).days + 1
+    results = [BacktestResults(panels[s], start_date) for s in range(n_strategies)]
+    errors = [None] * n_strategies
+    # Target portfolios are shared by strategies with the same parameters and
+    # panel
+    targets = {id(p): {} for p in panels}
+
+    # Numbers of tokens held by each strategy, the columns of the projects of
+    # each portfolio in the order of the portfolio, and the daily values
+    tokens = np.zeros((n_strategies, len(panel.projects)))
+    members = [np.zeros(0, dtype=int) for _ in strategies]
+    active = np.ones(n_strategies, dtype=bool)
+    nav = np.full((n_strategies, n_days), np.nan)
+
+    def fail(s, e):
+        errors[s] = f"{type(e).__name__}: {e}"
+        results[s] = None
+        active[s] = False
+        tokens[s] = 0.0
+
+    def hold(s, columns, holdings):
+        tokens[s] = 0.0
+        members[s] = columns
+        tokens[s, columns] = holdings
+
+    for s, strategy in enumerate(strategies):
+        try:
+            bt._validate_strategy(**strategy)
+            row, columns, weights = _initial_target(
+                panels[s],
+                start_date,
+                strategy,
+                projects_to_include,
+                solver,
+                cache,
+                targets[id(panels[s])],
+            )
+        except Exception as e:
+            fail(s, e)
+            continue
+        price = panels[s].price[row, columns]
+        holdings = weights * initial_investment / price
+        results[s].record_arrays(0, "start", columns, weights, holdings)
+        hold(s, columns, holdings)
+        nav[s, 0] = sum(price * holdings)
+
+    i = 1
+    while i < n_days:
+
+        # Update all days until the next rebalance
+        date = start_date + datetime.timedelta(days=i)
+        dates = [date]
+        while dates[-1] < end_date and not bt._is_rebalance_day(
+            i + len(dates) - 1, dates[-1], rebalancing_frequency
+        ):
+            dates.append(dates[-1] + datetime.timedelta(days=1))
+        if not quiet:
+            print(dates[-1], end="\r")
+
+        # Values of every strategy on every day of the interval. Prices of
+        # projects that are not held do not count, even if they are missing
+        rows = [panel.date_loc(d) for d in dates]
+        held = np.flatnonzero(np.any(tokens != 0, axis=0))
+        if shared:
+            prices = panel.price[np.ix_(rows, held)]
+            values = np.nan_to_num(prices) @ tokens[:, held].T
+            # Strategies holding a project without a price fail on that day
+            missing = np.isnan(prices) @ (tokens[:, held] != 0).T
+        else:  # (strategies x days x projects) @ (strategies x projects x 1)
+            prices = np.stack([p.price[np.ix_(rows, held)] for p in panels])
+            held_tokens = tokens[:, held, np.newaxis]
+            values = (np.nan_to_num(prices) @ held_tokens)[:, :, 0].T
+            missing = (np.isnan(prices) @ (held_tokens != 0))[:, :, 0].T
+        nav[active, i : i + len(dates)] = values[:, active].T
+
+        for s in np.flatnonzero(np.any(missing, axis=0) & active):
+            try:
+                bt._check_prices(
+                    panels[s].price[np.ix_(rows, members[s])],
+                    dates,
+                    [panel.projects[j] for j in members[s]],
+                )
+            except ValueError as e:
+                nav[s, i + np.argmax(missing[:, s]) :] = np.nan
+                fail(s, e)
+
+        i += len(dates) - 1
+        date = dates[-1]
+        rebalance = bt._is_rebalance_day(i, date, rebalancing_frequency)
+        for s, strategy in enumerate(strategies):
+            if not active[s]:
+                continue
+            if not rebalance:
+                results[s].record_arrays(i, "normal-day")
+                continue
+            try:
+                columns, holdings = _rebalance(
+                    panels[s],
+                    date,
+                    members[s],
+                    tokens[s, members[s]],
+                    strategy,
+                    projects_to_include,
+                    solver,
+                    cache,
+                    targets[id(panels[s])],
+                    results[s],
+                    i,
+                )
+            except Exception as e:
+                fail(s, e)
+                continue
+            hold(s, columns, holdings)
+
+        i += 1
+
+    nav = pd.DataFrame(
+        nav,
+        columns=[str(start_date + datetime.timedelta(days=d)) for d in range(n_days)],
+    )
+    return nav, results, errors
+
+
+def summary(strategies, results, errors, risk_free_rate=0.0):
+    """Summarise the backtests of many strategies.
+
+    Args:
+        strategies: list of dicts (see `backtest_strategies`).
+        results: list of results.BacktestResults or None (see
+            `backtest_strategies`).
+        errors: list of strings or None (see `backtest_strategies`).
+        risk_free_rate: float defining the annual risk-free rate.
+
+    Returns:
+        pandas.core.frame.DataFrame with one row per strategy, containing its
+        parameters, the performance metrics of `analytics.summary`, and the
+        error message of the strategies that failed.
+    """
+    rows = []
+    for strategy, strategy_results, error in zip(strategies, results, errors):
+        row = {p: strategy[p] for p in STRATEGY_PARAMETERS}
+        if strategy_results is not None:
+            row.update(analytics.summary(strategy_results, risk_free_rate))
+        row["error"] = error
+        rows.append(row)
+    return pd.DataFrame(rows)
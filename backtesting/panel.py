@@ -0,0 +1,295 @@
+"""This module contains a dense date x project representation of the historical
+data used for backtesting the Token Terminal Index."""
+
+
+import datetime
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from ranking import RankingIndex
+
+
+METRICS = ["price", "sp", "market_cap_circulating"]
+
+
+def _factorize(column):
+    """Return the sorted unique values of a column as strings, and the index
+    of the value of each row in them.
+
+    Args:
+        column: pandas.core.series.Series.
+
+    Returns:
+        tuple of two 1D numpy.ndarrays.
+
+    Raises:
+        ValueError: if the column has missing values, which have no place in
+            the panel.
+    """
+    if column.isna().any():
+        raise ValueError(f"Column {column.name} has missing values")
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Categorical columns are factorized already, so only their categories
+        # need sorting
+        column = column.cat.remove_unused_categories()
+        categories = np.asarray(column.cat.categories.astype(str))
+        order = np.argsort(categories)
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        return categories[order], rank[column.cat.codes.values]
+    return np.unique(column.astype(str).values, return_inverse=True)
+
+
+class HistoricalPanel:
+    """Dense date x project panel of the data extracted by the script
+    `extract_historical_data.py`.
+
+    The panel is built once and turns every lookup by date and project into an
+    array index, instead of filtering the full historical data frame.
+
+    Args:
+        historical_data: pandas.core.frame.DataFrame containing at least the
+            columns "datetime", "project", "project_id", "price", "sp", and
+            "market_cap_circulating".
+
+    Raises:
+        ValueError: if a date or project is missing, or there is more than one
+            row for the same date and project.
+
+    Attributes:
+        dates: list of strings with the dates of the panel in ascending order
+            (formatted as "%Y-%m-%d").
+        projects: list of strings with the names of the projects of the panel.
+        project_ids: 1D numpy.ndarray of strings with the id of each project.
+        date_index: dict mapping each date string to its row in the panel.
+        project_index: dict mapping each project name to its column in the
+            panel.
+        price: 2D floating-point numpy.ndarray (dates x projects).
+        sp: 2D floating-point numpy.ndarray (dates x projects).
+        market_cap_circulating: 2D floating-point numpy.ndarray
+            (dates x projects).
+
+    Note:
+        Metrics of projects without data on a given date are NaN.
+    """
+
+    def __init__(self, historical_data):
+
+        dates, date_codes = _factorize(historical_data["datetime"])
+        projects, project_codes = _factorize(historical_data["project"])
+
+        # Each cell of the panel holds the data of a single row
+        cells = date_codes * len(projects) + project_codes
+        unique, counts = np.unique(cells, return_counts=True)
+        if np.any(counts > 1):
+            cell = unique[np.argmax(counts > 1)]
+            raise ValueError(
+                f"Duplicate rows for {projects[cell % len(projects)]} on "
+                f"{dates[cell // len(projects)]}"
+            )
+
+        self.dates = list(dates)
+        self.projects = list(projects)
+        self.date_index = {d: i for i, d in enumerate(self.dates)}
+        self.project_index = {p: i for i, p in enumerate(self.projects)}
+
+        self.project_ids = np.empty(len(projects), dtype=object)
+        self.project_ids[project_codes] = historical_data["project_id"].values
+
+        for metric in METRICS:
+            values = np.full((len(dates), len(projects)), np.nan)
+            values[date_codes, project_codes] = historical_data[metric].astype(float)
+            setattr(self, metric, values)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Build a panel from a .csv file created by `extract_historical_data.py`.
+
+        Args:
+            path: path to the .csv file.
+
+        Returns:
+            HistoricalPanel.
+        """
+        return cls(
+            pd.read_csv(path, usecols=["datetime", "project_id", "project"] + METRICS)
+        )
+
+    @classmethod
+    def from_arrays(cls, dates, projects, project_ids, **metrics):
+        """Build a panel from arrays that are already in the layout of a panel
+        (e.g. synthetic data).
+
+        Args:
+            dates: list of strings with the dates of the panel in ascending
+                order (formatted as "%Y-%m-%d").
+            projects: list of strings with the names of the projects of the
+                panel in ascending order.
+            project_ids: list of strings with the id of each project.
+            **metrics: 2D floating-point numpy.ndarrays (dates x projects) of
+                each metric in `METRICS`.
+
+        Returns:
+            HistoricalPanel.
+        """
+        panel = cls.__new__(cls)
+        panel.dates = list(dates)
+        panel.projects = list(projects)
+        panel.date_index = {d: i for i, d in enumerate(panel.dates)}
+        panel.project_index = {p: i for i, p in enumerate(panel.projects)}
+        panel.project_ids = np.array(project_ids, dtype=object)
+        for metric in METRICS:
+            values = np.asarray(metrics[metric], dtype=float)
+            if values.shape != (len(panel.dates), len(panel.projects)):
+                raise ValueError(f"{metric} does not have the shape of the panel")
+            setattr(panel, metric, values)
+        return panel
+
+    @property
+    def start_date(self):
+        """datetime.date of the first date in the panel."""
+        return datetime.datetime.strptime(self.dates[0], "%Y-%m-%d").date()
+
+    @property
+    def end_date(self):
+        """datetime.date of the last date in the panel."""
+        return datetime.datetime.strptime(self.dates[-1], "%Y-%m-%d").date()
+
+    def date_loc(self, date):
+        """Return the row of a date in the panel.
+
+        Args:
+            date: datetime.date or string formatted as "%Y-%m-%d".
+
+        Returns:
+            int.
+        """
+        try:
+            return self.date_index[str(date)]
+        except KeyError:
+            raise ValueError(f"There is no data for {date} in historical_data")
+
+    def project_loc(self, projects):
+        """Return the columns of projects in the panel.
+
+        Args:
+            projects: iterable of strings.
+
+        Returns:
+            1D integer numpy.ndarray.
+        """
+        try:
+            return np.array([self.project_index[p] for p in projects], dtype=int)
+        except KeyError as e:
+            raise ValueError(f"There is no data for {e.args[0]} in historical_data")
+
+    def cross_section(self, date, projects):
+        """Return the data of the given projects on a given date.
+
+        Args:
+            date: datetime.date or string formatted as "%Y-%m-%d".
+            projects: iterable of strings. Projects without data in the panel
+                are ignored.
+
+        Returns:
+            pandas.core.frame.DataFrame with the columns "datetime", "project",
+            "project_id", "price", "sp", and "market_cap_circulating".
+        """
+        i = self.date_loc(date)
+        columns = self.project_loc([p for p in projects if p in self.project_index])
+        return self.frame(i, columns)
+
+    def frame(self, row, columns):
+        """Return the data of the given columns of a row of the panel.
+
+        Args:
+            row: int.
+            columns: 1D integer numpy.ndarray.
+
+        Returns:
+            pandas.core.frame.DataFrame (see `cross_section`).
+        """
+        df = pd.DataFrame(
+            {
+                "datetime": self.dates[row],
+                "project": [self.projects[j] for j in columns],
+                "project_id": self.project_ids[columns],
+            }
+        )
+        for metric in METRICS:
+            df[metric] = getattr(self, metric)[row, columns]
+        return df
+
+    def ranking(self, projects, min_circ_marketcap):
+        """Return the ranking index of a universe of projects and minimum
+        circulating market cap, which is built once and reused by every
+        backtest on the panel with the same universe and minimum.
+
+        Args:
+            projects: iterable of strings. Projects without data in the panel
+                are ignored.
+            min_circ_marketcap: float.
+
+        Returns:
+            ranking.RankingIndex.
+        """
+        projects = tuple(projects)
+        if "_rankings" not in self.__dict__:
+            self._rankings = {}
+        key = (projects, min_circ_marketcap)
+        if key not in self._rankings:
+            self._rankings[key] = RankingIndex(
+                self.sp,
+                self.market_cap_circulating,
+                self.project_loc([p for p in projects if p in self.project_index]),
+                min_circ_marketcap,
+            )
+        return self._rankings[key]
+
+    def fingerprint(self, projects, start_date=None, end_date=None):
+        """Return a hash of the data of the given projects between two dates.
+
+        Args:
+            projects: iterable of strings. Projects without data in the panel
+                are ignored.
+            start_date: datetime.date or string formatted as "%Y-%m-%d". If not
+                given, the first date of the panel is used.
+            end_date: datetime.date or string formatted as "%Y-%m-%d". If not
+                given, the last date of the panel is used.
+
+        Returns:
+            str.
+        """
+        rows = slice(
+            0 if start_date is None else self.date_loc(start_date),
+            len(self.dates) if end_date is None else self.date_loc(end_date) + 1,
+        )
+        projects = sorted(p for p in set(projects) if p in self.project_index)
+        columns = self.project_loc(projects)
+        h = hashlib.sha256()
+        h.update(json.dumps([self.dates[rows], projects]).encode("utf-8"))
+        h.update(
+            json.dumps([str(i) for i in self.project_ids[columns]]).encode("utf-8")
+        )
+        for metric in METRICS:
+            h.update(np.ascontiguousarray(getattr(self, metric)[rows, columns]))
+        return h.hexdigest()
+
+    def get(self, metric, date, project):
+        """Return the value of a metric of a project on a given date.
+
+        Args:
+            metric: str.
+            date: datetime.date or string formatted as "%Y-%m-%d".
+            project: str.
+
+        Returns:
+            float, or str if `metric` is "project_id".
+        """
+        j = self.project_loc([project])[0]
+        if metric == "project_id":
+            return self.project_ids[j]
+        return getattr(self, metric)[self.date_loc(date), j].item()
@@ -0,0 +1,113 @@
+"""This module contains a profiler for backtests of the Token Terminal Index,
+which times the phases of a backtest and collects diagnostics of the weight
+optimizations."""
+
+
+import contextlib
+import time
+
+
+PHASES = [
+    "data_lookup",
+    "mark_to_market",
+    "target_construction",
+    "rebalance",
+    "weights",
+    "recording",
+    "checkpoint",
+    "export",
+]
+
+
+class Profiler:
+    """Profiler of backtests (see `backtesting.backtest`).
+
+    Phases are timed inclusively, i.e. the time of the "target_construction"
+    phase includes the "data_lookup" and "weights" phases within it. The phases
+    are:
+
+    - "data_lookup": selecting the historical data of a target portfolio, or
+      of the portfolio on a given day (daily engine).
+    - "mark_to_market": updating the prices and weights of the portfolio
+      between rebalances.
+    - "target_construction": calculating a target portfolio.
+    - "rebalance": rebalancing the portfolio.
+    - "weights": each call of `backtesting._calculate_weights`.
+    - "recording": saving portfolios in the results.
+    - "checkpoint": loading and saving the checkpoint.
+    - "export": writing results to files (see e.g. `backtesting.results_to_json`),
+      when the profiler is passed to the export function.
+
+    Args:
+        callback: function called with a dict describing each timed phase
+            ({"event": "phase", "phase", "seconds"}) and weight optimization
+            ({"event": "solver", ...}, see `solver_calls`) as it happens.
+
+    Attributes:
+        callback: function or None.
+        phases: dict mapping each phase to a dict with its number of "calls"
+            and total "seconds".
+        solver_calls: list of dicts with the "solver", number of projects
+            "n", whether the weights were found in the weight cache
+            ("cached"), "seconds", "success", and the number of iterations
+            ("nit") and cost function evaluations ("nfev") of each call of
+            `backtesting._calculate_weights`.
+    """
+
+    def __init__(self, callback=None):
+
+        self.callback = callback
+        self.phases = {}
+        self.solver_calls = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a phase.
+
+        Args:
+            name: str.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            phase = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0})
+            phase["calls"] += 1
+            phase["seconds"] += seconds
+            if self.callback is not None:
+                self.callback({"event": "phase", "phase": name, "seconds": seconds})
+
+    def solver_call(self, **diagnostics):
+        """Record the diagnostics of a weight optimization.
+
+        Args:
+            **diagnostics: see `solver_calls`.
+        """
+        self.solver_calls.append(diagnostics)
+        if self.callback is not None:
+            self.callback(dict(event="solver", **diagnostics))
+
+    def to_dict(self):
+        """Return the timings and diagnostics collected by the profiler.
+
+        Returns:
+            dict with the keys "phases" and "solver_calls".
+        """
+        return {
+            "phases": {name: dict(phase) for name, phase in self.phases.items()},
+            "solver_calls": list(self.solver_calls),
+        }
+
+
+def phase(profiler, name):
+    """Return a context manager that times a phase with a profiler, or does
+    nothing if there is no profiler.
+
+    Args:
+        profiler: Profiler or None.
+        name: str.
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
@@ -0,0 +1,110 @@
+"""This module contains an index of the projects eligible for the
+Token Terminal Index on each date, ranked by sales-to-price ratio."""
+
+
+import numpy as np
+
+
+class RankingIndex:
+    """Eligible projects of every date of a panel, sorted by sales-to-price
+    ratio in descending order, for a given universe of projects and minimum
+    circulating market cap.
+
+    With the index, the projects of a target portfolio are the first projects
+    of the ranking of its date, instead of the result of filtering and sorting
+    the data of that date. Projects with the same sales-to-price ratio are
+    ranked in the order of their columns in the panel (i.e. by name), so the
+    ranking does not depend on the order of the projects of the universe.
+    The ranking of a date is only calculated the first time it is used, so
+    building the index does not cost anything for the dates that no backtest
+    asks for.
+
+    Args:
+        sp: 2D floating-point numpy.ndarray (dates x projects) with the
+            sales-to-price ratios of a panel.
+        market_cap_circulating: 2D floating-point numpy.ndarray
+            (dates x projects) with the circulating market caps of a panel.
+        columns: 1D integer numpy.ndarray with the columns of the projects of
+            the universe.
+        min_circ_marketcap: float defining the minimum circulating market cap
+            in USD a project needs to have to be included.
+
+    """
+
+    def __init__(self, sp, market_cap_circulating, columns, min_circ_marketcap):
+
+        self._sp = sp
+        self._market_cap_circulating = market_cap_circulating
+        self._columns = np.sort(np.asarray(columns, dtype=int))
+        self._min_circ_marketcap = min_circ_marketcap
+        self._rows = [None] * len(sp)
+
+    def _row(self, row):
+        """Return the number of projects with data and the ranking of a date,
+        calculating them the first time they are used."""
+        if self._rows[row] is None:
+            columns = self._columns
+            sp = self._sp[row, columns]
+            market_cap = self._market_cap_circulating[row, columns]
+            has_data = ~np.isnan(market_cap) & ~np.isnan(sp)
+            with np.errstate(invalid="ignore"):
+                eligible = has_data & (market_cap >= self._min_circ_marketcap)
+            j = np.flatnonzero(eligible)
+            self._rows[row] = (
+                int(has_data.sum()),
+                columns[j[np.argsort(-sp[j], kind="stable")]],
+            )
+        return self._rows[row]
+
+    def n_with_data(self, row):
+        """Return the number of projects of the universe with circulating
+        market cap and sales-to-price data on a date.
+
+        Args:
+            row: int defining the row of the date in the panel.
+
+        Returns:
+            int.
+        """
+        return self._row(row)[0]
+
+    def ranking(self, row):
+        """Return the eligible projects of a date in order of their rank.
+
+        Args:
+            row: int defining the row of the date in the panel.
+
+        Returns:
+            1D integer numpy.ndarray with the columns of the projects.
+        """
+        return self._row(row)[1]
+
+    def top(self, row, n_projects):
+        """Return the columns of the projects with the highest sales-to-price
+        ratios on a date.
+
+        Args:
+            row: int defining the row of the date in the panel.
+            n_projects: int.
+
+        Returns:
+            1D integer numpy.ndarray, with fewer than `n_projects` columns if
+            there are not enough eligible projects.
+        """
+        return self.ranking(row)[:n_projects]
+
+
+def descending_order(values):
+    """Return the indices that sort values in descending order, with ties in
+    the same order as `pandas.DataFrame.sort_values(ascending=False)`.
+
+    Args:
+        values: 1D floating-point numpy.ndarray without NaNs.
+
+    Returns:
+        1D integer numpy.ndarray.
+    """
+    # Same order as pandas' descending sort: an ascending sort of the reversed
+    # values, reversed
+    values = np.asarray(values)
+    return (len(values) - 1 - np.argsort(values[::-1], kind="quicksort"))[::-1]
@@ -0,0 +1,177 @@
+"""This module contains an on-disk cache for the responses of the Token Terminal
+API."""
+
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ResponseCache:
+    """On-disk cache of the responses of `api_wrapper.ApiWrapper`.
+
+    Responses are saved by URL and query parameters together with their ETag
+    and Last-Modified headers. A cached response younger than `ttl` is used
+    without making a request; older responses are revalidated with a
+    conditional request, so a response that has not changed comes back as a
+    "304 Not Modified" without its body.
+
+    Args:
+        path: path to the directory where responses are saved.
+        ttl: float defining the number of seconds for which a cached response
+            is used without revalidation. If None, cached responses are always
+            revalidated.
+
+    Attributes:
+        path: str.
+        ttl: float or None.
+        hits: int defining the number of responses used without a request.
+        not_modified: int defining the number of responses revalidated by a
+            "304 Not Modified" response.
+        misses: int defining the number of responses that were downloaded.
+        bytes_saved: int defining the number of bytes of the cached responses
+            that were not downloaded.
+    """
+
+    def __init__(self, path, ttl=None):
+
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, url, params=None):
+        """Return the cache key of a request.
+
+        Args:
+            url: str.
+            params: dict, optional.
+
+        Returns:
+            str.
+        """
+        text = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return a cached response.
+
+        Args:
+            key: str.
+
+        Returns:
+            dict with the "headers" (dict), "content" (bytes), and "time"
+            (float) at which the response was saved or last revalidated, or
+            None if the key is not cached.
+        """
+        try:
+            with open(self._file(key, "json"), encoding="utf-8") as file:
+                entry = json.load(file)
+            with open(self._file(key, "body"), "rb") as file:
+                entry["content"] = file.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        """Return whether a cached response can be used without revalidation.
+
+        Args:
+            entry: dict returned by `get`.
+
+        Returns:
+            bool.
+        """
+        return self.ttl is not None and time.time() - entry["time"] < self.ttl
+
+    def validators(self, entry):
+        """Return the headers of a conditional request for a cached response.
+
+        Args:
+            entry: dict returned by `get`.
+
+        Returns:
+            dict.
+        """
+        headers = {}
+        if "ETag" in entry["headers"]:
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def put(self, key, headers, content):
+        """Cache a response.
+
+        Args:
+            key: str.
+            headers: dict-like with the headers of the response.
+            content: bytes with the body of the response.
+        """
+        headers = {
+            name: headers[name]
+            for name in ["Content-Type", "ETag", "Last-Modified"]
+            if name in headers
+        }
+        # Write to temporary files first so that concurrent readers never see
+        # a partially written response
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(f"{self._file(key, 'body')}.{suffix}", "wb") as file:
+            file.write(content)
+        with open(f"{self._file(key, 'json')}.{suffix}", "w", encoding="utf-8") as file:
+            json.dump({"headers": headers, "time": time.time()}, file)
+        os.replace(f"{self._file(key, 'body')}.{suffix}", self._file(key, "body"))
+        os.replace(f"{self._file(key, 'json')}.{suffix}", self._file(key, "json"))
+
+    def touch(self, key, entry):
+        """Record that a cached response has been revalidated.
+
+        Args:
+            key: str.
+            entry: dict returned by `get`.
+        """
+        self.put(key, entry["headers"], entry["content"])
+
+    def record(self, outcome, entry=None):
+        """Count the outcome of a request.
+
+        Args:
+            outcome: "hit", "not_modified", or "miss".
+            entry: dict returned by `get` for hits and revalidated responses.
+        """
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "not_modified":
+                self.not_modified += 1
+            else:
+                self.misses += 1
+            if entry is not None:
+                self.bytes_saved += len(entry["content"])
+
+    def clear(self):
+        """Remove all cached responses."""
+        for name in os.listdir(self.path):
+            if name.endswith(".json") or name.endswith(".body"):
+                os.remove(os.path.join(self.path, name))
+
+    @property
+    def stats(self):
+        """dict with the numbers of hits, revalidated responses, misses, and
+        bytes saved."""
+        return {
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def _file(self, key, extension):
+        """Return the path of a file of a key."""
+        return os.path.join(self.path, f"{key}.{extension}")
@@ -0,0 +1,285 @@
+"""This module contains a content-addressed cache of the output files of
+backtests, used by `run_backtest.py` to skip backtests whose parameters, data
+and code have not changed.
+
+It can also be executed as a script to inspect or evict cache entries, e.g.:
+
+    python result_cache.py list
+    python result_cache.py evict 3f2a9c
+    python result_cache.py evict --all"""
+
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+
+import numpy
+import pandas
+import scipy
+
+import backtesting
+import checkpoint
+import panel
+import profiling
+import ranking
+import results
+from data_store import _hash_file
+
+
+RESULT_CACHE_VERSION = 1
+
+# Modules whose code determines the output files of a backtest, i.e.
+# `backtesting` and every module it imports
+LIBRARY_MODULES = [
+    backtesting,
+    checkpoint,
+    panel,
+    profiling,
+    ranking,
+    results,
+]
+
+# Libraries whose versions can change the output files of a backtest (e.g.
+# the results of the solvers, or how numbers are formatted)
+DEPENDENCIES = [numpy, pandas, scipy]
+
+
+def library_version():
+    """Return a hash of the code of the modules in `LIBRARY_MODULES` and the
+    versions of the libraries in `DEPENDENCIES`.
+
+    Returns:
+        str.
+    """
+    h = hashlib.sha256()
+    for module in LIBRARY_MODULES:
+        with open(module.__file__, "rb") as file:
+            h.update(file.read())
+    for library in DEPENDENCIES:
+        h.update(f"{library.__name__}=={library.__version__}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Cache of the output files of backtests, keyed by a hash of their
+    parameters, the slice of the historical data they use, and the version of
+    the library.
+
+    The contents of every output file are saved once under their SHA-256 hash
+    (in `objects`), and each entry (in `entries`) maps the names of the output
+    files of a backtest to the hashes of their contents. Restoring an entry
+    only writes the output files whose contents differ from the files on disk.
+
+    Args:
+        path: path to the directory of the cache.
+
+    Attributes:
+        path: str.
+        hits: int defining the number of entries found.
+        misses: int defining the number of entries that were not found.
+    """
+
+    def __init__(self, path=".result_cache"):
+
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(path, "entries"), exist_ok=True)
+
+    def key(self, params, historical_data, outputs):
+        """Return the cache key of a backtest and its output files.
+
+        Args:
+            params: dict of keyword arguments of `backtesting.backtest`,
+                excluding `historical_data`.
+            historical_data: panel.HistoricalPanel.
+            outputs: dict mapping the names of the output files to the options
+                they are generated with.
+
+        Returns:
+            str.
+        """
+        end_date = params.get("end_date") or historical_data.end_date
+        data = historical_data.fingerprint(
+            params["projects_to_include"], params["start_date"], end_date
+        )
+        description = {
+            "cache_version": RESULT_CACHE_VERSION,
+            "version": library_version(),
+            "params": params,
+            "data": data,
+            "outputs": outputs,
+        }
+        text = json.dumps(description, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the entry of a key.
+
+        Args:
+            key: str.
+
+        Returns:
+            dict with the "key", "created" time, backtest "params", and
+            "outputs" (mapping the names of the output files to the hashes of
+            their contents) of the entry, or None if the key is not cached or
+            the contents of any of its files are missing.
+        """
+        path = self._entry_file(key)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                entry = json.load(file)
+            if all(
+                os.path.exists(self._object_file(h)) for h in entry["outputs"].values()
+            ):
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, params, files):
+        """Save the output files of a backtest.
+
+        Args:
+            key: str.
+            params: dict of keyword arguments of `backtesting.backtest`,
+                excluding `historical_data`.
+            files: dict mapping the names of the output files to their paths.
+
+        Returns:
+            dict with the new entry (see `get`).
+        """
+        outputs = {}
+        for name, path in files.items():
+            h = _hash_file(path)
+            if not os.path.exists(self._object_file(h)):
+                self._copy(path, self._object_file(h))
+            outputs[name] = h
+        entry = {
+            "key": key,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "params": json.loads(json.dumps(params, default=str)),
+            "outputs": outputs,
+        }
+        tmp = f"{self._entry_file(key)}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(entry, file, indent=4)
+        os.replace(tmp, self._entry_file(key))
+        return entry
+
+    def restore(self, entry, directory="."):
+        """Write the output files of an entry whose contents differ from the
+        files in a directory.
+
+        Args:
+            entry: dict (see `get`).
+            directory: path to the directory of the output files.
+
+        Returns:
+            list with the names of the files that were written.
+        """
+        written = []
+        for name, h in entry["outputs"].items():
+            path = os.path.join(directory, name)
+            if os.path.exists(path) and _hash_file(path) == h:
+                continue
+            self._copy(self._object_file(h), path)
+            written.append(name)
+        return written
+
+    def entries(self):
+        """Return the entries of the cache.
+
+        Returns:
+            list of dicts (see `get`), with the total "size" in bytes of the
+            contents of their files, sorted by creation time and key.
+        """
+        entries = []
+        for name in os.listdir(os.path.join(self.path, "entries")):
+            if not name.endswith(".json"):
+                continue
+            with open(
+                os.path.join(self.path, "entries", name), encoding="utf-8"
+            ) as file:
+                entry = json.load(file)
+            entry["size"] = sum(
+                os.path.getsize(self._object_file(h))
+                for h in entry["outputs"].values()
+                if os.path.exists(self._object_file(h))
+            )
+            entries.append(entry)
+        return sorted(entries, key=lambda e: (e["created"], e["key"]))
+
+    def evict(self, keys=None):
+        """Remove entries from the cache, and the contents of files that are
+        no longer used by any entry.
+
+        Args:
+            keys: list of keys, or of prefixes of keys, of the entries to
+                remove. If not given, all entries are removed.
+
+        Returns:
+            list with the keys of the removed entries.
+        """
+        removed = []
+        for entry in self.entries():
+            if keys is None or any(entry["key"].startswith(k) for k in keys):
+                os.remove(self._entry_file(entry["key"]))
+                removed.append(entry["key"])
+
+        used = {h for entry in self.entries() for h in entry["outputs"].values()}
+        for name in os.listdir(os.path.join(self.path, "objects")):
+            if name not in used:
+                os.remove(os.path.join(self.path, "objects", name))
+        return removed
+
+    def _entry_file(self, key):
+        """Return the path of the file of an entry."""
+        return os.path.join(self.path, "entries", f"{key}.json")
+
+    def _object_file(self, h):
+        """Return the path of the file with the contents of a hash."""
+        return os.path.join(self.path, "objects", h)
+
+    @staticmethod
+    def _copy(source, path):
+        """Copy a file, writing to a temporary file first so that readers
+        never see a partially written file."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, path)
+
+
+def main(args=None):
+    """Inspect or evict the entries of a result cache from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache-dir", default=".result_cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list the entries of the cache")
+    evict = subparsers.add_parser("evict", help="remove entries from the cache")
+    evict.add_argument("keys", nargs="*", help="keys, or prefixes of keys")
+    evict.add_argument("--all", action="store_true", help="remove all entries")
+    args = parser.parse_args(args)
+
+    cache = ResultCache(args.cache_dir)
+    if args.command == "list":
+        for entry in cache.entries():
+            params = entry["params"]
+            print(
+                f"{entry['key'][:12]}  {entry['created']}  "
+                f"{params.get('start_date')} to {params.get('end_date') or 'latest'}  "
+                f"{len(entry['outputs'])} files  {entry['size']} bytes"
+            )
+    else:
+        if not args.keys and not args.all:
+            parser.error("evict requires keys or --all")
+        removed = cache.evict(None if args.all else args.keys)
+        print(f"Evicted {len(removed)} entries")
+
+
+if __name__ == "__main__":
+    main()
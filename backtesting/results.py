@@ -0,0 +1,297 @@
+"""This module contains a compact representation of the results of a backtest
+of the Token Terminal Index."""
+
+
+import bisect
+import collections.abc
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+STORED_STATUSES = ["start", "rebalance-init", "rebalance-target", "rebalanced"]
+
+
+class BacktestResults:
+    """Compact results of a backtest.
+
+    Only the portfolios calculated on the start and rebalance days are stored.
+    Since the numbers of tokens only change on those days, all other portfolios
+    ("normal-day" and "pre-rebalance") are rebuilt on demand from the
+    historical data.
+
+    The results can be used in place of the dictionary returned by
+    `backtesting.backtest`: `results["portfolios"]` is a sequence that builds
+    each portfolio when it is accessed, `results["statuses"]` is the list of
+    their statuses, and `results["profile"]` is the profile of the backtest,
+    if it was profiled. As in a dictionary, `"profile" in results`,
+    `results.get("profile")` and `results.keys()` tell which of them exist.
+
+    Args:
+        historical_data: panel.HistoricalPanel used in the backtest.
+        start_date: datetime.date.
+
+    Attributes:
+        historical_data: panel.HistoricalPanel.
+        start_date: datetime.date.
+        n_days: int defining the number of simulated days.
+        events: list of dicts containing the day, status, panel columns,
+            weights, and numbers of tokens of the stored portfolios.
+        profile: dict returned by `profiling.Profiler.to_dict`, or None if the
+            backtest was not profiled.
+    """
+
+    def __init__(self, historical_data, start_date):
+
+        self.historical_data = historical_data
+        self.start_date = start_date
+        self.n_days = 0
+        self.events = []
+        self.profile = None
+        self._entries = None
+
+    def record(self, day, status, portfolio):
+        """Record the portfolio of a given day.
+
+        Args:
+            day: int defining the number of days since the start of the
+                backtest.
+            status: str.
+            portfolio: pandas.core.frame.DataFrame containing the details of
+                the portfolio. Portfolios that can be rebuilt from the
+                historical data are not stored.
+        """
+        if status in STORED_STATUSES:
+            self.record_arrays(
+                day,
+                status,
+                self.historical_data.project_loc(portfolio["project"]),
+                portfolio["weight"].values,
+                portfolio["tokens"].values,
+            )
+        else:
+            self.record_arrays(day, status)
+
+    def record_arrays(self, day, status, columns=None, weights=None, tokens=None):
+        """Record the portfolio of a given day from arrays (see `record`).
+
+        Args:
+            day: int.
+            status: str.
+            columns: 1D integer numpy.ndarray with the panel columns of the
+                projects of the portfolio, in the order of the portfolio.
+                Only needed for the statuses in `STORED_STATUSES`.
+            weights: 1D floating-point numpy.ndarray.
+            tokens: 1D floating-point numpy.ndarray.
+        """
+        self.n_days = max(self.n_days, day + 1)
+        self._entries = None
+        if status in STORED_STATUSES:
+            self.events.append(
+                {
+                    "day": day,
+                    "status": status,
+                    "columns": np.array(columns, dtype=int),
+                    "weights": np.array(weights, dtype=float),
+                    "tokens": np.array(tokens, dtype=float),
+                }
+            )
+
+    @property
+    def dates(self):
+        """list of datetime.date instances of the simulated days."""
+        return [
+            self.start_date + datetime.timedelta(days=i) for i in range(self.n_days)
+        ]
+
+    @property
+    def entries(self):
+        """list of (day, status, event) tuples with one entry per portfolio, in
+        the same order as the portfolios returned by `backtesting.backtest`.
+        `event` is the index in `events` of stored portfolios, else None."""
+        if self._entries is None:
+            events_by_day = collections.defaultdict(list)
+            for k, event in enumerate(self.events):
+                events_by_day[event["day"]].append(k)
+            self._entries = []
+            for day in range(self.n_days):
+                events = events_by_day.get(day, [])
+                if day > 0 and events:
+                    self._entries.append((day, "pre-rebalance", None))
+                elif not events:
+                    self._entries.append((day, "normal-day", None))
+                for k in events:
+                    self._entries.append((day, self.events[k]["status"], k))
+        return self._entries
+
+    @property
+    def statuses(self):
+        """list of strings with the status of each portfolio."""
+        return [status for _, status, _ in self.entries]
+
+    def __getitem__(self, key):
+        if key == "portfolios":
+            return _PortfolioSequence(self)
+        if key == "statuses":
+            return self.statuses
+        if key == "profile" and self.profile is not None:
+            return self.profile
+        raise KeyError(key)
+
+    def keys(self):
+        """Return the keys of the results, as in the dictionary returned by
+        `backtesting.backtest`.
+
+        Returns:
+            list of strings.
+        """
+        keys = ["portfolios", "statuses"]
+        if self.profile is not None:
+            keys.append("profile")
+        return keys
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        """Return the value of a key, or `default` if there is no such key.
+
+        Args:
+            key: str.
+            default: value returned if there is no such key.
+        """
+        return self[key] if key in self else default
+
+    @property
+    def holdings(self):
+        """list of the stored events ("start" and "rebalanced") after which the
+        numbers of tokens in the portfolio change."""
+        return [e for e in self.events if e["status"] in ["start", "rebalanced"]]
+
+    def _holdings_before(self, day):
+        """Return the stored event defining the tokens held on a given day before
+        any rebalance on that day."""
+        holdings = self.holdings
+        k = bisect.bisect_left([e["day"] for e in holdings], day) - 1
+        return holdings[max(k, 0)]
+
+    def _frame(self, day, columns, weights, tokens):
+        """Build a portfolio data frame from panel columns, weights, and tokens."""
+        panel = self.historical_data
+        row = panel.date_loc(self.start_date + datetime.timedelta(days=day))
+        return pd.DataFrame(
+            {
+                "datetime": panel.dates[row],
+                "project": [panel.projects[j] for j in columns],
+                "project_id": panel.project_ids[columns],
+                "weight": weights,
+                "tokens": tokens,
+                "price": panel.price[row, columns],
+                "sp": panel.sp[row, columns],
+            }
+        )
+
+    def event_portfolio(self, event):
+        """Return the portfolio of a stored event.
+
+        Args:
+            event: dict in `events`.
+
+        Returns:
+            pandas.core.frame.DataFrame containing the details of the portfolio.
+        """
+        return self._frame(
+            event["day"], event["columns"], event["weights"], event["tokens"]
+        )
+
+    def portfolio(self, k):
+        """Return a portfolio.
+
+        Args:
+            k: int defining the index of the portfolio in `entries`.
+
+        Returns:
+            pandas.core.frame.DataFrame containing the details of the portfolio.
+        """
+        day, _, event = self.entries[k]
+        if event is not None:
+            return self.event_portfolio(self.events[event])
+        holdings = self._holdings_before(day)
+        row = self.historical_data.date_loc(
+            self.start_date + datetime.timedelta(days=day)
+        )
+        prices = self.historical_data.price[row, holdings["columns"]]
+        weights = prices * holdings["tokens"] / (prices @ holdings["tokens"])
+        return self._frame(day, holdings["columns"], weights, holdings["tokens"])
+
+    def values(self):
+        """Return the value in USD of the portfolio at the end of each day.
+
+        Returns:
+            1D floating-point numpy.ndarray.
+        """
+        return self._mark_to_market()[0]
+
+    def weights(self):
+        """Return the weight of each project of the historical data in the
+        portfolio at the end of each day.
+
+        Returns:
+            2D floating-point numpy.ndarray (days x projects), with the columns
+            in the same order as `historical_data.projects`.
+        """
+        return self._mark_to_market()[1]
+
+    def _mark_to_market(self):
+        """Calculate the daily values and weights of the portfolio."""
+        panel = self.historical_data
+        rows = np.array([panel.date_loc(d) for d in self.dates], dtype=int)
+        values = np.zeros(self.n_days)
+        weights = np.zeros((self.n_days, len(panel.projects)))
+        holdings = self.holdings
+        for k, event in enumerate(holdings):
+            first = event["day"]
+            last = holdings[k + 1]["day"] if k + 1 < len(holdings) else self.n_days
+            columns = event["columns"]
+            prices = panel.price[np.ix_(rows[first:last], columns)]
+            values[first:last] = prices @ event["tokens"]
+            weights[first:last, columns] = (
+                prices * event["tokens"] / values[first:last, np.newaxis]
+            )
+        return values, weights
+
+    def to_dict(self):
+        """Return the results in the format returned by `backtesting.backtest`.
+
+        Returns:
+            dict of lists with the keys "portfolios" and "statuses", and the key
+            "profile" if the backtest was profiled.
+        """
+        results = {"portfolios": list(self["portfolios"]), "statuses": self.statuses}
+        if self.profile is not None:
+            results["profile"] = self.profile
+        return results
+
+
+class _PortfolioSequence(collections.abc.Sequence):
+    """Sequence of the portfolios of a `BacktestResults` instance, built on
+    demand."""
+
+    def __init__(self, results):
+        self._results = results
+
+    def __len__(self):
+        return len(self._results.entries)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("portfolio index out of range")
+        return self._results.portfolio(k)
@@ -1,13 +1,21 @@
+import argparse
 import datetime
-import pandas as pd
+import os
+import tempfile
 
 import backtesting as bt
+from data_store import load_historical_data
+from panel import HistoricalPanel
+from result_cache import ResultCache
 
 # Once data is loaded. running this file `python run_backtest.py` will re-run
 # the backtest and update all JSON files (required for frontend but to avoid
-# confusion all result files in the repo should have this data)
-
-print("Running backtest")
+# confusion all result files in the repo should have this data). Results are
+# cached by parameters, data and code, so the backtest is only re-run, and
+# files are only rewritten, when one of them has changed (`--no-cache` always
+# re-runs it, and `python result_cache.py` inspects or evicts the cache). When
+# new days are added to the data, the backtest resumes from the checkpoint of
+# the previous run instead of simulating the whole history again
 
 # Initialize backtest parameters
 initial_investment = 115.24  # USD price of DPI on Jan 1st 2021
@@ -91,50 +99,117 @@ projects_to_include = [
     "Yield Guild Games",
 ]
 
-# Load historical data into a pandas dataframe
-historical_data = pd.read_csv("historical_data.csv")
-for c in ["datetime", "project"]:
-    historical_data[c] = historical_data[c].astype("category")
-
-# Run backtest
-results = bt.backtest(
-    n_projects=n_projects,
-    initial_investment=initial_investment,
-    min_circ_marketcap=min_circ_marketcap,
-    min_weight=min_weight,
-    max_weight=max_weight,
-    max_change=max_change,
-    start_date=start_date,
-    historical_data=historical_data,
-    projects_to_include=projects_to_include,
-    rebalancing_frequency=rebalancing_frequency,
-    end_date=end_date,
-    quiet=False,
-)
-
-print("Saving results")
-
-# Initialize file names for saving results
-results_name = "results"
-results_frontend_name = "results_frontend"
-rebalances_name = "rebalances"
-rebalances_with_target_name = "rebalances_with_target"
-
-# Save granular info about portfolio composition
-bt.results_to_json(results, json_name=results_name, save_status=True)
-
-# Save summarised portfolio composition for index.tokenterminal.com charts
-bt.results_to_json(results, json_name=results_frontend_name, save_status=False)
-
-# Save rebalances info for index.tokenterminal.com tables
-bt.rebalances_to_json(
-    f"{results_name}.json", json_name=rebalances_name, save_target=False
-)
-
-# Save more detailed rebalances info for debugging purposes
-bt.rebalances_to_json(
-    f"{results_name}.json", json_name=rebalances_with_target_name, save_target=True
-)
-bt.rebalances_to_csv(
-    f"{rebalances_with_target_name}.json", csv_name=rebalances_with_target_name
-)
+# Output files and the options they are generated with
+OUTPUTS = {
+    "results.json": {"save_status": True},
+    "results_frontend.json": {"save_status": False},
+    "rebalances.json": {"save_target": False},
+    "rebalances_with_target.json": {"save_target": True},
+    "rebalances_with_target.csv": {"save_target": True},
+}
+
+
+def save_outputs(results, directory=".", profiler=None):
+    """Save the output files of the backtest in a directory, timing them in
+    the "export" phase of `profiler` if given."""
+
+    # Initialize file names for saving results
+    results_name = os.path.join(directory, "results")
+    results_frontend_name = os.path.join(directory, "results_frontend")
+    rebalances_name = os.path.join(directory, "rebalances")
+    rebalances_with_target_name = os.path.join(directory, "rebalances_with_target")
+
+    # Save granular info about portfolio composition
+    bt.results_to_json(
+        results, json_name=results_name, save_status=True, profiler=profiler
+    )
+
+    # Save summarised portfolio composition for index.tokenterminal.com charts
+    bt.results_to_json(
+        results, json_name=results_frontend_name, save_status=False, profiler=profiler
+    )
+
+    # Build the rebalances table once from the results in memory
+    ledger = bt.rebalance_ledger(results, profiler=profiler)
+
+    # Save rebalances info for index.tokenterminal.com tables
+    bt.rebalances_to_json(
+        ledger, json_name=rebalances_name, save_target=False, profiler=profiler
+    )
+
+    # Save more detailed rebalances info for debugging purposes
+    bt.rebalances_to_json(
+        ledger,
+        json_name=rebalances_with_target_name,
+        save_target=True,
+        profiler=profiler,
+    )
+    bt.rebalances_to_csv(
+        ledger, csv_name=rebalances_with_target_name, profiler=profiler
+    )
+
+
+def run(historical_data, params, checkpoint=None):
+    """Run the backtest, resuming from a checkpoint file if given."""
+    print("Running backtest")
+    return bt.backtest(
+        historical_data=historical_data, quiet=False, checkpoint=checkpoint, **params
+    )
+
+
+def main(args=None):
+    """Run the backtest and update the output files."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--no-cache", action="store_true", help="ignore the cache")
+    parser.add_argument("--cache-dir", default=".result_cache")
+    parser.add_argument("--checkpoint", default="checkpoint.json")
+    parser.add_argument(
+        "--no-checkpoint", action="store_true", help="simulate the whole history"
+    )
+    args = parser.parse_args(args)
+    checkpoint = None if args.no_checkpoint else args.checkpoint
+
+    # Load historical data into a panel (from the binary copy of the data,
+    # which is rebuilt whenever historical_data.csv changes)
+    historical_data = HistoricalPanel(load_historical_data("historical_data.csv"))
+
+    params = dict(
+        n_projects=n_projects,
+        initial_investment=initial_investment,
+        min_circ_marketcap=min_circ_marketcap,
+        min_weight=min_weight,
+        max_weight=max_weight,
+        max_change=max_change,
+        start_date=start_date,
+        projects_to_include=projects_to_include,
+        rebalancing_frequency=rebalancing_frequency,
+        end_date=end_date,
+    )
+
+    if args.no_cache:
+        results = run(historical_data, params, checkpoint)
+        print("Saving results")
+        save_outputs(results)
+        return
+
+    cache = ResultCache(args.cache_dir)
+    key = cache.key(params, historical_data, OUTPUTS)
+    entry = cache.get(key)
+    if entry is None:
+        results = run(historical_data, params, checkpoint)
+        print("Saving results")
+        with tempfile.TemporaryDirectory() as directory:
+            save_outputs(results, directory)
+            entry = cache.put(
+                key, params, {name: os.path.join(directory, name) for name in OUTPUTS}
+            )
+    else:
+        print(f"Using cached results ({key[:12]})")
+
+    # Only files whose contents changed are written
+    written = cache.restore(entry)
+    print(f"Updated {len(written)} of {len(OUTPUTS)} files {written}")
+
+
+if __name__ == "__main__":
+    main()
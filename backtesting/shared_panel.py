@@ -0,0 +1,155 @@
+"""This module contains a way to publish a historical data panel once and attach
+to it from worker processes without copying its arrays.
+
+The metrics of the panel are copied once into a block of shared memory (or a
+memory-mapped file), and worker processes receive a small `PanelHandle`
+instead of the panel. Attaching to the handle builds a panel whose arrays are
+views of the shared block, so the memory used by N workers does not grow with
+N."""
+
+
+import dataclasses
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from panel import HistoricalPanel, METRICS
+
+
+# Shared memory blocks attached in this process, by name. The arrays of
+# attached panels do not keep their block open, so blocks stay open until the
+# panel is closed by its owner (or the process exits).
+_attached = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class PanelHandle:
+    """Handle of a shared panel, which is cheap to send to other processes.
+
+    Attributes:
+        name: str with the name of the shared memory block, or None if the
+            panel is memory-mapped.
+        path: str with the path of the memory-mapped file, or None if the
+            panel is in shared memory.
+        shape: tuple of ints (metrics x dates x projects).
+        dates: list of strings (see `panel.HistoricalPanel`).
+        projects: list of strings (see `panel.HistoricalPanel`).
+        project_ids: list of strings (see `panel.HistoricalPanel`).
+    """
+
+    name: str
+    path: str
+    shape: tuple
+    dates: list
+    projects: list
+    project_ids: list
+
+
+class SharedPanel:
+    """Historical data panel published for worker processes.
+
+    Can be used as a context manager, which releases the shared block on exit.
+
+    Args:
+        historical_data: panel.HistoricalPanel.
+        path: path of a file where the metrics are saved and memory-mapped by
+            the workers. If not given, the metrics are put in shared memory.
+
+    Attributes:
+        handle: PanelHandle to pass to the worker processes (see `attach`).
+    """
+
+    def __init__(self, historical_data, path=None):
+
+        shape = (
+            len(METRICS),
+            len(historical_data.dates),
+            len(historical_data.projects),
+        )
+        if path is None:
+            size = max(int(np.prod(shape)) * np.dtype(float).itemsize, 1)
+            self._shared_memory = shared_memory.SharedMemory(create=True, size=size)
+            values = np.ndarray(shape, dtype=float, buffer=self._shared_memory.buf)
+            name = self._shared_memory.name
+        else:
+            self._shared_memory = None
+            values = np.lib.format.open_memmap(
+                path, mode="w+", dtype=float, shape=shape
+            )
+            name = None
+        for k, metric in enumerate(METRICS):
+            values[k] = getattr(historical_data, metric)
+        if path is not None:
+            values.flush()
+        del values  # Views of the shared memory must not outlive it
+
+        self.handle = PanelHandle(
+            name=name,
+            path=None if path is None else os.path.abspath(path),
+            shape=shape,
+            dates=list(historical_data.dates),
+            projects=list(historical_data.projects),
+            project_ids=list(historical_data.project_ids),
+        )
+
+    def close(self):
+        """Release the shared memory block, or remove the memory-mapped file.
+        Panels attached in this process must not be used afterwards."""
+        if self._shared_memory is not None:
+            block = _attached.pop(self._shared_memory.name, None)
+            if block is not None:
+                block.close()
+            self._shared_memory.close()
+            self._shared_memory.unlink()
+            self._shared_memory = None
+        elif self.handle.path is not None and os.path.exists(self.handle.path):
+            os.remove(self.handle.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach(handle):
+    """Build a panel from a handle, without copying the metrics.
+
+    Args:
+        handle: PanelHandle.
+
+    Returns:
+        panel.HistoricalPanel whose metrics are read-only views of the shared
+        block.
+    """
+    if handle.name is not None:
+        if handle.name not in _attached:
+            _attached[handle.name] = shared_memory.SharedMemory(name=handle.name)
+        values = np.ndarray(
+            handle.shape, dtype=float, buffer=_attached[handle.name].buf
+        )
+    else:
+        values = np.load(handle.path, mmap_mode="r")
+    values.flags.writeable = False
+
+    return HistoricalPanel.from_arrays(
+        dates=handle.dates,
+        projects=handle.projects,
+        project_ids=handle.project_ids,
+        **{metric: values[k] for k, metric in enumerate(METRICS)},
+    )
+
+
+def resolve(historical_data):
+    """Return the panel of a handle, or the given panel.
+
+    Args:
+        historical_data: PanelHandle or panel.HistoricalPanel.
+
+    Returns:
+        panel.HistoricalPanel.
+    """
+    if isinstance(historical_data, PanelHandle):
+        return attach(historical_data)
+    return historical_data
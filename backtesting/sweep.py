@@ -0,0 +1,359 @@
+"""This module contains functions for running backtests of the Token Terminal
+Index over grids of parameters in parallel.
+
+It can also be executed as a script, e.g.:
+
+    python sweep.py --n-projects 10 13 --max-weight 0.2 0.25 --workers 4
+
+which saves a summary of every run in `sweep.csv`."""
+
+
+import argparse
+import datetime
+import itertools
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import backtesting as bt
+from multi_strategy import backtest_strategies, STRATEGY_PARAMETERS
+from panel import HistoricalPanel
+from shared_panel import resolve, SharedPanel
+from weight_cache import WeightCache
+
+
+SWEEP_PARAMETERS = [
+    "n_projects",
+    "max_weight",
+    "min_weight",
+    "max_change",
+    "min_circ_marketcap",
+    "rebalancing_frequency",
+]
+
+# Historical data and weight cache shared by the backtests of a worker. They
+# are set once per worker process by `_init_worker`, so they are not serialized
+# with every task, and the historical data is attached from shared memory (see
+# `shared_panel`) instead of being copied into every worker.
+_historical_data = None
+_cache = None
+
+
+def _init_worker(historical_data, cache=None):
+    """Set the historical data (panel.HistoricalPanel or
+    shared_panel.PanelHandle) and weight cache used by the backtests of a
+    worker process."""
+    global _historical_data, _cache
+    _historical_data = resolve(historical_data)
+    _cache = cache
+
+
+def _summarise(params, results, error):
+    """Summarise the results of a backtest of a sweep.
+
+    Args:
+        params: dict of keyword arguments of `backtesting.backtest`.
+        results: results.BacktestResults, or None if the backtest failed.
+        error: str with the error message of the backtest, or None.
+
+    Returns:
+        dict.
+    """
+    summary = {p: params[p] for p in SWEEP_PARAMETERS}
+    if results is None:
+        summary["final_value"] = np.nan
+        summary["total_return"] = np.nan
+        summary["n_rebalances"] = np.nan
+        summary["turnover"] = np.nan
+    else:
+        values = results.values()
+        summary["final_value"] = values[-1]
+        summary["total_return"] = values[-1] / params["initial_investment"] - 1
+        summary["n_rebalances"] = results.statuses.count("rebalanced")
+        _, pre, post = analytics.rebalance_matrices(
+            results, results.historical_data.projects
+        )
+        summary["turnover"] = np.sum(analytics.turnover(pre, post))
+    summary["error"] = error
+    return summary
+
+
+def _run(params):
+    """Run a single backtest of a sweep and summarise its results.
+
+    Args:
+        params: dict of keyword arguments of `backtesting.backtest`, excluding
+            `historical_data`.
+
+    Returns:
+        dict.
+    """
+    start = time.perf_counter()
+    try:
+        results = bt.backtest(historical_data=_historical_data, cache=_cache, **params)
+        error = None
+    except Exception as e:  # Infeasible combinations are reported, not raised
+        results = None
+        error = f"{type(e).__name__}: {e}"
+    summary = _summarise(params, results, error)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def _run_strategies(runs):
+    """Run the backtests of a sweep that only differ in the parameters of
+    `multi_strategy.STRATEGY_PARAMETERS` in a single pass, and summarise their
+    results.
+
+    Args:
+        runs: list of dicts of keyword arguments of `backtesting.backtest`,
+            excluding `historical_data`.
+
+    Returns:
+        list of dicts. The wall time of the pass is split evenly between the
+        backtests.
+    """
+    if not runs:
+        raise ValueError("runs must be a non-empty list of dicts")
+    start = time.perf_counter()
+    params = {
+        k: v
+        for k, v in runs[0].items()
+        if k not in STRATEGY_PARAMETERS + ["engine", "compact"]
+    }
+    try:
+        _, results, errors = backtest_strategies(
+            [{p: run[p] for p in STRATEGY_PARAMETERS} for run in runs],
+            historical_data=_historical_data,
+            cache=_cache,
+            **params,
+        )
+    except Exception as e:
+        results = [None] * len(runs)
+        errors = [f"{type(e).__name__}: {e}"] * len(runs)
+    seconds = (time.perf_counter() - start) / len(runs)
+    return [
+        dict(_summarise(run, run_results, error), seconds=seconds)
+        for run, run_results, error in zip(runs, results, errors)
+    ]
+
+
+def parameter_grid(grid, **params):
+    """Return every combination of parameters of a grid.
+
+    Args:
+        grid: dict mapping parameter names of `backtesting.backtest` to lists
+            of values.
+        **params: keyword arguments of `backtesting.backtest` shared by all
+            combinations.
+
+    Returns:
+        list of dicts.
+    """
+    names = list(grid)
+    return [
+        dict(params, **dict(zip(names, values)))
+        for values in itertools.product(*[grid[n] for n in names])
+    ]
+
+
+def sweep(
+    historical_data,
+    grid,
+    start_date,
+    projects_to_include,
+    initial_investment=100.0,
+    end_date=None,
+    solver="exact",
+    cache=None,
+    n_workers=None,
+    single_pass=False,
+    quiet=True,
+    **params,
+):
+    """Backtest the Token Terminal Index for every combination of parameters
+    of a grid, using a pool of processes.
+
+    The historical data is converted to a panel once and published in shared
+    memory, which the worker processes attach to without copying it, and each
+    backtest returns compact results.
+
+    Args:
+        historical_data: pandas.core.frame.DataFrame containing the data
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it.
+        grid: dict mapping parameter names of `backtesting.backtest` (e.g.
+            "n_projects", "max_weight", "max_change", "min_circ_marketcap",
+            "rebalancing_frequency") to lists of values.
+        start_date: datetime.date.
+        projects_to_include: list of strings.
+        initial_investment: float defining the initial investment in USD.
+        end_date: datetime.date. If not given, the end date is the last date
+            for which there is data in `historical_data`.
+        solver: "basinhopping" or "exact" (see `backtesting._calculate_weights`).
+        cache: weight_cache.WeightCache used by the backtests. Each worker
+            process gets its own copy of the in-memory cache, so a cache with
+            a `path` is needed to share weights between workers.
+        n_workers: int defining the number of worker processes. If not given,
+            the number of CPUs is used. If 1, backtests run in this process.
+        single_pass: bool defining whether to run the combinations that only
+            differ in the parameters of `multi_strategy.STRATEGY_PARAMETERS`
+            (e.g. all but "rebalancing_frequency") together in a single pass
+            over the historical data (see `multi_strategy.backtest_strategies`).
+        quiet: bool defining whether not to print messages about the progress
+            of computation.
+        **params: values of the parameters of `backtesting.backtest` that are
+            not in `grid`.
+
+    Returns:
+        pandas.core.frame.DataFrame with one row per combination of parameters,
+        containing the parameters, the final value, total return, number of
+        rebalances, turnover, error message (if the backtest failed), and wall
+        time in seconds of each backtest.
+    """
+    if not isinstance(historical_data, HistoricalPanel):
+        historical_data = HistoricalPanel(historical_data)
+
+    runs = parameter_grid(
+        grid,
+        start_date=start_date,
+        projects_to_include=projects_to_include,
+        initial_investment=initial_investment,
+        end_date=end_date,
+        solver=solver,
+        engine="interval",
+        compact=True,
+        **params,
+    )
+    if not runs:
+        empty = [name for name, values in grid.items() if len(values) == 0]
+        raise ValueError(f"No values for parameters {empty} in grid")
+    missing = [p for p in SWEEP_PARAMETERS if p not in runs[0]]
+    if missing:
+        raise ValueError(f"Missing values for parameters {missing}")
+
+    if single_pass:
+        # Combinations that share all other parameters form one task
+        groups = {}
+        for k, run in enumerate(runs):
+            key = repr(
+                sorted((p, v) for p, v in run.items() if p not in STRATEGY_PARAMETERS)
+            )
+            groups.setdefault(key, []).append(k)
+        indices = list(groups.values())
+        tasks = [[runs[k] for k in group] for group in indices]
+        fn = _run_strategies
+    else:
+        tasks = runs
+        fn = _run
+
+    n_workers = n_workers or multiprocessing.cpu_count()
+    outputs = []
+    shared = None
+    pool = None
+    try:
+        if n_workers == 1:
+            _init_worker(historical_data, cache)
+            iterator = map(fn, tasks)
+        else:
+            # Created within the try block, so the shared memory is released
+            # even if the pool cannot be started
+            shared = SharedPanel(historical_data)
+            pool = multiprocessing.Pool(
+                processes=min(n_workers, len(tasks)),
+                initializer=_init_worker,
+                initargs=(shared.handle, cache),
+            )
+            iterator = pool.imap(fn, tasks)
+        for output in iterator:
+            outputs.append(output)
+            if not quiet:
+                print(f"{len(outputs)}/{len(tasks)}", end="\r")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if shared is not None:
+            shared.close()
+
+    if single_pass:  # Summaries in the order of the combinations
+        summaries = [None] * len(runs)
+        for group, group_summaries in zip(indices, outputs):
+            for k, summary in zip(group, group_summaries):
+                summaries[k] = summary
+    else:
+        summaries = outputs
+    return pd.DataFrame(summaries)
+
+
+def _parse_frequency(value):
+    """Parse a rebalancing frequency given in the command line."""
+    return value if value == "monthly" else int(value)
+
+
+def main(args=None):
+    """Run a parameter sweep from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="historical_data.csv")
+    parser.add_argument("--projects-file", help="file with one project per line")
+    parser.add_argument("--start-date", default="2021-01-01")
+    parser.add_argument("--end-date")
+    parser.add_argument("--initial-investment", type=float, default=100.0)
+    parser.add_argument("--n-projects", type=int, nargs="+", default=[13])
+    parser.add_argument("--min-weight", type=float, nargs="+", default=[0.001])
+    parser.add_argument("--max-weight", type=float, nargs="+", default=[0.2])
+    parser.add_argument("--max-change", type=float, nargs="+", default=[0.05])
+    parser.add_argument("--min-circ-marketcap", type=float, nargs="+", default=[1e8])
+    parser.add_argument(
+        "--rebalancing-frequency",
+        type=_parse_frequency,
+        nargs="+",
+        default=["monthly"],
+    )
+    parser.add_argument("--solver", choices=["basinhopping", "exact"], default="exact")
+    parser.add_argument("--cache-dir", help="directory of the weight cache")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="backtest the combinations of each rebalancing frequency together",
+    )
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args(args)
+
+    historical_data = HistoricalPanel.from_csv(args.data)
+    if args.projects_file:
+        with open(args.projects_file) as file:
+            projects_to_include = [line.strip() for line in file if line.strip()]
+    else:
+        projects_to_include = list(historical_data.projects)
+
+    summary = sweep(
+        historical_data,
+        grid={
+            "n_projects": args.n_projects,
+            "min_weight": args.min_weight,
+            "max_weight": args.max_weight,
+            "max_change": args.max_change,
+            "min_circ_marketcap": args.min_circ_marketcap,
+            "rebalancing_frequency": args.rebalancing_frequency,
+        },
+        start_date=datetime.date.fromisoformat(args.start_date),
+        end_date=args.end_date and datetime.date.fromisoformat(args.end_date),
+        projects_to_include=projects_to_include,
+        initial_investment=args.initial_investment,
+        solver=args.solver,
+        cache=args.cache_dir and WeightCache(path=args.cache_dir),
+        n_workers=args.workers,
+        single_pass=args.single_pass,
+        quiet=False,
+    )
+    summary.to_csv(args.output, index=False)
+    print(f"Saved {len(summary)} runs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""This module contains tests for the functions in the module `analytics`."""
+
+
+import datetime
+
+import numpy as np
+import numpy.testing as npt
+
+import analytics
+import backtesting as bt
+from test_backtesting import generate_random_data, TOL
+
+
+def test_nav_metrics():
+    """Test the metrics of NAV arrays in the module `analytics`."""
+    nav = np.array([100.0, 110.0, 99.0, 121.0, 108.9])
+    r = np.array([0.1, -0.1, 121 / 99 - 1, -0.1])
+    npt.assert_allclose(analytics.returns(nav), r, rtol=TOL)
+    npt.assert_allclose(analytics.total_return(nav), 0.089, rtol=TOL)
+    npt.assert_allclose(
+        analytics.annualized_return(nav), 1.089 ** (365 / 4) - 1, rtol=TOL
+    )
+    npt.assert_allclose(
+        analytics.volatility(nav), np.std(r, ddof=1) * np.sqrt(365), rtol=TOL
+    )
+    npt.assert_allclose(
+        analytics.sharpe_ratio(nav, risk_free_rate=0.365),
+        np.mean(r - 0.001) / np.std(r, ddof=1) * np.sqrt(365),
+        rtol=TOL,
+    )
+    npt.assert_allclose(analytics.drawdowns(nav), [0, 0, 0.1, 0, 0.1], atol=TOL)
+    npt.assert_allclose(analytics.max_drawdown(nav), 0.1, rtol=TOL)
+
+    # Rows of NAV matrices are independent paths, and NaN values are ignored
+    matrix = np.array([nav, np.r_[np.nan, np.nan, nav[2:]], np.full(5, np.nan)])
+    npt.assert_allclose(analytics.total_return(matrix), [0.089, 0.1, np.nan], rtol=TOL)
+    npt.assert_allclose(analytics.max_drawdown(matrix), [0.1, 0.1, np.nan], rtol=TOL)
+    npt.assert_allclose(
+        analytics.volatility(matrix)[:2],
+        [analytics.volatility(nav), analytics.volatility(nav[2:])],
+        rtol=TOL,
+    )
+
+    # Rolling metrics are the metrics of the window ending on each day
+    for rolling, metric in [
+        (analytics.rolling_return, analytics.total_return),
+        (analytics.rolling_volatility, analytics.volatility),
+        (analytics.rolling_sharpe_ratio, analytics.sharpe_ratio),
+        (analytics.rolling_max_drawdown, analytics.max_drawdown),
+    ]:
+        values = rolling(matrix, 3)
+        npt.assert_equal(values.shape, matrix.shape)
+        npt.assert_equal(np.isnan(values[:, :2]).all(), True)
+        for i in range(2, 5):
+            npt.assert_allclose(values[0, i], metric(nav[i - 2 : i + 1]), rtol=TOL)
+
+    npt.assert_allclose(analytics.hhi([[0.5, 0.5, 0], [1, 0, 0]]), [0.5, 1])
+    npt.assert_allclose(
+        analytics.turnover([[0.5, 0.5], [0.2, 0.8]], [[0.5, 0.5], [0.6, 0.4]]),
+        [0, 0.4],
+    )
+    return
+
+
+def test_backtest_analytics():
+    """Test functions `analytics.summary` and `analytics.rolling_metrics`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    kwargs = dict(
+        n_projects=8,
+        initial_investment=100.0,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.25,
+        max_change=0.1,
+        start_date=start_date,
+        historical_data=data,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=7,
+        solver="exact",
+        engine="interval",
+    )
+    results = bt.backtest(**kwargs)
+    compact = bt.backtest(compact=True, **kwargs)
+
+    # Metrics calculated by walking the portfolios
+    latest = {}
+    for pf in results["portfolios"]:
+        latest[pf["datetime"].values[0]] = pf
+    values = np.array([bt._calculate_value(pf) for pf in latest.values()])
+    hhis = [sum(pf["weight"] ** 2) for pf in latest.values()]
+    turnovers = []
+    for k, status in enumerate(results["statuses"]):
+        if status == "rebalanced":
+            pre = results["portfolios"][k - 3].set_index("project")["weight"]
+            post = results["portfolios"][k].set_index("project")["weight"]
+            change = post.sub(pre, fill_value=0)
+            turnovers.append(sum(abs(change)) / 2)
+
+    for r in [results, compact]:
+        summary = analytics.summary(r)
+        npt.assert_allclose(summary["final_value"], values[-1], rtol=TOL)
+        npt.assert_allclose(summary["total_return"], values[-1] / 100 - 1, rtol=TOL)
+        npt.assert_allclose(
+            summary["max_drawdown"],
+            max(1 - v / max(values[: i + 1]) for i, v in enumerate(values)),
+            rtol=TOL,
+        )
+        npt.assert_equal(summary["n_rebalances"], len(turnovers))
+        npt.assert_allclose(summary["turnover"], sum(turnovers), rtol=TOL)
+        npt.assert_allclose(summary["mean_hhi"], np.mean(hhis), rtol=TOL)
+
+        metrics = analytics.rolling_metrics(r, window=10)
+        npt.assert_equal(list(metrics.index), list(latest))
+        npt.assert_allclose(metrics["value"], values, rtol=TOL)
+        npt.assert_allclose(metrics["hhi"], hhis, rtol=TOL)
+        npt.assert_allclose(
+            metrics["rolling_return"].values[9:],
+            values[9:] / values[:-9] - 1,
+            rtol=TOL,
+        )
+
+    # Weights of compact results around rebalances are the weights of their
+    # portfolios
+    projects = list(np.unique(data["project"]))
+    portfolios = {
+        "portfolios": list(compact["portfolios"]),
+        "statuses": compact.statuses,
+    }
+    for expected, matrix in zip(
+        analytics.rebalance_matrices(portfolios, projects),
+        analytics.rebalance_matrices(compact, projects),
+    ):
+        npt.assert_equal(matrix, expected)
+    return
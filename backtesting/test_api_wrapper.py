@@ -0,0 +1,214 @@
+"""This module contains tests for the class in the module `api_wrapper`, which
+run against a local stub of the Token Terminal API."""
+
+
+import collections
+import gzip
+import hashlib
+import http.server
+import shutil
+import json
+import threading
+import time
+import urllib.parse
+
+import numpy.testing as npt
+
+from api_wrapper import ApiWrapper
+from response_cache import ResponseCache
+
+
+KEY = "test-key"
+
+
+class StubApiHandler(http.server.BaseHTTPRequestHandler):
+    """Handler of requests to a stub of the Token Terminal API.
+
+    Each project has one day of data. The first request for the project
+    "flaky" fails with status 429, the first request for the project "broken"
+    fails with status 503, every request for the project "down" fails with
+    status 503, and the project "missing" does not exist. Requests for the
+    project "moved" are redirected to the project "project0", and requests for
+    the project "elsewhere" to another host. Requests for the projects "empty"
+    and "unmodified" get responses without a body or Content-Length (204 and
+    304). Responses are gzip-encoded for clients that accept it. Requests
+    through a proxy (with the full URL as their path) are also handled.
+    """
+
+    protocol_version = "HTTP/1.1"  # Connections are kept alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.n_connections += 1
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        self.path = url.path + (f"?{url.query}" if url.query else "")
+        with server.lock:
+            server.hosts.add(self.headers.get("Host"))
+            server.requests[self.path.split("?")[0]] += 1
+            n_requests = server.requests[self.path.split("?")[0]]
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(0.02)
+            if self.headers.get("Authorization") != f"Bearer {KEY}":
+                self._send(401, {"error": "unauthorized"})
+            elif self.path == "/v1/projects":
+                self._send(200, [{"project_id": p} for p in server.projects])
+            elif "/flaky/" in self.path and n_requests == 1:
+                self._send(429, {"error": "rate limited"}, {"Retry-After": "0"})
+            elif "/broken/" in self.path and n_requests == 1:
+                self._send(503, {"error": "unavailable"})
+            elif "/down/" in self.path:
+                self._send(503, {"error": "unavailable"})
+            elif "/missing/" in self.path:
+                self._send(404, {"error": "not found"})
+            elif "/moved/" in self.path:
+                location = self.path.replace("/moved/", "/project0/")
+                self._send(301, {}, {"Location": location})
+            elif "/empty/" in self.path or "/unmodified/" in self.path:
+                self.send_response(204 if "/empty/" in self.path else 304)
+                self.end_headers()
+            elif "/elsewhere/" in self.path:
+                self._send(302, {}, {"Location": "http://example.com/v1/projects"})
+            else:
+                project_id = self.path.split("/")[3]
+                self._send(200, [{"datetime": "2021-01-01", "project": project_id}])
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        if status == 200:  # Responses are revalidated with their ETag
+            etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            headers = dict(headers or {}, ETag=etag)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(projects):
+    """Start a stub of the Token Terminal API in a background thread."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubApiHandler)
+    server.projects = projects
+    server.requests = collections.Counter()
+    server.hosts = set()
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.n_connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_api_wrapper():
+    """Test class `api_wrapper.ApiWrapper`."""
+    projects = [f"project{i}" for i in range(10)] + ["flaky", "broken"]
+    server = start_stub_server(projects)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        npt.assert_raises(ValueError, ApiWrapper, "wrong-key", base_url=base_url)
+        for rate_limit in [0, -1.0]:
+            npt.assert_raises(
+                ValueError, ApiWrapper, KEY, base_url=base_url, rate_limit=rate_limit
+            )
+
+        tt = ApiWrapper(KEY, base_url=base_url, max_workers=4, backoff=0.01)
+        project_ids = [p["project_id"] for p in tt.get_all_projects()]
+        npt.assert_equal(project_ids, projects)
+
+        received = []
+        data = tt.get_historical_data_many(
+            project_ids, callback=lambda p, resp: received.append(p)
+        )
+        npt.assert_equal(list(data), project_ids)
+        npt.assert_equal(sorted(received), sorted(project_ids))
+        for project_id in project_ids:
+            npt.assert_equal(data[project_id][0]["project"], project_id)
+
+        # Failed requests are retried, and requests are concurrent but bounded
+        npt.assert_equal(server.requests["/v1/projects/flaky/metrics"], 2)
+        npt.assert_equal(server.requests["/v1/projects/broken/metrics"], 2)
+        npt.assert_equal(server.requests["/v1/projects/project0/metrics"], 1)
+        npt.assert_equal(1 < server.max_in_flight <= 4, True)
+
+        # Requests fail once the retries are exhausted
+        tt.max_retries = 0
+        r = tt.get_historical_data("flaky", return_response_object=True)
+        npt.assert_equal(r.status_code, 200)
+        server.requests.clear()
+        r = tt.get_historical_data("broken", return_response_object=True)
+        npt.assert_equal(r.status_code, 503)
+
+        # Requests are spread out by the rate limit
+        tt.rate_limit = 20
+        start = time.perf_counter()
+        tt.get_historical_data_many(projects[:5])
+        npt.assert_equal(time.perf_counter() - start >= 0.2, True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return
+
+
+def test_api_wrapper_with_cache():
+    """Test class `api_wrapper.ApiWrapper` with a `response_cache.ResponseCache`."""
+    projects = [f"project{i}" for i in range(3)]
+    server = start_stub_server(projects)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    path = "response_cache_test"
+    try:
+        cache = ResponseCache(path)
+        tt = ApiWrapper(KEY, base_url=base_url, cache=cache)
+        expected = tt.get_historical_data_many(projects)
+        npt.assert_equal(cache.stats["misses"], 3)
+
+        # Cached responses are revalidated with conditional requests
+        server.requests.clear()
+        npt.assert_equal(tt.get_historical_data_many(projects), expected)
+        npt.assert_equal(cache.stats["not_modified"], 3)
+        npt.assert_equal(sum(server.requests.values()), 3)
+        npt.assert_equal(cache.stats["bytes_saved"] > 0, True)
+
+        # Cached responses younger than the TTL are used without requests
+        server.requests.clear()
+        cache = ResponseCache(path, ttl=60)
+        tt.cache = cache
+        npt.assert_equal(tt.get_historical_data_many(projects), expected)
+        r = tt.get_historical_data(projects[0], return_response_object=True)
+        npt.assert_equal(r.status_code, 200)
+        npt.assert_equal(r.json(), expected[projects[0]])
+        npt.assert_equal(cache.stats["hits"], 4)
+        npt.assert_equal(sum(server.requests.values()), 0)
+
+        # Responses of other requests are not shared
+        data = tt.get_historical_data(projects[0], interval="monthly")
+        npt.assert_equal(data, expected[projects[0]])
+        npt.assert_equal(cache.stats["misses"], 1)
+
+        cache.clear()
+        npt.assert_equal(cache.get(cache.key(base_url + "v1/projects")), None)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(path, ignore_errors=True)
+    return
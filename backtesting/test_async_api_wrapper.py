@@ -0,0 +1,170 @@
+"""This module contains tests for the class in the module `async_api_wrapper`,
+which run against a local stub of the Token Terminal API."""
+
+
+import asyncio
+import json
+
+import numpy.testing as npt
+
+import async_api_wrapper as aaw
+from test_api_wrapper import KEY, start_stub_server
+
+
+async def _chunks(text, size):
+    data = text.encode("utf-8")
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def test__decode_json():
+    """Test function `async_api_wrapper._decode_json`."""
+    values = [
+        [{"datetime": "2021-01-01", "price": 1.5, "name": "Ünïcode"}] * 20,
+        [1, 22, 333, -4.5e10, "a,]", None, [1, [2]]],
+        [],
+        {"error": "unauthorized"},
+        12345,
+    ]
+    for value in values:
+        for indent in [None, 2]:
+            text = json.dumps(value, indent=indent, ensure_ascii=False)
+            for size in [1, 3, 7, 1000]:
+                decoded = asyncio.run(aaw._decode_json(_chunks(text, size)))
+                npt.assert_equal(decoded, value)
+    npt.assert_raises(ValueError, asyncio.run, aaw._decode_json(_chunks("[1, 2", 2)))
+    return
+
+
+def test__array_decoder():
+    """Test class `async_api_wrapper._ArrayDecoder`."""
+    items = [{"text": 'a "quoted" \\ [value]', "values": list(range(1000))}] * 3
+    text = json.dumps(items)
+
+    # Each item is decoded once, even when it is received one character at a
+    # time
+    decoder = aaw._ArrayDecoder()
+    raw_decode = decoder._decoder.raw_decode
+    calls = []
+    decoder._decoder.raw_decode = lambda s: calls.append(s) or raw_decode(s)
+    for char in text[1:]:
+        decoder.feed(char)
+    npt.assert_equal(decoder.close(), items)
+    npt.assert_equal(len(calls), len(items))
+
+    for invalid in ["1 2]", "1, 2", '"a"b]', ",1]", "1,]", "1,,2]"]:
+        decoder = aaw._ArrayDecoder()
+        with npt.assert_raises(ValueError):
+            decoder.feed(invalid)
+            decoder.close()
+    return
+
+
+def test_async_api_wrapper():
+    """Test class `async_api_wrapper.AsyncApiWrapper`."""
+    projects = [f"project{i}" for i in range(10)] + ["flaky", "broken"]
+    server = start_stub_server(projects)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    async def run():
+        # The key is only validated by the first request
+        tt = aaw.AsyncApiWrapper("wrong-key", base_url=base_url)
+        npt.assert_equal(server.requests["/v1/projects"], 0)
+        with npt.assert_raises(ValueError):
+            await tt.get_all_projects()
+        await tt.close()
+
+        async with aaw.AsyncApiWrapper(
+            KEY, base_url=base_url, max_connections=3, backoff=0.01
+        ) as tt:
+            project_ids = [p["project_id"] for p in await tt.get_all_projects()]
+            received = []
+            data = await tt.get_historical_data_many(
+                project_ids, callback=lambda p, resp: received.append(p)
+            )
+            npt.assert_equal(project_ids, projects)
+            npt.assert_equal(list(data), project_ids)
+            npt.assert_equal(sorted(received), sorted(project_ids))
+            for project_id in project_ids:
+                npt.assert_equal(data[project_id][0]["project"], project_id)
+
+            # Connections are reused, and requests are concurrent but bounded
+            npt.assert_equal(tt.n_connections <= 3, True)
+            npt.assert_equal(1 < server.max_in_flight <= 3, True)
+
+            # Error statuses raise errors, after retrying them if possible
+            for project_id, status in [("missing", 404), ("down", 503)]:
+                with npt.assert_raises(aaw.ApiError) as e:
+                    await tt.get_historical_data(project_id)
+                npt.assert_equal(e.exception.status, status)
+                npt.assert_equal(list(e.exception.data), ["error"])
+
+            # Redirects are only followed within the API
+            data = await tt.get_historical_data("moved")
+            npt.assert_equal(data[0]["project"], "project0")
+            with npt.assert_raises(aaw.ApiError) as e:
+                await tt.get_historical_data("elsewhere")
+            npt.assert_equal(e.exception.status, 302)
+
+            # Responses without a body end without waiting for the connection
+            # to be closed
+            for project_id in ["empty", "unmodified"]:
+                data = await asyncio.wait_for(tt.get_historical_data(project_id), 5)
+                npt.assert_equal(data, None)
+
+    try:
+        asyncio.run(run())
+        npt.assert_equal(server.requests["/v1/projects/flaky/metrics"], 2)
+        npt.assert_equal(server.requests["/v1/projects/broken/metrics"], 2)
+        npt.assert_equal(server.requests["/v1/projects/missing/metrics"], 1)
+        npt.assert_equal(server.requests["/v1/projects/down/metrics"], 6)
+        npt.assert_equal(server.n_connections <= 1 + 3, True)
+
+        # A wrapper can be used in more than one event loop
+        tt = aaw.AsyncApiWrapper(KEY, base_url=base_url, max_connections=2)
+
+        async def get_and_close():
+            data = await tt.get_historical_data_many(projects[:6])
+            await tt.close()
+            return data
+
+        for _ in range(2):
+            npt.assert_equal(list(asyncio.run(get_and_close())), projects[:6])
+
+        # Requests are made with the port of the API in the Host header
+        npt.assert_equal(server.hosts, {f"127.0.0.1:{server.server_address[1]}"})
+    finally:
+        server.shutdown()
+        server.server_close()
+    return
+
+
+def test_async_api_wrapper_proxy(monkeypatch):
+    """Test that class `async_api_wrapper.AsyncApiWrapper` uses the proxies of
+    the environment."""
+    server = start_stub_server(["project0"])
+    proxy = f"http://127.0.0.1:{server.server_address[1]}"
+    for name in ["http_proxy", "https_proxy", "no_proxy"]:
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+
+    async def get(base_url):
+        async with aaw.AsyncApiWrapper(KEY, base_url=base_url) as tt:
+            return await tt.get_historical_data("project0")
+
+    try:
+        # Requests go through the proxy
+        monkeypatch.setenv("HTTP_PROXY", proxy)
+        data = asyncio.run(get("http://api.example.test/"))
+        npt.assert_equal(data[0]["project"], "project0")
+        npt.assert_equal(server.hosts, {"api.example.test"})
+
+        # Except requests to the hosts in NO_PROXY
+        monkeypatch.setenv("HTTP_PROXY", "http://127.0.0.1:9")
+        monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+        data = asyncio.run(get(f"{proxy}/"))
+        npt.assert_equal(data[0]["project"], "project0")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return
@@ -4,6 +4,7 @@
 import os
 import datetime
 import filecmp
+import json
 
 import pandas as pd
 import numpy as np
@@ -70,6 +71,65 @@ def test__calculate_weights():
     return
 
 
+def test__project_weights():
+    """Test function `backtest._project_weights`."""
+    np.random.seed(SEED)
+    for n_projects in [10, 20]:
+        for min_weight, max_weight in [(0.0, 1.0), (0.01, 0.2)]:
+            original = np.zeros(n_projects) + np.inf
+            while np.any(original > max_weight) or np.any(original < min_weight):
+                original = np.random.random(n_projects)
+                original /= sum(original)
+            target = np.random.random(n_projects)
+            target /= sum(target)
+            for max_change in [0.01, 1.0]:
+                weights = bt._calculate_weights(
+                    original=original,
+                    target=target,
+                    max_change=max_change,
+                    min_weight=min_weight,
+                    max_weight=max_weight,
+                    solver="exact",
+                )
+                reference = bt._calculate_weights(
+                    original=original,
+                    target=target,
+                    max_change=max_change,
+                    min_weight=min_weight,
+                    max_weight=max_weight,
+                    solver="basinhopping",
+                )
+                npt.assert_almost_equal(sum(weights), 1)
+                npt.assert_allclose(weights, reference, atol=1e-4)
+                npt.assert_equal(
+                    sum((weights - target) ** 2)
+                    <= sum((reference - target) ** 2) + TOL,
+                    True,
+                )
+
+    # Projects cannot move down to max_weight within max_change
+    npt.assert_raises(
+        bt.InfeasibleWeightsError,
+        bt._project_weights,
+        original=np.array([0.5, 0.5]),
+        target=np.array([0.5, 0.5]),
+        max_change=0.01,
+        min_weight=0.0,
+        max_weight=0.2,
+    )
+    # New projects cannot reach min_weight within max_change
+    npt.assert_raises(
+        bt.InfeasibleWeightsError,
+        bt._project_weights,
+        original=np.array([0.0, 0.0, 1.0]),
+        target=np.array([0.3, 0.3, 0.4]),
+        max_change=0.01,
+        min_weight=0.05,
+        max_weight=1.0,
+    )
+    return
+
+
 def generate_random_data(n_projects, start_date, n_days):
     """Generate random historical data for tests."""
     np.random.seed(SEED)
@@ -303,6 +363,49 @@ def test__rebalance():
     return
 
 
+def test__replacements():
+    """Test function `backtest._replacements`."""
+    np.random.seed(SEED)
+    projects = np.array([f"project_{j}" for j in range(30)], dtype=object)
+    for _ in range(50):
+        pf = pd.DataFrame({"project": np.random.choice(projects, 10, replace=False)})
+        pf["weight"] = np.round(np.random.random(10), 1) / 5
+        init = pd.DataFrame({"project": np.random.choice(projects, 10, replace=False)})
+        # Ties in the target weights keep the order of the data frame sort
+        init["weight"] = np.round(np.random.random(10), 1)
+        init.loc[0, "weight"] = 0.0
+        max_change = 0.1
+
+        # Reference implementation, one project at a time
+        new_projects = (
+            init[~np.isin(init["project"], pf["project"])]
+            .sort_values(by="weight", ascending=False)
+            .reset_index(drop=True)
+        )
+        expected, k = [], 0
+        for i, p in enumerate(pf["project"]):
+            if p not in init["project"].values:
+                target_w = 0
+            else:
+                target_w = init.loc[init["project"] == p, "weight"].item()
+            if target_w < TOL and pf.loc[i, "weight"] <= max_change:
+                expected.append((p, new_projects.loc[k, "project"]))
+                k += 1
+
+        replaced, new = bt._replacements(
+            pf["project"].values,
+            pf["weight"].values,
+            init["project"].values,
+            init["weight"].values,
+            max_change,
+        )
+        npt.assert_equal(
+            list(zip(pf["project"].values[replaced], init["project"].values[new])),
+            expected,
+        )
+    return
+
+
 def test_backtest():
     """Test function `backtest.backtest`."""
     n_days = 100
@@ -458,6 +561,86 @@ def test_json_and_csv_generation():
         os.remove(t)
 
 
+def test_rebalance_ledger():
+    """Test function `backtest.rebalance_ledger`."""
+    np.random.seed(SEED)
+    results = {"portfolios": [], "statuses": []}
+    days = [
+        (datetime.date(2021, 1, 1), ["start"]),
+        (datetime.date(2021, 1, 2), ["normal-day"]),
+        (datetime.date(2021, 1, 3), bt.REBALANCE_STATUSES),
+        (datetime.date(2021, 1, 4), ["normal-day"]),
+        (datetime.date(2021, 1, 5), bt.REBALANCE_STATUSES),
+    ]
+    for date, statuses in days:
+        for status in statuses:
+            results["statuses"].append(status)
+            results["portfolios"].append(
+                generate_random_portfolio(n_projects=3, date=date)
+            )
+
+    ledger = bt.rebalance_ledger(results)
+    npt.assert_equal(list(ledger.columns), bt.LEDGER_COLUMNS)
+    npt.assert_equal(sorted(set(ledger["day"])), ["2021-01-03", "2021-01-05"])
+
+    # The ledger gives the same files as the saved results
+    bt.results_to_json(results, json_name="results", save_status=True)
+    for save_target in [False, True]:
+        bt.rebalances_to_json(
+            "results.json", json_name="rebalances", save_target=save_target
+        )
+        bt.rebalances_to_json(
+            ledger, json_name="rebalances_ledger", save_target=save_target
+        )
+        npt.assert_equal(filecmp.cmp("rebalances.json", "rebalances_ledger.json"), True)
+    bt.rebalances_to_csv("rebalances.json", csv_name="rebalances")
+    bt.rebalances_to_csv(ledger, csv_name="rebalances_ledger")
+    npt.assert_equal(filecmp.cmp("rebalances.csv", "rebalances_ledger.csv"), True)
+
+    # Init and target weights are left empty if they were not saved
+    bt.rebalances_to_json("results.json", json_name="rebalances", save_target=False)
+    bt.rebalances_to_csv("rebalances.json", csv_name="rebalances")
+    with open("rebalances.csv") as f:
+        lines = f.read().splitlines()
+    npt.assert_equal(len(lines), len(ledger) + 1)
+    npt.assert_equal(lines[1].split(",")[3:5], ["", ""])
+
+    for f in ["results.json", "rebalances.json", "rebalances_ledger.json"]:
+        os.remove(f)
+    os.remove("rebalances.csv")
+    os.remove("rebalances_ledger.csv")
+    return
+
+
+def test_results_to_json_compact():
+    """Test function `backtest.results_to_json` without indentation."""
+    np.random.seed(SEED)
+    results = {"portfolios": [], "statuses": ["start", "normal-day", "normal-day"]}
+    for i in range(3):
+        date = datetime.date(2021, 1, 1) + datetime.timedelta(days=i)
+        results["portfolios"].append(generate_random_portfolio(n_projects=3, date=date))
+    for save_status in [True, False]:
+        bt.results_to_json(results, json_name="results", save_status=save_status)
+        bt.results_to_json(
+            results, json_name="results_compact", save_status=save_status, indent=None
+        )
+        with open("results.json") as f:
+            expected = json.load(f)
+        with open("results_compact.json") as f:
+            text = f.read()
+        npt.assert_equal(json.loads(text), expected)
+        npt.assert_equal("\n" in text, False)
+    os.remove("results.json")
+    os.remove("results_compact.json")
+
+    # Results without portfolios
+    bt.results_to_json({"portfolios": [], "statuses": []}, json_name="results")
+    with open("results.json") as f:
+        npt.assert_equal(json.load(f), {})
+    os.remove("results.json")
+    return
+
+
 def test_e2e():
     """End-to-end (e2e) regression test"""
     # Initialize backtest parameters
@@ -616,3 +799,33 @@ def test_e2e():
 
         # Remove files created by this function
         os.remove(t)
+
+
+def test_backtest_interval_engine():
+    """Test that the "interval" engine of `backtest.backtest` gives the same
+    results as the "daily" engine."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=30, start_date=start_date, n_days=70)
+    for rebalancing_frequency in ["monthly", 7]:
+        kwargs = dict(
+            n_projects=10,
+            initial_investment=1e2,
+            min_circ_marketcap=1e8,
+            min_weight=1e-3,
+            max_weight=0.25,
+            max_change=0.1,
+            start_date=start_date,
+            historical_data=data,
+            projects_to_include=list(np.unique(data["project"])),
+            rebalancing_frequency=rebalancing_frequency,
+            solver="exact",
+        )
+        daily = bt.backtest(engine="daily", **kwargs)
+        interval = bt.backtest(engine="interval", **kwargs)
+        npt.assert_equal(interval["statuses"], daily["statuses"])
+        for pf, daily_pf in zip(interval["portfolios"], daily["portfolios"]):
+            npt.assert_equal(pf["datetime"].values, daily_pf["datetime"].values)
+            npt.assert_equal(pf["project"].values, daily_pf["project"].values)
+            for m in ["weight", "tokens", "price", "sp"]:
+                npt.assert_allclose(pf[m].values, daily_pf[m].values, rtol=TOL)
+    return
@@ -0,0 +1,78 @@
+"""This module contains tests for the functions in the module `benchmark`."""
+
+
+import json
+import os
+
+import numpy as np
+import numpy.testing as npt
+
+import benchmark
+
+
+def test_synthetic_panel():
+    """Test function `benchmark.synthetic_panel`."""
+    panel = benchmark.synthetic_panel(universe_size=40, n_years=0.5)
+    npt.assert_equal(panel.price.shape, (183, 40))
+    npt.assert_equal(panel.dates[0], str(benchmark.START_DATE))
+    npt.assert_equal(panel.projects, sorted(panel.projects))
+    # Projects that are listed later have no data before they are listed
+    npt.assert_equal(np.isnan(panel.price[0]).sum() > 0, True)
+    npt.assert_equal(np.isnan(panel.price[-1]).sum(), 0)
+    npt.assert_equal(
+        (panel.market_cap_circulating[0] >= 1e8).sum()
+        >= benchmark.PARAMS["n_projects"],
+        True,
+    )
+    return
+
+
+def test_benchmarks():
+    """Test functions `benchmark.run_benchmarks`, `benchmark.compare`, and
+    `benchmark.main`."""
+    results = benchmark.run_benchmarks(universe_size=30, n_years=0.25, repeat=1)
+    npt.assert_equal([r["benchmark"] for r in results], benchmark.BENCHMARKS)
+    calls = {r["benchmark"]: r["solver_calls"] for r in results}
+    npt.assert_equal(calls["_calculate_weights"], 2)
+    npt.assert_equal(calls["_rebalance"], 3)
+    npt.assert_equal(calls["results_to_json"], 0)
+    npt.assert_equal(calls["monte_carlo"] > 0, True)
+    monte_carlo = results[benchmark.BENCHMARKS.index("monte_carlo")]
+    npt.assert_allclose(
+        monte_carlo["paths_per_second"],
+        benchmark.MONTE_CARLO_PATHS / monte_carlo["seconds"],
+    )
+    for r in results:
+        npt.assert_equal(r["seconds"] > 0 and r["peak_memory_mb"] > 0, True)
+
+    npt.assert_equal(len(benchmark.compare(results, results)), 0)
+    slower = [dict(r, seconds=r["seconds"] * 2) for r in results]
+    regressions = benchmark.compare(results, slower)
+    npt.assert_equal(list(regressions["metric"]), ["seconds"] * len(results))
+    more_calls = [dict(r, solver_calls=r["solver_calls"] + 1) for r in results]
+    npt.assert_equal(len(benchmark.compare(results, more_calls)), len(results))
+    # Benchmarks that are not in the baseline (e.g. of another solver) fail
+    other_solver = [dict(r, solver="basinhopping") for r in results]
+    regressions = benchmark.compare(results, other_solver)
+    npt.assert_equal(list(regressions["metric"]), ["missing"] * len(results))
+    npt.assert_equal(len(benchmark.compare(results[1:], results)), 1)
+
+    args = ["--universe-sizes", "30", "--years", "0.25", "--repeat", "1"]
+    path = "benchmark_test.json"
+    npt.assert_equal(benchmark.main(args + ["--output", path]), 0)
+    with open(path) as f:
+        baseline = json.load(f)
+    npt.assert_equal(len(baseline["results"]), len(benchmark.BENCHMARKS))
+    for r in baseline["results"]:
+        r["solver_calls"] -= 1
+    with open(path, "w") as f:
+        json.dump(baseline, f)
+    npt.assert_equal(benchmark.main(args + ["--compare", path]), 1)
+
+    # Baselines recorded with other settings are rejected
+    npt.assert_equal(benchmark.main(args + ["--output", path]), 0)
+    args += ["--compare", path, "--tolerance", "100"]  # Timings are noisy
+    npt.assert_equal(benchmark.main(args), 0)
+    npt.assert_equal(benchmark.main(args + ["--engine", "daily"]), 1)
+    os.remove(path)
+    return
@@ -0,0 +1,171 @@
+"""This module contains tests for the functions in the module `checkpoint`."""
+
+
+import datetime
+import filecmp
+import os
+import shutil
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+import run_backtest
+from test_backtesting import generate_random_data, TOL
+
+
+def _backtest_rebalance_dates(**kwargs):
+    """Run `backtesting.backtest` and return its results and the dates on which
+    `backtesting._rebalance` was called."""
+    dates = []
+    rebalance = bt._rebalance
+
+    def counting_rebalance(**rebalance_kwargs):
+        dates.append(rebalance_kwargs["date"])
+        return rebalance(**rebalance_kwargs)
+
+    bt._rebalance = counting_rebalance
+    try:
+        results = bt.backtest(**kwargs)
+    finally:
+        bt._rebalance = rebalance
+    return results, dates
+
+
+def test_checkpoint():
+    """Test backtests resumed from checkpoints."""
+    start_date = datetime.date(2021, 1, 1)
+    checkpoint_date = datetime.date(2021, 1, 25)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    path = "checkpoint_test.json"
+    kwargs = dict(
+        n_projects=5,
+        initial_investment=1e2,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.3,
+        max_change=0.1,
+        start_date=start_date,
+        historical_data=data,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=7,
+        solver="exact",
+        engine="interval",
+        compact=True,
+    )
+    expected = bt.backtest(**kwargs)
+
+    # Run until the checkpoint date, then resume with all data
+    bt.backtest(end_date=checkpoint_date, checkpoint=path, **kwargs)
+    npt.assert_equal(os.path.exists(path), True)
+    results, dates = _backtest_rebalance_dates(checkpoint=path, **kwargs)
+    npt.assert_equal(dates, [datetime.date(2021, 1, 29), datetime.date(2021, 2, 5)])
+    npt.assert_equal(results.statuses, expected.statuses)
+    npt.assert_allclose(results.values(), expected.values(), rtol=TOL)
+    npt.assert_allclose(results.weights(), expected.weights(), rtol=TOL)
+
+    # Nothing to simulate if there is no new data
+    _, dates = _backtest_rebalance_dates(checkpoint=path, **kwargs)
+    npt.assert_equal(dates, [])
+
+    # Changed parameters force a full rerun
+    bt.backtest(end_date=checkpoint_date, checkpoint=path, **kwargs)
+    _, dates = _backtest_rebalance_dates(
+        checkpoint=path, **dict(kwargs, max_change=0.2)
+    )
+    npt.assert_equal(len(dates), 5)
+
+    # Changed past data forces a full rerun
+    bt.backtest(end_date=checkpoint_date, checkpoint=path, **kwargs)
+    changed_data = data.copy()
+    changed_data.loc[0, "price"] *= 2
+    _, dates = _backtest_rebalance_dates(
+        checkpoint=path, **dict(kwargs, historical_data=changed_data)
+    )
+    npt.assert_equal(len(dates), 5)
+
+    os.remove(path)
+    return
+
+
+def test_checkpoint_size():
+    """Test that the size of a checkpoint does not grow with the number of days
+    without a rebalance."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    path = "checkpoint_test.json"
+    for engine, compact in [("daily", False), ("interval", True)]:
+        kwargs = dict(
+            n_projects=5,
+            initial_investment=1e2,
+            min_circ_marketcap=1e8,
+            min_weight=1e-3,
+            max_weight=0.3,
+            max_change=0.1,
+            start_date=start_date,
+            historical_data=data,
+            projects_to_include=list(np.unique(data["project"])),
+            rebalancing_frequency=7,
+            solver="exact",
+            engine=engine,
+            compact=compact,
+        )
+        sizes = []
+        for end_date in [datetime.date(2021, 1, 23), datetime.date(2021, 1, 28)]:
+            bt.backtest(end_date=end_date, checkpoint=path, **kwargs)
+            sizes.append(os.path.getsize(path))
+        npt.assert_equal(sizes[1], sizes[0])
+        os.remove(path)
+    return
+
+
+def test_checkpoint_outputs():
+    """Test that the output files of `run_backtest.py` are the same when the
+    backtest is resumed from a checkpoint."""
+    start_date = datetime.date(2021, 1, 1)
+    checkpoint_date = datetime.date(2021, 1, 25)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    path = "checkpoint_test.json"
+    for engine, solver in [("daily", "basinhopping"), ("interval", "exact")]:
+        kwargs = dict(
+            n_projects=5,
+            initial_investment=1e2,
+            min_circ_marketcap=1e8,
+            min_weight=1e-3,
+            max_weight=0.3,
+            max_change=0.1,
+            start_date=start_date,
+            historical_data=data,
+            projects_to_include=list(np.unique(data["project"])),
+            rebalancing_frequency=7,
+            solver=solver,
+            engine=engine,
+        )
+        os.makedirs("full", exist_ok=True)
+        run_backtest.save_outputs(bt.backtest(**kwargs), "full")
+
+        bt.backtest(end_date=checkpoint_date, checkpoint=path, **kwargs)
+        results, dates = _backtest_rebalance_dates(checkpoint=path, **kwargs)
+        npt.assert_equal(dates, [datetime.date(2021, 1, 29), datetime.date(2021, 2, 5)])
+        os.makedirs("resumed", exist_ok=True)
+        run_backtest.save_outputs(results, "resumed")
+        for name in run_backtest.OUTPUTS:
+            npt.assert_equal(
+                filecmp.cmp(
+                    os.path.join("full", name),
+                    os.path.join("resumed", name),
+                    shallow=False,
+                ),
+                True,
+            )
+
+        # Checkpoints are only used by backtests with the same type of results
+        _, dates = _backtest_rebalance_dates(
+            checkpoint=path, **dict(kwargs, engine="interval", compact=True)
+        )
+        npt.assert_equal(len(dates), 5)
+
+        shutil.rmtree("full")
+        shutil.rmtree("resumed")
+        os.remove(path)
+    return
@@ -0,0 +1,57 @@
+"""This module contains tests for the functions in the module `data_store`."""
+
+
+import datetime
+import os
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import data_store as ds
+from panel import HistoricalPanel
+from test_backtesting import generate_random_data
+
+
+def test_load_historical_data():
+    """Test function `data_store.load_historical_data`."""
+    csv_path = "historical_data_test.csv"
+    path = "historical_data_test.npz"
+    data = generate_random_data(
+        n_projects=5, start_date=datetime.date(2021, 1, 1), n_days=10
+    )
+    data["ps"] = 1 / data["sp"]  # Columns not used for backtesting are skipped
+    data.to_csv(csv_path)
+
+    expected = pd.read_csv(csv_path)
+    df = ds.load_historical_data(csv_path, path)
+    npt.assert_equal(os.path.exists(path), True)
+    npt.assert_equal(list(df.columns), ds.COLUMNS)
+    for c in ds.CATEGORICAL_COLUMNS:
+        npt.assert_equal(df[c].dtype.name, "category")
+        npt.assert_equal(df[c].astype(str).values, expected[c].astype(str).values)
+    for m in ["price", "sp", "market_cap_circulating"]:
+        npt.assert_equal(df[m].values, expected[m].values)
+
+    # Later loads read the binary copy, which gives the same panel
+    mtime = os.stat(path).st_mtime_ns
+    cached = ds.load_historical_data(csv_path, path)
+    npt.assert_equal(os.stat(path).st_mtime_ns, mtime)
+    pd.testing.assert_frame_equal(cached, df)
+    panel = ds.load_panel(csv_path, path)
+    expected_panel = HistoricalPanel(expected)
+    npt.assert_equal(panel.dates, expected_panel.dates)
+    npt.assert_equal(panel.projects, expected_panel.projects)
+    npt.assert_equal(panel.price, expected_panel.price)
+
+    # Touching the .csv file does not invalidate the copy, changing it does
+    os.utime(csv_path, ns=(mtime + 10**9, mtime + 10**9))
+    pd.testing.assert_frame_equal(ds.load_historical_data(csv_path, path), df)
+    data["price"] = data["price"] * 2
+    data.to_csv(csv_path)
+    df = ds.load_historical_data(csv_path, path)
+    npt.assert_allclose(df["price"].values, expected["price"].values * 2)
+
+    os.remove(csv_path)
+    os.remove(path)
+    return
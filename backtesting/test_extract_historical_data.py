@@ -0,0 +1,84 @@
+"""This module contains tests for the functions in the script
+`extract_historical_data.py`."""
+
+
+import datetime
+import os
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import extract_historical_data as ehd
+
+
+class FakeApi:
+    """Stand-in for `api_wrapper.ApiWrapper` that returns random daily data of
+    three projects up to a given date."""
+
+    def __init__(self, end_date):
+        self.end_date = end_date
+        self.requested = []
+
+    def get_all_projects(self):
+        return [{"project_id": p} for p in ["b", "a", "c"]]
+
+    def get_historical_data_many(self, project_ids, callback=None):
+        data = {}
+        for k, project_id in enumerate(project_ids):
+            rng = np.random.RandomState(k)
+            n_days = (self.end_date - datetime.date(2021, 1, 1)).days + 1
+            data[project_id] = [
+                {
+                    "datetime": f"{datetime.date(2021, 1, 1) + datetime.timedelta(days=i)}T00:00:00.000Z",
+                    "project": project_id.upper(),
+                    "price": rng.random_sample(),
+                    "pe": rng.random_sample() - 0.1,
+                    "pe_circulating": rng.random_sample(),
+                    "ps": rng.random_sample() - 0.1,
+                    "ps_circulating": rng.random_sample(),
+                }
+                for i in range(n_days)
+            ]
+            # The last day is incomplete until the next day
+            data[project_id][-1]["price"] = np.nan
+            if callback is not None:
+                callback(project_id, data[project_id])
+        return data
+
+
+def test_extract():
+    """Test function `extract_historical_data.extract`."""
+    path = "historical_data_test.csv"
+    full_path = "historical_data_full_test.csv"
+
+    n_rows = ehd.extract(FakeApi(datetime.date(2021, 1, 10)), path)
+    npt.assert_equal(n_rows, 30)
+    with open(path) as f:
+        stored = f.read().splitlines()
+
+    # Only the days since the last stored day are processed
+    n_rows = ehd.extract(FakeApi(datetime.date(2021, 1, 15)), path, incremental=True)
+    npt.assert_equal(n_rows, 3 * 6)
+    ehd.extract(FakeApi(datetime.date(2021, 1, 15)), full_path)
+
+    df = pd.read_csv(path, index_col=0)
+    expected = pd.read_csv(full_path, index_col=0)
+    npt.assert_equal(list(df.columns), list(expected.columns))
+    npt.assert_equal(df.index.values, expected.index.values)
+    npt.assert_equal(df["project_id"].values, expected["project_id"].values)
+    npt.assert_equal(df["datetime"].values, expected["datetime"].values)
+    for c in ["price", "pe", "ps", "sp", "sp_circulating"]:
+        npt.assert_allclose(df[c].values, expected[c].values)
+    npt.assert_equal(np.isnan(df["price"].values).sum(), 3)
+
+    # Stored rows other than the last stored days are saved unchanged
+    with open(path) as f:
+        lines = f.read().splitlines()
+    for line in stored:
+        if "2021-01-10" not in line:
+            npt.assert_equal(line in lines, True)
+
+    os.remove(path)
+    os.remove(full_path)
+    return
@@ -0,0 +1,122 @@
+"""This module contains tests for the functions in the module `monte_carlo`."""
+
+
+import datetime
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import analytics
+import backtesting as bt
+import monte_carlo
+from panel import HistoricalPanel
+from test_backtesting import generate_random_data, TOL
+
+
+def test_bootstrap_panel():
+    """Test functions `monte_carlo.bootstrap_source` and
+    `monte_carlo.bootstrap_panel`."""
+    start_date = datetime.date(2021, 1, 1)
+    panel = HistoricalPanel(
+        generate_random_data(n_projects=10, start_date=start_date, n_days=30)
+    )
+    end_date = datetime.date(2021, 1, 25)
+    source = monte_carlo.bootstrap_source(
+        panel, panel.projects[:8], start_date, end_date
+    )
+    npt.assert_equal(source["log_returns"]["price"].shape, (24, 8))
+
+    rng = monte_carlo.path_rng(seed=1, path=3)
+    indices = monte_carlo.bootstrap_indices(24, 5, rng)
+    npt.assert_equal(len(indices), 24)
+    # Blocks are consecutive days of the source data
+    npt.assert_equal(np.all(np.diff(indices[:20].reshape(4, 5), axis=1) == 1), True)
+
+    path = monte_carlo.bootstrap_panel(source, 5, monte_carlo.path_rng(1, 3))
+    other = monte_carlo.bootstrap_panel(source, 5, monte_carlo.path_rng(1, 4))
+    npt.assert_equal(path.dates, panel.dates[:25])
+    npt.assert_equal(path.projects, panel.projects[:8])
+    npt.assert_equal(path.price[0], panel.price[0, :8])
+    npt.assert_equal(np.any(path.price != other.price), True)
+    # The returns of each day are the returns of a day of the source data
+    log_returns = np.diff(np.log(path.price), axis=0)
+    npt.assert_allclose(log_returns, source["log_returns"]["price"][indices], atol=TOL)
+    npt.assert_allclose(
+        path.market_cap_circulating / path.price,
+        np.broadcast_to(
+            panel.market_cap_circulating[0, :8] / panel.price[0, :8], (25, 8)
+        ),
+        rtol=TOL,
+    )
+    return
+
+
+def test_monte_carlo():
+    """Test functions `monte_carlo.monte_carlo` and
+    `monte_carlo.confidence_intervals`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    params = dict(
+        start_date=start_date,
+        n_projects=8,
+        initial_investment=100.0,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.25,
+        max_change=0.1,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=7,
+        block_size=5,
+    )
+    nav, summary = monte_carlo.monte_carlo(
+        data, n_paths=6, batch_size=4, n_workers=1, **params
+    )
+    parallel_nav, parallel_summary = monte_carlo.monte_carlo(
+        data, n_paths=6, batch_size=1, n_workers=2, **params
+    )
+    # Paths only depend on the seed and their index
+    pd.testing.assert_frame_equal(nav, parallel_nav)
+    pd.testing.assert_frame_equal(
+        summary.drop(columns="seconds"), parallel_summary.drop(columns="seconds")
+    )
+    other_nav, _ = monte_carlo.monte_carlo(
+        data, n_paths=6, n_workers=1, seed=1, **params
+    )
+    npt.assert_equal(np.any(nav.values != other_nav.values), True)
+
+    npt.assert_equal(nav.shape, (6, 40))
+    npt.assert_equal(list(summary["path"]), list(range(6)))
+    npt.assert_equal(summary["error"].isna().all(), True)
+    npt.assert_equal(nav.values[:, 0], np.full(6, 100.0))
+
+    # Each path is a backtest of its resampled panel
+    source = monte_carlo.bootstrap_source(
+        HistoricalPanel(data),
+        params["projects_to_include"],
+        start_date,
+        datetime.date(2021, 2, 9),
+    )
+    panel = monte_carlo.bootstrap_panel(source, 5, monte_carlo.path_rng(bt.SEED, 2))
+    kwargs = {k: v for k, v in params.items() if k != "block_size"}
+    kwargs["projects_to_include"] = panel.projects
+    results = bt.backtest(
+        historical_data=panel, solver="exact", engine="interval", **kwargs
+    )
+    npt.assert_allclose(nav.values[2], analytics.daily_matrices(results)[2], rtol=TOL)
+    npt.assert_allclose(
+        summary["max_drawdown"][2], analytics.max_drawdown(nav.values[2]), rtol=TOL
+    )
+
+    intervals = monte_carlo.confidence_intervals(summary, level=0.8)
+    npt.assert_equal(list(intervals.columns), ["lower", "median", "upper", "n_paths"])
+    npt.assert_equal(list(intervals.index), monte_carlo.METRICS_OF_PATHS + ["turnover"])
+    npt.assert_equal(
+        np.all(intervals["lower"] <= intervals["median"])
+        and np.all(intervals["median"] <= intervals["upper"]),
+        True,
+    )
+    npt.assert_allclose(
+        intervals.loc["total_return", "median"], np.median(summary["total_return"])
+    )
+    return
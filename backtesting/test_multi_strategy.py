@@ -0,0 +1,142 @@
+"""This module contains tests for the functions in the module `multi_strategy`."""
+
+
+import datetime
+import itertools
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+import multi_strategy
+from panel import HistoricalPanel
+from test_backtesting import generate_random_data, TOL
+
+
+def test_backtest_strategies():
+    """Test functions `multi_strategy.backtest_strategies` and
+    `multi_strategy.summary`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=30, start_date=start_date, n_days=70)
+    panel = HistoricalPanel(data)
+    strategies = [
+        dict(
+            n_projects=n_projects,
+            min_circ_marketcap=1e8,
+            min_weight=min_weight,
+            max_weight=0.25,
+            max_change=max_change,
+        )
+        for n_projects, min_weight, max_change in itertools.product(
+            [5, 10], [1e-3, 0.01], [0.05, 0.2]
+        )
+    ]
+    # max_weight must be at least 1/n_projects
+    strategies.append(dict(strategies[0], n_projects=10, max_weight=0.05))
+    params = dict(
+        initial_investment=1e2,
+        start_date=start_date,
+        projects_to_include=list(panel.projects),
+        solver="exact",
+    )
+
+    for rebalancing_frequency in ["monthly", 7]:
+        nav, results, errors = multi_strategy.backtest_strategies(
+            strategies,
+            historical_data=panel,
+            rebalancing_frequency=rebalancing_frequency,
+            **params,
+        )
+        npt.assert_equal(nav.shape, (len(strategies), 70))
+        npt.assert_equal(results[-1], None)
+        npt.assert_equal(errors[-1].startswith("ValueError"), True)
+        npt.assert_equal(nav.iloc[-1].isna().all(), True)
+
+        # Each strategy gives the same results as a backtest of its own
+        for strategy, strategy_results, error, values in zip(
+            strategies[:-1], results, errors, nav.values
+        ):
+            expected = bt.backtest(
+                historical_data=panel,
+                rebalancing_frequency=rebalancing_frequency,
+                engine="interval",
+                compact=True,
+                **strategy,
+                **params,
+            )
+            npt.assert_equal(error, None)
+            npt.assert_equal(strategy_results.statuses, expected.statuses)
+            npt.assert_allclose(values, expected.values(), rtol=TOL)
+            for pf, expected_pf in zip(
+                strategy_results["portfolios"], expected["portfolios"]
+            ):
+                npt.assert_equal(pf["project"].values, expected_pf["project"].values)
+                for m in ["weight", "tokens"]:
+                    npt.assert_allclose(
+                        pf[m].values, expected_pf[m].values, rtol=TOL, atol=TOL
+                    )
+
+    summary = multi_strategy.summary(strategies, results, errors)
+    npt.assert_equal(len(summary), len(strategies))
+    npt.assert_equal(list(summary.columns[:5]), multi_strategy.STRATEGY_PARAMETERS)
+    npt.assert_allclose(summary["final_value"][:-1], nav.values[:-1, -1], rtol=TOL)
+    npt.assert_equal(summary["error"].notna().sum(), 1)
+
+    # Strategies holding a project without a price fail on that day, with the
+    # same error as a backtest of their own
+    project = results[0]["portfolios"][0]["project"].iloc[0]
+    missing = data[(data["datetime"] != "2021-01-10") | (data["project"] != project)]
+    nav, results, errors = multi_strategy.backtest_strategies(
+        strategies[:2],
+        historical_data=missing,
+        rebalancing_frequency="monthly",
+        **params,
+    )
+    for strategy, error, values in zip(strategies[:2], errors, nav.values):
+        try:
+            bt.backtest(
+                historical_data=missing,
+                rebalancing_frequency="monthly",
+                engine="interval",
+                compact=True,
+                **strategy,
+                **params,
+            )
+        except ValueError as e:
+            npt.assert_equal(error, f"ValueError: {e}")
+            npt.assert_equal(np.isnan(values[9:]).all(), True)
+            npt.assert_equal(np.isnan(values[:9]).any(), False)
+        else:
+            npt.assert_equal(error, None)
+    npt.assert_equal(errors[0] is not None, True)
+
+    # Strategies can have a panel each, which gives the same results as
+    # backtests on each panel
+    scaled = data.copy()
+    scaled["price"] *= np.exp(np.random.RandomState(bt.SEED).normal(0, 0.1, len(data)))
+    panels = [panel, HistoricalPanel(scaled), panel]
+    nav, results, errors = multi_strategy.backtest_strategies(
+        strategies[:3],
+        historical_data=panels,
+        rebalancing_frequency=7,
+        **params,
+    )
+    for strategy, strategy_panel, values in zip(strategies[:3], panels, nav.values):
+        expected, _, _ = multi_strategy.backtest_strategies(
+            [strategy],
+            historical_data=strategy_panel,
+            rebalancing_frequency=7,
+            **params,
+        )
+        npt.assert_allclose(values, expected.values[0], rtol=TOL)
+    npt.assert_equal(errors, [None] * 3)
+    npt.assert_equal(np.any(nav.values[0] != nav.values[1]), True)
+    for historical_data in [panels[:2], [panel, HistoricalPanel(data.iloc[:-30])]]:
+        with npt.assert_raises(ValueError):
+            multi_strategy.backtest_strategies(
+                strategies[:3],
+                historical_data=historical_data,
+                rebalancing_frequency=7,
+                **params,
+            )
+    return
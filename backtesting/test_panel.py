@@ -0,0 +1,121 @@
+"""This module contains tests for the class in the module `panel`."""
+
+
+import datetime
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import backtesting as bt
+from panel import HistoricalPanel
+from test_backtesting import generate_random_data
+
+
+def test_historical_panel():
+    """Test class `panel.HistoricalPanel`."""
+    n_days = 5
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=n_days)
+
+    # Remove some rows to check that missing data is NaN
+    data = data.drop(index=[3, 27]).sample(frac=1.0, random_state=0)
+    panel = HistoricalPanel(data)
+
+    npt.assert_equal(panel.price.shape, (n_days, 20))
+    npt.assert_equal(panel.start_date, start_date)
+    npt.assert_equal(panel.end_date, start_date + datetime.timedelta(days=n_days - 1))
+    npt.assert_equal(np.sum(np.isnan(panel.sp)), 2)
+    for _, row in data.iterrows():
+        for m in ["price", "sp", "market_cap_circulating", "project_id"]:
+            npt.assert_equal(
+                panel.get(m, row["datetime"], row["project"]),
+                bt._get_project_metric(row["project"], m, row["datetime"], data),
+            )
+
+    df = panel.cross_section(start_date, ["unknown"] + panel.projects[:3])
+    npt.assert_equal(list(df["project"]), panel.projects[:3])
+    npt.assert_equal(np.all(df["datetime"] == str(start_date)), True)
+
+    npt.assert_raises(ValueError, panel.date_loc, datetime.date(2020, 1, 1))
+    npt.assert_raises(ValueError, panel.project_loc, ["unknown"])
+
+    # Rows without a date or project are rejected
+    for c in ["datetime", "project"]:
+        missing = data.copy()
+        missing.loc[missing.index[0], c] = np.nan
+        npt.assert_raises(ValueError, HistoricalPanel, missing)
+        missing[c] = missing[c].astype("category")
+        npt.assert_raises(ValueError, HistoricalPanel, missing)
+
+    # So are duplicate rows of the same date and project
+    duplicated = pd.concat([data, data.iloc[[5]]])
+    with npt.assert_raises(ValueError) as e:
+        HistoricalPanel(duplicated)
+    npt.assert_equal(
+        str(e.exception),
+        f"Duplicate rows for {data['project'].iloc[5]} on {data['datetime'].iloc[5]}",
+    )
+    return
+
+
+def test__calculate_target_portfolio_with_panel():
+    """Test that `backtest._calculate_target_portfolio` gives the same results
+    with a data frame and a panel."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=50, start_date=start_date, n_days=2)
+    panel = HistoricalPanel(data)
+    for date in [start_date, start_date + datetime.timedelta(days=1)]:
+        for min_circ_marketcap in [0.0, 5e8]:
+            kwargs = dict(
+                n_projects=10,
+                date=date,
+                projects_to_include=list(np.unique(data["project"]))[5:],
+                value=1e2,
+                min_weight=0.01,
+                max_weight=0.2,
+                min_circ_marketcap=min_circ_marketcap,
+                solver="exact",
+            )
+            pf = bt._calculate_target_portfolio(historical_data=data, **kwargs)
+            panel_pf = bt._calculate_target_portfolio(historical_data=panel, **kwargs)
+            for c in pf.columns:
+                npt.assert_equal(
+                    pf[c].astype(str).values, panel_pf[c].astype(str).values
+                )
+    return
+
+
+def test_backtest_with_missing_prices():
+    """Test that `backtesting.backtest` raises an error when a project of the
+    portfolio has no price, and accepts subclasses of the panel."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=5, start_date=start_date, n_days=10)
+    kwargs = dict(
+        n_projects=5,
+        initial_investment=1e2,
+        min_circ_marketcap=1.0,
+        min_weight=0.01,
+        max_weight=0.5,
+        max_change=0.1,
+        start_date=start_date,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=7,
+        solver="exact",
+    )
+
+    class Panel(HistoricalPanel):
+        pass
+
+    results = bt.backtest(historical_data=Panel(data), **kwargs)
+    npt.assert_equal(len(results["statuses"]), 13)
+
+    # Every day is checked, including the days compact results do not save
+    project = data["project"].iloc[2]
+    data = data[(data["datetime"] != "2021-01-04") | (data["project"] != project)]
+    message = f"There is no price for {project} on 2021-01-04"
+    for engine, compact in [("daily", False), ("interval", False), ("interval", True)]:
+        with npt.assert_raises(ValueError) as e:
+            bt.backtest(historical_data=data, engine=engine, compact=compact, **kwargs)
+        npt.assert_equal(str(e.exception), message)
+    return
@@ -0,0 +1,101 @@
+"""This module contains tests for the class in the module `profiling`."""
+
+
+import datetime
+import os
+import shutil
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+import benchmark
+import profiling
+import run_backtest
+from test_backtesting import generate_random_data
+
+
+def test_profiler():
+    """Test class `profiling.Profiler` in `backtesting.backtest`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=30, start_date=start_date, n_days=45)
+    kwargs = dict(
+        n_projects=10,
+        initial_investment=1e2,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.25,
+        max_change=0.1,
+        start_date=start_date,
+        historical_data=data,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=10,
+        solver="exact",
+    )
+    for engine in ["daily", "interval"]:
+        expected = bt.backtest(engine=engine, **kwargs)
+        events = []
+        profiler = profiling.Profiler(callback=events.append)
+        with benchmark._count_solver_calls() as calls:
+            results = bt.backtest(engine=engine, profiler=profiler, **kwargs)
+
+        # Profiling does not change the results
+        npt.assert_equal(results["statuses"], expected["statuses"])
+        for pf, expected_pf in zip(results["portfolios"], expected["portfolios"]):
+            npt.assert_equal(pf.to_dict(), expected_pf.to_dict())
+
+        profile = results["profile"]
+        npt.assert_equal(profile, profiler.to_dict())
+        npt.assert_equal(
+            set(profile["phases"]), set(profiling.PHASES) - {"checkpoint", "export"}
+        )
+        phases = profile["phases"]
+        npt.assert_equal(phases["rebalance"]["calls"], 4)
+        npt.assert_equal(phases["target_construction"]["calls"], 1 + 4)
+        npt.assert_equal(phases["recording"]["calls"], len(results["statuses"]))
+        npt.assert_equal(
+            phases["rebalance"]["seconds"] >= phases["weights"]["seconds"] / 2, True
+        )
+
+        # Every call of the solver is recorded with its diagnostics
+        solver_calls = profile["solver_calls"]
+        npt.assert_equal(len(solver_calls), calls[0])
+        npt.assert_equal(len(solver_calls), phases["weights"]["calls"])
+        for call in solver_calls:
+            npt.assert_equal(call["solver"], "exact")
+            npt.assert_equal(call["success"] and not call["cached"], True)
+            npt.assert_equal(call["nit"] >= 0 and call["seconds"] > 0, True)
+
+        # The callback receives every phase and solver call
+        npt.assert_equal(
+            sum(e["event"] == "phase" for e in events),
+            sum(p["calls"] for p in phases.values()),
+        )
+        npt.assert_equal(
+            [e for e in events if e["event"] == "solver"],
+            [dict(event="solver", **call) for call in solver_calls],
+        )
+
+    # Checkpoints and the export of the results are timed in their own phases
+    directory = "profiling_test_outputs"
+    os.makedirs(directory, exist_ok=True)
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    profiler = profiling.Profiler()
+    results = bt.backtest(checkpoint=checkpoint, profiler=profiler, **kwargs)
+    npt.assert_equal(profiler.phases["checkpoint"]["calls"], 2)
+    run_backtest.save_outputs(results, directory, profiler=profiler)
+    npt.assert_equal(profiler.phases["export"]["calls"], 6)
+    npt.assert_equal(profiler.phases["export"]["seconds"] > 0, True)
+    shutil.rmtree(directory)
+
+    # Profiles are kept in compact results
+    profiler = profiling.Profiler()
+    compact = bt.backtest(compact=True, engine="interval", profiler=profiler, **kwargs)
+    npt.assert_equal(compact["profile"], profiler.to_dict())
+    npt.assert_equal(compact.to_dict()["profile"], profiler.to_dict())
+    npt.assert_raises(
+        KeyError,
+        bt.backtest(compact=True, engine="interval", **kwargs).__getitem__,
+        "profile",
+    )
+    return
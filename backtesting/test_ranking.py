@@ -0,0 +1,75 @@
+"""This module contains tests for the class in the module `ranking`."""
+
+
+import datetime
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+from panel import HistoricalPanel
+from test_backtesting import generate_random_data
+
+
+def test_ranking_index():
+    """Test class `ranking.RankingIndex`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=40, start_date=start_date, n_days=10)
+    # Many ties, and projects without data
+    data["sp"] = np.round(data["sp"] * 4) / 4
+    data.loc[data.index % 7 == 0, "market_cap_circulating"] = np.nan
+    data.loc[data.index % 11 == 0, "sp"] = np.nan
+    panel = HistoricalPanel(data)
+    rng = np.random.RandomState(bt.SEED)
+    projects_to_include = list(rng.permutation(panel.projects)[:30]) + ["unknown"]
+
+    for min_circ_marketcap in [0.0, 3e8, 2e9]:
+        ranking = panel.ranking(projects_to_include, min_circ_marketcap)
+        # Rankings are only calculated when they are used
+        npt.assert_equal(ranking._rows, [None] * len(panel.dates))
+        npt.assert_equal(
+            panel.ranking(projects_to_include, min_circ_marketcap) is ranking, True
+        )
+        # Ties are ranked by column, whatever the order of the universe
+        reversed_ranking = panel.ranking(projects_to_include[::-1], min_circ_marketcap)
+        for row in range(len(panel.dates)):
+            npt.assert_equal(reversed_ranking.ranking(row), ranking.ranking(row))
+        for row, date in enumerate(panel.dates):
+            # Same projects, in the same order, as filtering and sorting the
+            # data of the date in the order of the columns of the panel
+            df = panel.cross_section(date, sorted(projects_to_include))
+            df = df[df["market_cap_circulating"].notna() & df["sp"].notna()]
+            npt.assert_equal(ranking.n_with_data(row), len(df))
+            df = df[df["market_cap_circulating"] >= min_circ_marketcap]
+            df = df.sort_values("sp", ascending=False, kind="stable")
+            npt.assert_equal(
+                [panel.projects[j] for j in ranking.ranking(row)], list(df["project"])
+            )
+            npt.assert_equal(
+                [panel.projects[j] for j in ranking.top(row, 5)],
+                list(df["project"][:5]),
+            )
+
+    # Target portfolios raise the same errors as without the index
+    kwargs = dict(
+        date=start_date,
+        projects_to_include=projects_to_include[:30],
+        value=1e2,
+        min_weight=0.01,
+        max_weight=0.5,
+        solver="exact",
+    )
+    for n_projects, min_circ_marketcap, message in [
+        (28, 0.0, "Not enough projects with market cap and P/S data"),
+        (15, 2e9, "Not enough projects with sufficient circulating market cap"),
+    ]:
+        for historical_data in [panel, data]:
+            with npt.assert_raises(Exception) as e:
+                bt._calculate_target_portfolio(
+                    n_projects=n_projects,
+                    historical_data=historical_data,
+                    min_circ_marketcap=min_circ_marketcap,
+                    **kwargs,
+                )
+            npt.assert_equal(str(e.exception), f"{message} ({start_date})")
+    return
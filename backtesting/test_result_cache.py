@@ -0,0 +1,143 @@
+"""This module contains tests for the class and functions in the module
+`result_cache`."""
+
+
+import datetime
+import inspect
+import os
+import shutil
+import sys
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+import result_cache
+from panel import HistoricalPanel
+from result_cache import ResultCache
+from test_backtesting import generate_random_data
+
+
+def test_result_cache():
+    """Test class `result_cache.ResultCache`."""
+    path = "result_cache_test"
+    directory = "result_cache_test_outputs"
+    os.makedirs(directory, exist_ok=True)
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=5, start_date=start_date, n_days=10)
+    panel = HistoricalPanel(data)
+    params = dict(
+        n_projects=3,
+        start_date=start_date,
+        end_date=datetime.date(2021, 1, 5),
+        projects_to_include=list(np.unique(data["project"])),
+    )
+    outputs = {"a.json": {"save_status": True}, "b.json": {"save_status": False}}
+
+    # Keys change with the parameters, the data they use and the outputs
+    cache = ResultCache(path)
+    key = cache.key(params, panel, outputs)
+    npt.assert_equal(cache.key(params, panel, outputs), key)
+    npt.assert_equal(
+        cache.key({**params, "n_projects": 4}, panel, outputs) != key, True
+    )
+    npt.assert_equal(cache.key(params, panel, {"a.json": {}}) != key, True)
+    changed = data.copy()
+    changed.loc[changed["datetime"] == "2021-01-03", "price"] *= 2
+    npt.assert_equal(cache.key(params, HistoricalPanel(changed), outputs) != key, True)
+    changed = data.copy()
+    changed.loc[changed["datetime"] == "2021-01-08", "price"] *= 2
+    npt.assert_equal(cache.key(params, HistoricalPanel(changed), outputs), key)
+
+    # Entries save the files, and restoring them only writes the files that
+    # are missing or differ
+    npt.assert_equal(cache.get(key), None)
+    files = {}
+    for name, contents in [("a.json", "[1, 2]"), ("b.json", "[3]")]:
+        files[name] = os.path.join(path, name)
+        with open(files[name], "w") as file:
+            file.write(contents)
+    entry = cache.put(key, params, files)
+    npt.assert_equal(cache.get(key), entry)
+    npt.assert_equal((cache.hits, cache.misses), (1, 1))
+    npt.assert_equal(cache.restore(entry, directory), ["a.json", "b.json"])
+    npt.assert_equal(cache.restore(entry, directory), [])
+    with open(os.path.join(directory, "b.json"), "w") as file:
+        file.write("[4]")
+    npt.assert_equal(cache.restore(entry, directory), ["b.json"])
+    with open(os.path.join(directory, "b.json")) as file:
+        npt.assert_equal(file.read(), "[3]")
+
+    # Entries with the same contents share them, and evicting an entry only
+    # removes the contents no other entry uses
+    with open(files["b.json"], "w") as file:
+        file.write("[5]")
+    other = cache.put("0" * 64, params, files)
+    npt.assert_equal(other["outputs"]["a.json"], entry["outputs"]["a.json"])
+    npt.assert_equal(len(os.listdir(os.path.join(path, "objects"))), 3)
+    entries = {e["key"]: e for e in cache.entries()}
+    npt.assert_equal(sorted(entries), sorted([key, "0" * 64]))
+    npt.assert_equal(entries[key]["size"], 9)
+    npt.assert_equal(cache.evict([key[:8]]), [key])
+    npt.assert_equal(cache.get(key), None)
+    npt.assert_equal(len(os.listdir(os.path.join(path, "objects"))), 2)
+    npt.assert_equal(cache.evict(), ["0" * 64])
+    npt.assert_equal(os.listdir(os.path.join(path, "objects")), [])
+
+    shutil.rmtree(path)
+    shutil.rmtree(directory)
+    return
+
+
+def test_library_version(monkeypatch):
+    """Test function `result_cache.library_version`."""
+    version = result_cache.library_version()
+    npt.assert_equal(result_cache.library_version(), version)
+
+    # Every module of the repository used by `backtesting` is part of the
+    # version
+    names = {
+        value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", "")
+        for value in vars(bt).values()
+    }
+    local = {
+        name
+        for name in names
+        if name in sys.modules
+        and os.path.dirname(getattr(sys.modules[name], "__file__", None) or "")
+        == os.path.dirname(bt.__file__)
+    }
+    npt.assert_equal(local - {m.__name__ for m in result_cache.LIBRARY_MODULES}, set())
+    npt.assert_equal("ranking" in local, True)
+
+    # Versions of the libraries are part of the version
+    monkeypatch.setattr(np, "__version__", "0.0.0")
+    npt.assert_equal(result_cache.library_version() != version, True)
+    return
+
+
+def test_main(capsys):
+    """Test function `result_cache.main`."""
+    path = "result_cache_test"
+    cache = ResultCache(path)
+    files = {"a.json": os.path.join(path, "a.json")}
+    with open(files["a.json"], "w") as file:
+        file.write("[1, 2]")
+    params = dict(start_date=datetime.date(2021, 1, 1), end_date=None)
+    cache.put("ab" * 32, params, files)
+    cache.put("cd" * 32, params, files)
+
+    result_cache.main(["--cache-dir", path, "list"])
+    lines = capsys.readouterr().out.splitlines()
+    npt.assert_equal(len(lines), 2)
+    npt.assert_equal(lines[0].startswith("ab" * 6), True)
+    npt.assert_equal("2021-01-01 to latest" in lines[0], True)
+    result_cache.main(["--cache-dir", path, "evict", "abab"])
+    npt.assert_equal(capsys.readouterr().out, "Evicted 1 entries\n")
+    with npt.assert_raises(SystemExit):
+        result_cache.main(["--cache-dir", path, "evict"])
+    result_cache.main(["--cache-dir", path, "evict", "--all"])
+    npt.assert_equal(cache.entries(), [])
+
+    shutil.rmtree(path)
+    return
@@ -0,0 +1,96 @@
+"""This module contains tests for the class in the module `results`."""
+
+
+import datetime
+import json
+import os
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+from results import BacktestResults
+from test_backtesting import generate_random_data, TOL
+
+
+def test_backtest_results():
+    """Test class `results.BacktestResults`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=30, start_date=start_date, n_days=45)
+    kwargs = dict(
+        n_projects=10,
+        initial_investment=1e2,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.25,
+        max_change=0.1,
+        start_date=start_date,
+        historical_data=data,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=10,
+        solver="exact",
+        engine="interval",
+    )
+    results = bt.backtest(**kwargs)
+    compact = bt.backtest(compact=True, **kwargs)
+    npt.assert_equal(isinstance(compact, BacktestResults), True)
+    npt.assert_equal(compact.n_days, 45)
+    npt.assert_equal(len(compact.events), 1 + 3 * 4)
+
+    # The compact results behave like the results of the backtest
+    npt.assert_equal(compact["statuses"], results["statuses"])
+    npt.assert_equal(len(compact["portfolios"]), len(results["portfolios"]))
+    npt.assert_equal(list(compact.keys()), list(results.keys()))
+    npt.assert_equal(list(compact), list(results))
+    for key in ["statuses", "profile", 0]:
+        npt.assert_equal(key in compact, key in results)
+        npt.assert_equal(compact.get(key, "missing"), results.get(key, "missing"))
+    for pf, compact_pf in zip(results["portfolios"], compact["portfolios"]):
+        npt.assert_equal(list(pf.columns), list(compact_pf.columns))
+        npt.assert_equal(pf["datetime"].values, compact_pf["datetime"].values)
+        npt.assert_equal(pf["project"].values, compact_pf["project"].values)
+        npt.assert_equal(pf["project_id"].values, compact_pf["project_id"].values)
+        for m in ["weight", "tokens", "price", "sp"]:
+            npt.assert_allclose(pf[m].values, compact_pf[m].values, rtol=TOL)
+
+    # Daily values and weights are those of the latest portfolio of each day
+    values = compact.values()
+    weights = compact.weights()
+    latest = {}
+    for pf in results["portfolios"]:
+        latest[pf["datetime"].values[0]] = pf
+    npt.assert_equal(len(latest), len(values))
+    for i, pf in enumerate(latest.values()):
+        npt.assert_allclose(values[i], bt._calculate_value(pf), rtol=TOL)
+        columns = compact.historical_data.project_loc(pf["project"])
+        npt.assert_allclose(weights[i, columns], pf["weight"].values, rtol=TOL)
+        npt.assert_allclose(sum(weights[i]), 1)
+
+    # Existing exporters work with the compact results
+    bt.results_to_json(results, json_name="results", save_status=True)
+    bt.results_to_json(compact, json_name="results_compact", save_status=True)
+    with open("results.json") as f:
+        expected = json.load(f)
+    with open("results_compact.json") as f:
+        actual = json.load(f)
+    npt.assert_equal(list(actual), list(expected))
+    for day in expected:
+        for status in expected[day]:
+            npt.assert_allclose(
+                actual[day][status]["value"], expected[day][status]["value"], rtol=TOL
+            )
+    os.remove("results.json")
+    os.remove("results_compact.json")
+
+    # The rebalance ledger only needs the portfolios of rebalances
+    ledger = bt.rebalance_ledger(results)
+    compact_ledger = bt.rebalance_ledger(compact)
+    npt.assert_equal(compact_ledger["day"].values, ledger["day"].values)
+    npt.assert_equal(compact_ledger["component"].values, ledger["component"].values)
+    for c in ["weight_pre", "weight_init", "weight_target", "weight_post"]:
+        npt.assert_allclose(compact_ledger[c].values, ledger[c].values, rtol=TOL)
+
+    npt.assert_raises(
+        ValueError, bt.backtest, **dict(kwargs, engine="daily"), compact=True
+    )
+    return
@@ -0,0 +1,69 @@
+"""This module contains tests for the classes and functions in the module
+`shared_panel`."""
+
+
+import datetime
+import multiprocessing
+import os
+import pickle
+
+import numpy as np
+import numpy.testing as npt
+
+import shared_panel
+from panel import HistoricalPanel, METRICS
+from test_backtesting import generate_random_data
+
+
+def _worker_summary(handle):
+    """Attach to a shared panel in a worker process and summarise it."""
+    panel = shared_panel.attach(handle)
+    return (
+        [np.nansum(getattr(panel, metric)) for metric in METRICS],
+        panel.price.flags.owndata or panel.price.flags.writeable,
+        panel.get("project_id", panel.dates[0], panel.projects[0]),
+    )
+
+
+def test_shared_panel():
+    """Test class `shared_panel.SharedPanel` and function
+    `shared_panel.attach`."""
+    start_date = datetime.date(2021, 1, 1)
+    panel = HistoricalPanel(
+        generate_random_data(n_projects=10, start_date=start_date, n_days=20)
+    )
+    expected = [np.nansum(getattr(panel, metric)) for metric in METRICS]
+    path = "shared_panel_test.npy"
+
+    for kwargs in [{}, {"path": path}]:
+        with shared_panel.SharedPanel(panel, **kwargs) as shared:
+            # The handle does not contain the metrics
+            npt.assert_equal(
+                len(pickle.dumps(shared.handle)) < panel.price.nbytes, True
+            )
+
+            attached = shared_panel.attach(shared.handle)
+            npt.assert_equal(attached.dates, panel.dates)
+            npt.assert_equal(attached.projects, panel.projects)
+            npt.assert_equal(list(attached.project_ids), list(panel.project_ids))
+            for metric in METRICS:
+                npt.assert_equal(getattr(attached, metric), getattr(panel, metric))
+                npt.assert_equal(getattr(attached, metric).flags.writeable, False)
+            npt.assert_equal(shared_panel.resolve(panel) is panel, True)
+            npt.assert_equal(shared_panel.resolve(shared.handle).price, attached.price)
+            del attached
+
+            # Worker processes attach to the panel without copying it
+            with multiprocessing.Pool(2) as pool:
+                for sums, copied, project_id in pool.map(
+                    _worker_summary, [shared.handle] * 2
+                ):
+                    npt.assert_allclose(sums, expected)
+                    npt.assert_equal(copied, False)
+                    npt.assert_equal(project_id, panel.project_ids[0])
+        handle = shared.handle
+
+        # Closing releases the shared block
+        npt.assert_raises(FileNotFoundError, shared_panel.attach, handle)
+    npt.assert_equal(os.path.exists(path), False)
+    return
@@ -0,0 +1,158 @@
+"""This module contains tests for the functions in the module `sweep`."""
+
+
+import datetime
+import os
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import backtesting as bt
+import sweep
+from test_backtesting import generate_random_data, TOL
+
+
+def test_sweep():
+    """Test function `sweep.sweep`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    projects_to_include = list(np.unique(data["project"]))
+    grid = {
+        "n_projects": [5, 10],
+        "max_weight": [0.05, 0.3],
+        "rebalancing_frequency": ["monthly", 7],
+    }
+    params = dict(
+        start_date=start_date,
+        projects_to_include=projects_to_include,
+        min_weight=1e-3,
+        max_change=0.1,
+        min_circ_marketcap=1e8,
+    )
+    summary = sweep.sweep(data, grid, n_workers=1, **params)
+    parallel_summary = sweep.sweep(data, grid, n_workers=2, **params)
+
+    npt.assert_equal(len(summary), 8)
+    pd.testing.assert_frame_equal(
+        summary.drop(columns="seconds"), parallel_summary.drop(columns="seconds")
+    )
+    # Combinations with the same rebalancing frequency are run together
+    single_pass_summary = sweep.sweep(
+        data, grid, n_workers=1, single_pass=True, **params
+    )
+    pd.testing.assert_frame_equal(
+        summary.drop(columns="seconds"),
+        single_pass_summary.drop(columns="seconds"),
+        check_exact=False,
+        rtol=TOL,
+    )
+
+    # max_weight must be at least 1/n_projects
+    failed = summary[summary["error"].notna()]
+    npt.assert_equal(np.all(failed["max_weight"] * failed["n_projects"] < 1), True)
+    npt.assert_equal(len(failed), 4)
+    npt.assert_equal(failed["error"].str.startswith("ValueError").all(), True)
+
+    for _, row in summary[summary["error"].isna()].iterrows():
+        results = bt.backtest(
+            historical_data=data,
+            initial_investment=100.0,
+            n_projects=row["n_projects"],
+            max_weight=row["max_weight"],
+            rebalancing_frequency=row["rebalancing_frequency"],
+            solver="exact",
+            **params,
+        )
+        npt.assert_allclose(
+            row["final_value"], bt._calculate_value(results["portfolios"][-1]), rtol=TOL
+        )
+        n_rebalances = results["statuses"].count("rebalanced")
+        npt.assert_equal(row["n_rebalances"], n_rebalances)
+        npt.assert_equal(row["turnover"] >= 0, True)
+        npt.assert_equal(
+            row["turnover"] <= n_rebalances * 0.1 * row["n_projects"], True
+        )
+
+    # Grids without any combination are rejected
+    for single_pass in [False, True]:
+        with npt.assert_raises(ValueError) as e:
+            sweep.sweep(
+                data,
+                dict(grid, max_weight=[]),
+                n_workers=1,
+                single_pass=single_pass,
+                **params,
+            )
+        npt.assert_equal(
+            str(e.exception), "No values for parameters ['max_weight'] in grid"
+        )
+    npt.assert_raises(ValueError, sweep._run_strategies, [])
+    return
+
+
+def test_sweep_releases_shared_panel(monkeypatch):
+    """Test that `sweep.sweep` releases the shared panel if the pool of
+    processes cannot be started."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=10)
+    closed = []
+
+    class SharedPanel(sweep.SharedPanel):
+        def close(self):
+            closed.append(self.handle.name)
+            super().close()
+
+    def pool(*args, **kwargs):
+        raise OSError("Cannot start processes")
+
+    monkeypatch.setattr(sweep, "SharedPanel", SharedPanel)
+    monkeypatch.setattr(sweep.multiprocessing, "Pool", pool)
+    with npt.assert_raises(OSError):
+        sweep.sweep(
+            data,
+            {"n_projects": [5], "rebalancing_frequency": [3]},
+            start_date=start_date,
+            projects_to_include=list(np.unique(data["project"])),
+            min_weight=1e-3,
+            max_weight=0.3,
+            max_change=0.1,
+            min_circ_marketcap=1e8,
+            n_workers=2,
+        )
+    npt.assert_equal(len(closed), 1)
+    return
+
+
+def test_main():
+    """Test function `sweep.main`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=10)
+    data.to_csv("sweep_data.csv")
+    sweep.main(
+        [
+            "--data",
+            "sweep_data.csv",
+            "--n-projects",
+            "5",
+            "--max-change",
+            "0.05",
+            "0.1",
+            "--rebalancing-frequency",
+            "3",
+            "--workers",
+            "1",
+            "--output",
+            "sweep_test.csv",
+        ]
+    )
+    summary = pd.read_csv("sweep_test.csv")
+    npt.assert_equal(len(summary), 2)
+    npt.assert_equal(summary["error"].isna().all(), True)
+
+    # Unknown solvers are rejected when the arguments are parsed
+    with npt.assert_raises(SystemExit):
+        sweep.main(["--data", "sweep_data.csv", "--solver", "exakt"])
+    os.remove("sweep_data.csv")
+    os.remove("sweep_test.csv")
+    return
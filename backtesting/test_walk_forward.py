@@ -0,0 +1,86 @@
+"""This module contains tests for the functions in the module `walk_forward`."""
+
+
+import datetime
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import backtesting as bt
+import walk_forward
+from test_backtesting import generate_random_data
+
+
+def test_walk_forward():
+    """Test function `walk_forward.walk_forward`."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=40)
+    start_dates = [start_date + datetime.timedelta(days=i) for i in range(0, 30, 3)]
+    params = dict(
+        n_projects=8,
+        initial_investment=100.0,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.25,
+        max_change=0.1,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=7,
+    )
+    nav, summary = walk_forward.walk_forward(
+        data, start_dates=start_dates, n_workers=1, **params
+    )
+    parallel_nav, parallel_summary = walk_forward.walk_forward(
+        data, start_dates=start_dates, n_workers=2, **params
+    )
+    pd.testing.assert_frame_equal(nav, parallel_nav)
+    pd.testing.assert_frame_equal(
+        summary.drop(columns="seconds"), parallel_summary.drop(columns="seconds")
+    )
+
+    npt.assert_equal(nav.shape, (len(start_dates), 40))
+    npt.assert_equal(list(nav.index), list(summary["start_date"]))
+    npt.assert_equal(summary["error"].isna().all(), True)
+
+    # Every path is the path of a separate backtest with the same start date
+    targets = {}
+    for k, date in enumerate(start_dates):
+        results = bt.backtest(
+            historical_data=data,
+            start_date=date,
+            solver="exact",
+            engine="interval",
+            compact=True,
+            targets=targets,
+            **params,
+        )
+        expected = bt.backtest(
+            historical_data=data,
+            start_date=date,
+            solver="exact",
+            engine="interval",
+            compact=True,
+            **params,
+        )
+        # Reusing target portfolios does not change the results
+        npt.assert_equal(results.values(), expected.values())
+        values = nav.iloc[k].values
+        first = (date - start_date).days
+        npt.assert_equal(np.isnan(values[:first]).all(), True)
+        npt.assert_equal(values[first:], expected.values())
+        npt.assert_equal(summary["final_value"][k], expected.values()[-1])
+        npt.assert_equal(
+            summary["n_rebalances"][k], expected.statuses.count("rebalanced")
+        )
+    npt.assert_equal(
+        len(targets),
+        len(walk_forward._target_dates(start_dates, datetime.date(2021, 2, 9), 7)),
+    )
+
+    # Start dates without enough data are reported
+    late = datetime.date(2021, 3, 1)
+    _, summary = walk_forward.walk_forward(
+        data, start_dates=[start_date, late], n_workers=1, **params
+    )
+    npt.assert_equal(summary["error"].isna().tolist(), [True, False])
+    return
@@ -0,0 +1,87 @@
+"""This module contains tests for the class in the module `weight_cache`."""
+
+
+import datetime
+import shutil
+
+import numpy as np
+import numpy.testing as npt
+
+import backtesting as bt
+from test_backtesting import generate_random_data
+from weight_cache import WeightCache
+
+
+def test_weight_cache():
+    """Test class `weight_cache.WeightCache`."""
+    np.random.seed(123)
+    path = "weight_cache_test"
+    cache = WeightCache(maxsize=2, path=path)
+    inputs = []
+    for _ in range(3):
+        original = np.random.random(10)
+        target = np.random.random(10)
+        inputs.append(
+            dict(
+                original=original / sum(original),
+                target=target / sum(target),
+                max_change=0.05,
+                min_weight=0.01,
+                max_weight=0.2,
+                solver="exact",
+            )
+        )
+    weights = [bt._calculate_weights(cache=cache, **i) for i in inputs]
+    npt.assert_equal(cache.stats["misses"], 3)
+    npt.assert_equal(cache.stats["evictions"], 1)
+    npt.assert_equal(len(cache), 2)
+
+    # Least recently used results are evicted from memory but kept on disk
+    npt.assert_equal(bt._calculate_weights(cache=cache, **inputs[2]), weights[2])
+    npt.assert_equal(cache.stats["hits"], 1)
+    npt.assert_equal(bt._calculate_weights(cache=cache, **inputs[0]), weights[0])
+    npt.assert_equal(cache.stats["disk_hits"], 1)
+
+    # Results on disk are shared with new caches
+    other_cache = WeightCache(path=path)
+    npt.assert_equal(bt._calculate_weights(cache=other_cache, **inputs[1]), weights[1])
+    npt.assert_equal(other_cache.stats["disk_hits"], 1)
+
+    # Changes in the inputs below the rounding precision give the same key
+    key = cache.key(**inputs[0])
+    npt.assert_equal(cache.key(**dict(inputs[0], max_weight=0.25)) == key, False)
+    npt.assert_equal(
+        cache.key(**dict(inputs[0], original=inputs[0]["original"] + 1e-15)), key
+    )
+    shutil.rmtree(path)
+    return
+
+
+def test_backtest_with_weight_cache():
+    """Test that `backtesting.backtest` gives the same results with a cache."""
+    start_date = datetime.date(2021, 1, 1)
+    data = generate_random_data(n_projects=20, start_date=start_date, n_days=20)
+    kwargs = dict(
+        n_projects=5,
+        initial_investment=1e2,
+        min_circ_marketcap=1e8,
+        min_weight=1e-3,
+        max_weight=0.3,
+        max_change=0.1,
+        start_date=start_date,
+        historical_data=data,
+        projects_to_include=list(np.unique(data["project"])),
+        rebalancing_frequency=7,
+        solver="exact",
+        engine="interval",
+        compact=True,
+    )
+    cache = WeightCache()
+    expected = bt.backtest(**kwargs)
+    first = bt.backtest(cache=cache, **kwargs)
+    npt.assert_equal(cache.stats["hits"], 0)
+    second = bt.backtest(cache=cache, **kwargs)
+    npt.assert_equal(cache.stats["hits"], cache.stats["misses"])
+    for results in [first, second]:
+        npt.assert_equal(results.values(), expected.values())
+    return
@@ -0,0 +1,378 @@
+"""This module contains functions for walk-forward analyses of the Token
+Terminal Index, i.e. backtests started on many dates of the history.
+
+It can also be executed as a script, e.g.:
+
+    python walk_forward.py --first-start-date 2021-01-01 --step 7 --workers 4
+
+which saves the daily values of every backtest in `walk_forward_nav.csv` and a
+summary of every backtest in `walk_forward.csv`."""
+
+
+import argparse
+import datetime
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import backtesting as bt
+from panel import HistoricalPanel
+from shared_panel import resolve, SharedPanel
+from weight_cache import WeightCache
+
+
+# Historical data, parameters, weight cache and target portfolios shared by the
+# backtests of a worker. They are set once per worker process by
+# `_init_worker`, and the historical data is attached from shared memory (see
+# `sweep._init_worker`).
+_historical_data = None
+_params = None
+_cache = None
+_targets = None
+
+
+def _init_worker(historical_data, params, cache=None, targets=None):
+    """Set the data shared by the backtests of a worker process."""
+    global _historical_data, _params, _cache, _targets
+    _historical_data = resolve(historical_data)
+    _params = params
+    _cache = cache
+    _targets = {} if targets is None else targets
+
+
+def _map(fn, items, n_workers, initargs, quiet=True):
+    """Apply a function to items in this process or in a pool of processes.
+
+    Args:
+        fn: function.
+        items: list.
+        n_workers: int defining the number of worker processes. If 1, items
+            are processed in this process.
+        initargs: tuple of arguments of `_init_worker`.
+        quiet: bool defining whether not to print the progress.
+
+    Returns:
+        list with the outputs of the function, in the order of the items.
+    """
+    if n_workers == 1:
+        _init_worker(*initargs)
+        iterator = map(fn, items)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(
+            processes=min(n_workers, len(items)),
+            initializer=_init_worker,
+            initargs=initargs,
+        )
+        # Consecutive items share most of their rebalance dates
+        iterator = pool.imap(fn, items, chunksize=max(len(items) // n_workers, 1))
+    outputs = []
+    try:
+        for output in iterator:
+            outputs.append(output)
+            if not quiet:
+                print(f"{len(outputs)}/{len(items)}", end="\r")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return outputs
+
+
+def _target_dates(start_dates, end_date, rebalancing_frequency):
+    """Return the dates on which the backtests started on given dates calculate
+    initial target portfolios, i.e. their start dates and rebalance days.
+
+    Args:
+        start_dates: list of datetime.date instances.
+        end_date: datetime.date.
+        rebalancing_frequency: "monthly" or a positive integer.
+
+    Returns:
+        sorted list of datetime.date instances.
+    """
+    dates = set()
+    for start_date in start_dates:
+        dates.add(start_date)
+        for i in range(1, (end_date - start_date).days + 1):
+            date = start_date + datetime.timedelta(days=i)
+            if bt._is_rebalance_day(i, date, rebalancing_frequency):
+                dates.add(date)
+    return sorted(dates)
+
+
+def _calculate_targets(date):
+    """Calculate the initial target portfolio of a date.
+
+    Args:
+        date: datetime.date.
+
+    Returns:
+        dict that can be passed as `targets` to `backtesting.backtest`, which
+        is empty if there is no valid portfolio on the date.
+    """
+    targets = {}
+    try:
+        bt._calculate_target_portfolio(
+            n_projects=_params["n_projects"],
+            date=date,
+            historical_data=_historical_data,
+            projects_to_include=_params["projects_to_include"],
+            value=_params["initial_investment"],
+            min_weight=_params["min_weight"],
+            max_weight=_params["max_weight"],
+            min_circ_marketcap=_params["min_circ_marketcap"],
+            solver=_params["solver"],
+            cache=_cache,
+            targets=targets,
+        )
+    except Exception:  # The backtests using this date report the error
+        pass
+    return targets
+
+
+def _run(start_date):
+    """Run the backtest started on a date and summarise its results.
+
+    Args:
+        start_date: datetime.date.
+
+    Returns:
+        tuple of 1D floating-point numpy.ndarray with the daily values of the
+        portfolio (empty if the backtest failed) and a dict with its summary.
+    """
+    summary = {"start_date": str(start_date)}
+    values = np.array([])
+    start = time.perf_counter()
+    try:
+        results = bt.backtest(
+            start_date=start_date,
+            historical_data=_historical_data,
+            cache=_cache,
+            targets=_targets,
+            **_params,
+        )
+        values = results.values()
+        summary["final_value"] = values[-1]
+        summary["total_return"] = values[-1] / _params["initial_investment"] - 1
+        summary["volatility"] = analytics.volatility(values)
+        summary["sharpe_ratio"] = analytics.sharpe_ratio(values)
+        summary["max_drawdown"] = analytics.max_drawdown(values)
+        summary["n_rebalances"] = results.statuses.count("rebalanced")
+        _, pre, post = analytics.rebalance_matrices(results, _historical_data.projects)
+        summary["turnover"] = np.sum(analytics.turnover(pre, post))
+        summary["error"] = None
+    except Exception as e:  # Failed backtests are reported, not raised
+        for stat in [
+            "final_value",
+            "total_return",
+            "volatility",
+            "sharpe_ratio",
+            "max_drawdown",
+            "n_rebalances",
+            "turnover",
+        ]:
+            summary[stat] = np.nan
+        summary["error"] = f"{type(e).__name__}: {e}"
+    summary["seconds"] = time.perf_counter() - start
+    return values, summary
+
+
+def walk_forward(
+    historical_data,
+    start_dates,
+    n_projects,
+    initial_investment,
+    min_circ_marketcap,
+    min_weight,
+    max_weight,
+    max_change,
+    projects_to_include,
+    rebalancing_frequency,
+    end_date=None,
+    solver="exact",
+    cache=None,
+    n_workers=None,
+    quiet=True,
+):
+    """Backtest the Token Terminal Index from every one of many start dates,
+    using a pool of processes.
+
+    Backtests with different start dates share most of their rebalance dates,
+    and their initial target portfolios on those dates do not depend on the
+    start date. The target portfolios of all start dates and rebalance dates
+    are therefore calculated once, in parallel, and shared with the backtests
+    together with the historical data panel, which is published in shared
+    memory. Each backtest returns compact results.
+
+    Args:
+        historical_data: pandas.core.frame.DataFrame containing the data
+            extracted by the script `extract_historical_data.py`, or
+            panel.HistoricalPanel built from it.
+        start_dates: list of datetime.date instances.
+        n_projects: int.
+        initial_investment: float defining the initial investment in USD.
+        min_circ_marketcap: float (see `backtesting.backtest`).
+        min_weight: float (see `backtesting.backtest`).
+        max_weight: float (see `backtesting.backtest`).
+        max_change: float (see `backtesting.backtest`).
+        projects_to_include: list of strings.
+        rebalancing_frequency: "monthly" or a positive integer representing the
+            number of days between rebalances.
+        end_date: datetime.date. If not given, the end date is the last date
+            for which there is data in `historical_data`.
+        solver: "basinhopping" or "exact" (see `backtesting._calculate_weights`).
+        cache: weight_cache.WeightCache used by the backtests (see
+            `sweep.sweep`).
+        n_workers: int defining the number of worker processes. If not given,
+            the number of CPUs is used. If 1, backtests run in this process.
+        quiet: bool defining whether not to print messages about the progress
+            of computation.
+
+    Returns:
+        tuple of two pandas.core.frame.DataFrame instances. The first contains
+        the daily values of the backtests, with one row per start date and one
+        column per date from the first start date to the end date (NaN before
+        the start date of a backtest, or if it failed). The second contains
+        one row per start date with the final value, total return, annualized
+        volatility, Sharpe ratio, maximum drawdown, number of rebalances,
+        turnover, error message (if the backtest failed), and wall time in
+        seconds of each backtest.
+    """
+    if not isinstance(historical_data, HistoricalPanel):
+        historical_data = HistoricalPanel(historical_data)
+    if len(start_dates) == 0:
+        raise ValueError("start_dates must not be empty")
+    if end_date is None:
+        end_date = historical_data.end_date
+    start_dates = sorted(start_dates)
+
+    params = dict(
+        n_projects=n_projects,
+        initial_investment=initial_investment,
+        min_circ_marketcap=min_circ_marketcap,
+        min_weight=min_weight,
+        max_weight=max_weight,
+        max_change=max_change,
+        projects_to_include=projects_to_include,
+        rebalancing_frequency=rebalancing_frequency,
+        end_date=end_date,
+        solver=solver,
+        engine="interval",
+        compact=True,
+    )
+    n_workers = n_workers or multiprocessing.cpu_count()
+
+    shared = SharedPanel(historical_data) if n_workers > 1 else None
+    data = historical_data if shared is None else shared.handle
+    try:
+        # Calculate the target portfolios shared by the backtests
+        dates = _target_dates(start_dates, end_date, rebalancing_frequency)
+        targets = {}
+        for t in _map(_calculate_targets, dates, n_workers, (data, params, cache)):
+            targets.update(t)
+        if not quiet:
+            print(f"Calculated {len(targets)} target portfolios")
+
+        outputs = _map(
+            _run, start_dates, n_workers, (data, params, cache, targets), quiet=quiet
+        )
+    finally:
+        if shared is not None:
+            shared.close()
+
+    n_days = (end_date - start_dates[0]).days + 1
+    nav = np.full((len(start_dates), n_days), np.nan)
+    for k, (start_date, (values, _)) in enumerate(zip(start_dates, outputs)):
+        first = (start_date - start_dates[0]).days
+        nav[k, first : first + len(values)] = values
+    nav = pd.DataFrame(
+        nav,
+        index=[str(d) for d in start_dates],
+        columns=[
+            str(start_dates[0] + datetime.timedelta(days=i)) for i in range(n_days)
+        ],
+    )
+    return nav, pd.DataFrame([summary for _, summary in outputs])
+
+
+def _parse_frequency(value):
+    """Parse a rebalancing frequency given in the command line."""
+    return value if value == "monthly" else int(value)
+
+
+def main(args=None):
+    """Run a walk-forward analysis from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="historical_data.csv")
+    parser.add_argument("--projects-file", help="file with one project per line")
+    parser.add_argument("--first-start-date", default="2021-01-01")
+    parser.add_argument("--last-start-date", help="defaults to the end date")
+    parser.add_argument("--step", type=int, default=1, help="days between starts")
+    parser.add_argument("--end-date")
+    parser.add_argument("--initial-investment", type=float, default=100.0)
+    parser.add_argument("--n-projects", type=int, default=13)
+    parser.add_argument("--min-weight", type=float, default=0.001)
+    parser.add_argument("--max-weight", type=float, default=0.2)
+    parser.add_argument("--max-change", type=float, default=0.05)
+    parser.add_argument("--min-circ-marketcap", type=float, default=1e8)
+    parser.add_argument(
+        "--rebalancing-frequency", type=_parse_frequency, default="monthly"
+    )
+    parser.add_argument("--solver", default="exact")
+    parser.add_argument("--cache-dir", help="directory of the weight cache")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", default="walk_forward.csv")
+    parser.add_argument("--nav-output", default="walk_forward_nav.csv")
+    args = parser.parse_args(args)
+
+    historical_data = HistoricalPanel.from_csv(args.data)
+    if args.projects_file:
+        with open(args.projects_file) as file:
+            projects_to_include = [line.strip() for line in file if line.strip()]
+    else:
+        projects_to_include = list(historical_data.projects)
+
+    end_date = (
+        datetime.date.fromisoformat(args.end_date)
+        if args.end_date
+        else historical_data.end_date
+    )
+    first = datetime.date.fromisoformat(args.first_start_date)
+    last = (
+        datetime.date.fromisoformat(args.last_start_date)
+        if args.last_start_date
+        else end_date
+    )
+    start_dates = [
+        first + datetime.timedelta(days=i)
+        for i in range(0, (last - first).days + 1, args.step)
+    ]
+
+    nav, summary = walk_forward(
+        historical_data,
+        start_dates=start_dates,
+        n_projects=args.n_projects,
+        initial_investment=args.initial_investment,
+        min_circ_marketcap=args.min_circ_marketcap,
+        min_weight=args.min_weight,
+        max_weight=args.max_weight,
+        max_change=args.max_change,
+        projects_to_include=projects_to_include,
+        rebalancing_frequency=args.rebalancing_frequency,
+        end_date=end_date,
+        solver=args.solver,
+        cache=args.cache_dir and WeightCache(path=args.cache_dir),
+        n_workers=args.workers,
+        quiet=False,
+    )
+    nav.to_csv(args.nav_output, index_label="start_date")
+    summary.to_csv(args.output, index=False)
+    print(f"Saved {len(summary)} runs to {args.output} and {args.nav_output}")
+
+
+if __name__ == "__main__":
+    main()
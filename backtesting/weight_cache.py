@@ -0,0 +1,138 @@
+"""This module contains a cache for the results of portfolio weight
+optimizations."""
+
+
+import collections
+import hashlib
+import os
+
+import numpy as np
+
+
+class WeightCache:
+    """Memoizing cache for `backtesting._calculate_weights`.
+
+    Weight optimizations are deterministic, so the weights calculated for a
+    given set of inputs can be reused whenever the same inputs come back (e.g.
+    in backtests that share rebalance dates). Results are kept in memory with
+    least-recently-used eviction and, optionally, saved on disk so they can be
+    shared between processes and sessions.
+
+    Args:
+        maxsize: int defining the maximum number of results kept in memory.
+        path: path to a directory where results are also saved. If not given,
+            results are only kept in memory.
+        decimals: int defining the number of decimals the input weights are
+            rounded to when building cache keys.
+
+    Attributes:
+        maxsize: int.
+        path: str or None.
+        decimals: int.
+        hits: int defining the number of results found in memory.
+        disk_hits: int defining the number of results found on disk.
+        misses: int defining the number of results that were not found.
+        evictions: int defining the number of results evicted from memory.
+    """
+
+    def __init__(self, maxsize=4096, path=None, decimals=12):
+
+        self.maxsize = maxsize
+        self.path = path
+        self.decimals = decimals
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._results = collections.OrderedDict()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def key(self, original, target, max_change, min_weight, max_weight, solver):
+        """Return the cache key of the inputs of a weight optimization.
+
+        Args:
+            original: 1D floating-point numpy.ndarray.
+            target: 1D floating-point numpy.ndarray.
+            max_change: float.
+            min_weight: float.
+            max_weight: float.
+            solver: str.
+
+        Returns:
+            str.
+        """
+        h = hashlib.sha256()
+        for weights in [original, target]:
+            h.update(np.round(np.asarray(weights, dtype=float), self.decimals) + 0.0)
+        h.update(repr((max_change, min_weight, max_weight, solver)).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        """Return the cached weights of a key.
+
+        Args:
+            key: str.
+
+        Returns:
+            1D floating-point numpy.ndarray, or None if the key is not cached.
+        """
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return self._results[key].copy()
+        if self.path is not None and os.path.exists(self._file(key)):
+            weights = np.load(self._file(key))
+            self._store(key, weights)
+            self.disk_hits += 1
+            return weights.copy()
+        self.misses += 1
+        return None
+
+    def put(self, key, weights):
+        """Cache the weights of a key.
+
+        Args:
+            key: str.
+            weights: 1D floating-point numpy.ndarray.
+        """
+        weights = np.array(weights, dtype=float)
+        self._store(key, weights)
+        if self.path is not None:
+            # Write to a temporary file first so that concurrent readers never
+            # see a partially written file
+            tmp = f"{self._file(key)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                np.save(file, weights)
+            os.replace(tmp, self._file(key))
+
+    def clear(self):
+        """Remove all results from memory (results on disk are kept)."""
+        self._results.clear()
+
+    @property
+    def stats(self):
+        """dict with the numbers of hits, disk hits, misses, and evictions, and
+        the number of results in memory."""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._results),
+        }
+
+    def __len__(self):
+        return len(self._results)
+
+    def _file(self, key):
+        """Return the path of the file of a key."""
+        return os.path.join(self.path, f"{key}.npy")
+
+    def _store(self, key, weights):
+        """Store weights in memory, evicting the least recently used results."""
+        self._results[key] = weights
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+            self.evictions += 1